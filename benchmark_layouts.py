@@ -0,0 +1,75 @@
+import math
+import time
+import numpy as np
+from numba import njit
+from non_euclidean_map import NonEuclideanMap
+from tiled_grid import TiledGrid, ROW_MAJOR, TILED, MORTON, grid_dda
+
+# Compare map storage orders for DDA traversal: rays at all angles through
+# 2k and 4k maps, both a generated NonEuclideanMap and a sparse random grid
+# where rays travel much further.
+MAP_SIZES = (2048, 4096)
+RAYS = 200000
+LAYOUTS = (('row-major', ROW_MAJOR), ('tiled 8x8', TILED), ('morton', MORTON))
+
+
+@njit
+def cast_rays(data, layout, width, height, tiles_width, origins, angles, max_distance):
+    """Cast one ray per angle and return the summed hit distance"""
+    total = 0.0
+    for i in range(len(angles)):
+        distance, cell_x, cell_y, side = grid_dda(
+            data, layout, width, height, tiles_width,
+            origins[i, 0], origins[i, 1], math.cos(angles[i]), math.sin(angles[i]), max_distance)
+        total += distance
+    return total
+
+
+def benchmark(name, cells, rng):
+    height, width = cells.shape
+    empty_y, empty_x = np.nonzero(cells == 0)
+    picks = rng.integers(0, len(empty_x), RAYS)
+    origins = np.stack([empty_x[picks], empty_y[picks]], axis=1) + rng.random((RAYS, 2))
+    angles = rng.uniform(0, 2 * math.pi, RAYS)
+    max_distance = float(max(width, height))
+
+    # Rays mostly along x or mostly along y, to show the row-major stride cost
+    along_x = np.abs(np.cos(angles)) > np.abs(np.sin(angles))
+
+    # Gather each subset's rays up front, so the timings only cover the DDA
+    queries = [(origins[subset], angles[subset])
+               for subset in (np.ones(RAYS, dtype=bool), along_x, ~along_x)]
+
+    print(f"{name} {width}x{height}")
+    reference = None
+    for label, layout in LAYOUTS:
+        grid = TiledGrid(cells, layout)
+        args = (grid.data, layout, width, height, grid.tiles_width)
+        cast_rays(*args, origins[:10], angles[:10], max_distance)  # compile
+
+        timings = []
+        for query_origins, query_angles in queries:
+            start = time.perf_counter()
+            total = cast_rays(*args, query_origins, query_angles, max_distance)
+            timings.append((time.perf_counter() - start) / max(1, len(query_angles)) * 1e9)
+            if len(timings) == 1:
+                reference = total if reference is None else reference
+                assert abs(total - reference) < 1e-6 * max(1.0, reference), "layouts disagree"
+
+        print(f"  {label:10s}  all {timings[0]:7.1f} ns/ray   "
+              f"east-west {timings[1]:7.1f}   north-south {timings[2]:7.1f}")
+
+
+def main():
+    rng = np.random.default_rng(1)
+    for size in MAP_SIZES:
+        generated = NonEuclideanMap(size, size, seed=1, vectorized=True).grid
+        benchmark("generated", generated, rng)
+
+        sparse = (rng.random((size, size)) < 0.0005).astype(np.uint8)
+        sparse[0, :] = sparse[-1, :] = sparse[:, 0] = sparse[:, -1] = 1
+        benchmark("sparse", sparse, rng)
+
+
+if __name__ == "__main__":
+    main()
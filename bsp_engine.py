@@ -0,0 +1,207 @@
+import pygame
+import numpy as np
+import math
+import time
+from trippy_effects import TrippyEffects
+from non_euclidean_map import NonEuclideanMap
+from bsp_map import BspTree, ColumnCoverage
+from light_tables import light_levels
+from texture_atlas import (create_texture_atlas, create_palette_framebuffer, TEXTURE_SIZE,
+                           SKY_STEPS, FLOOR_STEPS, PALETTE_LIGHT_LEVELS)
+
+# Segment-based engine: walls are line segments at any angle, drawn by
+# walking a BSP tree front to back instead of marching rays. Rendering goes
+# through the off-screen palette framebuffer, so nothing here needs a
+# window until main() opens one.
+
+# Initialize Pygame
+pygame.init()
+
+# Constants
+WIDTH, HEIGHT = 800, 600
+HALF_HEIGHT = HEIGHT // 2
+FOV = 60  # Field of view
+MAX_DISTANCE = 20.0  # Distance at which walls reach the darkest light level, in cells
+PLAYER_RADIUS = 0.2
+PLAYER_SPEED = 0.05  # Cells per frame at 60 FPS
+MAP_SIZE = 24
+
+# Colors
+WHITE = (255, 255, 255)
+
+# Map: the grid of a NonEuclideanMap turned into merged wall segments and a
+# BSP tree over them, built once per map
+map_generator = NonEuclideanMap(MAP_SIZE, MAP_SIZE)
+bsp = BspTree.from_grid(map_generator.grid, map_generator.wall_textures)
+
+# Trippy effects
+effects = TrippyEffects()
+
+# Shared texture atlas, drawn through the palette framebuffer
+texture_atlas = create_texture_atlas()
+palette_framebuffer, PALETTE_BACKGROUND, PALETTE_TEXTURE_INDICES = create_palette_framebuffer(texture_atlas, WIDTH, HEIGHT)
+
+# Per-column results of the BSP walk, refilled every frame
+coverage = ColumnCoverage(WIDTH)
+column_depth = np.full(WIDTH, np.inf)
+column_texture = np.zeros(WIDTH, dtype=np.intp)
+column_u = np.zeros(WIDTH)
+
+# Player settings, in cells; start in the middle of the first open cell
+start_y, start_x = np.argwhere(map_generator.grid == 0)[0]
+player_x = start_x + 0.5
+player_y = start_y + 0.5
+player_angle = 0.0
+
+# Counters from the last frame, for the status line
+frame_stats = {'nodes_visited': 0}
+
+def render_frame(player_x, player_y, player_angle):
+    """Render the view from (player_x, player_y, player_angle) and return it as a surface"""
+    uniforms = effects.uniforms
+
+    # Field of view pulses with the effects
+    fov = FOV + effects.get_fov_distortion()
+    nodes = bsp.cast_columns(player_x, player_y, player_angle, math.tan(math.radians(fov) / 2),
+                             coverage, column_depth, column_texture, column_u)
+
+    # Wall spans for every column at once
+    visible = np.isfinite(column_depth)
+    depth = np.where(visible, column_depth, MAX_DISTANCE)
+    wall_height = HEIGHT / depth
+    wall_top = HALF_HEIGHT - wall_height / 2
+    rows = np.arange(HEIGHT)[np.newaxis, :]
+    inside = visible[:, np.newaxis] & (rows >= wall_top[:, np.newaxis]) & (rows < (wall_top + wall_height)[:, np.newaxis])
+    texture_y = np.clip(((rows - wall_top[:, np.newaxis]) / wall_height[:, np.newaxis] * TEXTURE_SIZE).astype(np.intp),
+                        0, TEXTURE_SIZE - 1)
+    texture_x = ((column_u % 1.0) * TEXTURE_SIZE).astype(np.intp) % TEXTURE_SIZE
+
+    # Distance shading picks one of the pre-shaded palette blocks
+    level = light_levels(depth, MAX_DISTANCE, PALETTE_LIGHT_LEVELS)
+    wall_indices = PALETTE_TEXTURE_INDICES[
+        column_texture[:, np.newaxis], level[:, np.newaxis], texture_y, texture_x[:, np.newaxis]
+    ]
+    palette_framebuffer.pixels[:] = np.where(inside, wall_indices, PALETTE_BACKGROUND[np.newaxis, :])
+
+    # Trippy color effects are applied once to the wall palette entries
+    remap = None
+    if effects.enabled:
+        remap = lambda colors: effects.apply_color_distortion_array(colors, 0.0, player_angle)
+    palette_framebuffer.update(uniforms.time, tint_start=SKY_STEPS + FLOOR_STEPS, remap=remap)
+
+    # Expand to RGB for the screen-space effects
+    frame = pygame.Surface((WIDTH, HEIGHT))
+    frame.blit(palette_framebuffer.to_surface(), (0, 0))
+    effects.apply_visual_noise(frame)
+    effects.apply_afterimage(frame)
+
+    frame_stats['nodes_visited'] = nodes
+    return frame
+
+def is_blocked(x, y):
+    """Whether a player standing at (x, y) would overlap a wall"""
+    for corner_x in (x - PLAYER_RADIUS, x + PLAYER_RADIUS):
+        for corner_y in (y - PLAYER_RADIUS, y + PLAYER_RADIUS):
+            if map_generator.is_solid_cell(int(math.floor(corner_x)), int(math.floor(corner_y))):
+                return True
+    return False
+
+# Main game loop
+def main():
+    global player_x, player_y, player_angle, bsp
+
+    screen = pygame.display.set_mode((WIDTH, HEIGHT), pygame.HWSURFACE | pygame.DOUBLEBUF)
+    pygame.display.set_caption("BSP Segment Renderer")
+    clock = pygame.time.Clock()
+    font = pygame.font.SysFont(None, 24)
+
+    running = True
+    mouse_locked = True
+    pygame.mouse.set_visible(False)
+    pygame.event.set_grab(True)
+
+    # For FPS calculation
+    fps_counter = 0
+    fps_timer = time.time()
+    fps = 0
+
+    while running:
+        # Calculate delta time for smooth movement
+        dt = clock.get_time() / 1000.0
+
+        # Update trippy effects
+        effects.update(dt)
+
+        # Handle events
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT:
+                running = False
+
+            elif event.type == pygame.KEYDOWN:
+                if event.key == pygame.K_ESCAPE:
+                    # Toggle mouse lock
+                    mouse_locked = not mouse_locked
+                    pygame.mouse.set_visible(not mouse_locked)
+                    pygame.event.set_grab(mouse_locked)
+                elif event.key == pygame.K_SPACE:
+                    effects.toggle()
+                elif event.key == pygame.K_r:
+                    # Generate a new map and rebuild its tree
+                    map_generator.generate_new_map()
+                    bsp = BspTree.from_grid(map_generator.grid, map_generator.wall_textures)
+                elif event.key == pygame.K_EQUALS or event.key == pygame.K_PLUS:
+                    effects.increase_intensity()
+                elif event.key == pygame.K_MINUS:
+                    effects.decrease_intensity()
+
+            # Handle mouse movement for looking around
+            elif event.type == pygame.MOUSEMOTION and mouse_locked:
+                player_angle += math.radians(event.rel[0] * 0.1)
+
+        # Update player position based on movement keys
+        keys = pygame.key.get_pressed()
+        move_speed = PLAYER_SPEED * dt * 60  # Normalize for 60 FPS
+        forward = keys[pygame.K_w] - keys[pygame.K_s]
+        strafe = keys[pygame.K_d] - keys[pygame.K_a]
+        if keys[pygame.K_LEFT]:
+            player_angle -= 0.05
+        if keys[pygame.K_RIGHT]:
+            player_angle += 0.05
+        dx = (math.cos(player_angle) * forward - math.sin(player_angle) * strafe) * move_speed
+        dy = (math.sin(player_angle) * forward + math.cos(player_angle) * strafe) * move_speed
+
+        # Apply trippy movement distortion
+        if effects.enabled and (dx or dy):
+            wobble_x, wobble_y = effects.apply_movement_distortion(0.0, 0.0)
+            dx += wobble_x * move_speed
+            dy += wobble_y * move_speed
+
+        # Only move if not hitting a wall
+        if not is_blocked(player_x + dx, player_y):
+            player_x += dx
+        if not is_blocked(player_x, player_y + dy):
+            player_y += dy
+
+        # Render the 3D view
+        screen.blit(render_frame(player_x, player_y, player_angle), (0, 0))
+
+        # Calculate and display FPS
+        fps_counter += 1
+        if time.time() - fps_timer > 1.0:
+            fps = fps_counter
+            fps_counter = 0
+            fps_timer = time.time()
+
+        status_text = f"FPS: {fps}  Nodes: {frame_stats['nodes_visited']}/{len(bsp)}  Segments: {len(bsp.segments)}"
+        screen.blit(font.render(status_text, True, WHITE), (10, 10))
+
+        # Update the display
+        pygame.display.flip()
+
+        # Cap the frame rate
+        clock.tick(60)
+
+    pygame.quit()
+
+if __name__ == "__main__":
+    main()
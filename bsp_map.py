@@ -0,0 +1,394 @@
+import math
+import numpy as np
+from level_file import write_level, read_level
+
+# Line-segment maps and a BSP tree over them, for rendering walls at any
+# angle. Coordinates are in cells. A wall is one-sided: it is seen from its
+# front, the side where point_side() is positive, which for a segment
+# running from (x1, y1) to (x2, y2) is its right-hand side with y pointing
+# down the map.
+
+# Closest a point may be to the camera before it is clipped away, in cells
+NEAR_PLANE = 0.05
+
+# Splitter candidates scored per BSP node, and the cost of one split
+# against one segment of imbalance
+SPLITTER_CANDIDATES = 16
+SPLIT_COST = 8
+
+# Tolerance for a point lying on a splitter line
+ON_LINE = 1e-9
+
+
+def point_side(x1, y1, dx, dy, x, y):
+    """Positive in front of the line through (x1, y1) along (dx, dy), negative behind it"""
+    return dx * (y - y1) - dy * (x - x1)
+
+
+def _runs(mask, key):
+    """(row, start, end) of every run of set cells along the rows of mask with one key"""
+    padded = np.zeros((mask.shape[0], mask.shape[1] + 1), dtype=bool)
+    padded[:, 1:] = mask
+    same = np.zeros_like(padded)
+    same[:, 2:] = key[:, 1:] == key[:, :-1]
+    starts = padded[:, 1:] & ~(padded[:, :-1] & same[:, 1:])
+    rows, start = np.nonzero(starts)
+    # Each run ends just before the next start or the next unset cell
+    breaks = np.zeros((mask.shape[0], mask.shape[1] + 1), dtype=bool)
+    breaks[:, :-1] = starts | ~mask
+    breaks[:, -1] = True
+    end = np.empty_like(start)
+    for i, (row, first) in enumerate(zip(rows, start)):
+        end[i] = first + 1 + np.argmax(breaks[row, first + 1:])
+    return rows, start, end
+
+
+def grid_segments(grid, textures=None):
+    """
+    Merged wall segments of a cell grid, e.g. a NonEuclideanMap's grid and
+    wall_textures. Every face between an empty cell and a non-empty one (or
+    the map edge) becomes part of a segment facing into the empty cell, and
+    neighbouring faces along the same line with the same texture are merged.
+    Returns (segments, textures, offsets) as in BspTree.build().
+    """
+    grid = np.asarray(grid)
+    solid = np.pad(grid != 0, 1, constant_values=True)
+    textures = np.zeros(grid.shape, dtype=np.uint8) if textures is None else np.asarray(textures, dtype=np.uint8)
+    key = np.pad(textures, 1)
+    empty = ~solid[1:-1, 1:-1]
+
+    segments = []
+    segment_textures = []
+    # Faces with the wall above or below run along rows; the others run
+    # along columns and are found on the transposed grid
+    for along_x, neighbour, reverse in ((True, (0, 1), False), (True, (2, 1), True),
+                                        (False, (1, 0), True), (False, (1, 2), False)):
+        dy, dx = neighbour
+        wall = solid[dy:dy + grid.shape[0], dx:dx + grid.shape[1]]
+        wall_key = key[dy:dy + grid.shape[0], dx:dx + grid.shape[1]]
+        mask = empty & wall
+        if not along_x:
+            mask, wall_key = mask.T, wall_key.T
+        rows, start, end = _runs(mask, wall_key)
+        # Which edge of the empty cell the face is on
+        line = rows + (dy if along_x else dx) // 2
+        a, b = (end, start) if reverse else (start, end)
+        if along_x:
+            segments.append(np.stack([a, line, b, line], axis=1))
+        else:
+            segments.append(np.stack([line, a, line, b], axis=1))
+        segment_textures.append(wall_key[rows, start])
+
+    segments = np.concatenate(segments).astype(np.float64)
+    return segments, np.concatenate(segment_textures).astype(np.uint8), np.zeros(len(segments))
+
+
+class ColumnCoverage:
+    """
+    Per-column occlusion coverage for front-to-back drawing: a sorted list of
+    disjoint (first, last) ranges of screen columns already hidden behind
+    solid walls, merged as they grow, so a frame of walls costs work in the
+    number of visible pieces rather than in columns.
+    """
+
+    def __init__(self, width):
+        self.width = width
+        self.ranges = []
+
+    def reset(self):
+        self.ranges = []
+
+    def is_full(self):
+        return self.ranges == [(0, self.width - 1)]
+
+    def is_covered(self, first, last):
+        """Whether columns first..last are all hidden already"""
+        for a, b in self.ranges:
+            if a <= first and last <= b:
+                return True
+        return False
+
+    def clip(self, first, last):
+        """Mark columns first..last hidden and return the (first, last) ranges of them that were not"""
+        visible = []
+        x = first
+        for a, b in self.ranges:
+            if b < x:
+                continue
+            if a > last:
+                break
+            if a > x:
+                visible.append((x, a - 1))
+            x = b + 1
+            if x > last:
+                break
+        if x <= last:
+            visible.append((x, last))
+
+        if visible:
+            lo, hi = first, last
+            kept = []
+            for a, b in self.ranges:
+                if b < lo - 1 or a > hi + 1:
+                    kept.append((a, b))
+                else:
+                    lo = min(lo, a)
+                    hi = max(hi, b)
+            kept.append((lo, hi))
+            kept.sort()
+            self.ranges = kept
+        return visible
+
+
+class BspTree:
+    """
+    BSP tree over one-sided wall segments, built once per map.
+
+    Each node splits the plane along one of its segments. Segments lying on
+    that line are stored at the node, the rest go to the front or back child,
+    cut in two where they cross the line. The tree is kept as flat arrays:
+
+        segments (n, 4)        x1, y1, x2, y2 of every segment
+        textures (n,)          texture id per segment
+        offsets (n,)           texture coordinate at (x1, y1), in cells
+        node_lines (m, 4)      x, y, dx, dy of each node's splitter
+        node_children (m, 2)   front and back child, -1 for none
+        node_segments (m, 2)   first index and count of the node's segments
+        node_bounds (m, 4)     min x, min y, max x, max y of the whole subtree
+
+    Node 0 is the root. Drawing walks it front to back from the camera
+    (see cast_columns()), so hidden subtrees are skipped without being
+    looked at.
+    """
+
+    def __init__(self, segments, textures, offsets, node_lines, node_children, node_segments, node_bounds):
+        self.segments = segments
+        self.textures = textures
+        self.offsets = offsets
+        self.node_lines = node_lines
+        self.node_children = node_children
+        self.node_segments = node_segments
+        self.node_bounds = node_bounds
+
+    def __len__(self):
+        return len(self.node_lines)
+
+    @classmethod
+    def build(cls, segments, textures, offsets=None):
+        """
+        Build the tree for (n, 4) segments with per-segment textures and
+        texture offsets. Splitters are picked from a few candidates per
+        node to keep both the number of cut segments and the depth low.
+        """
+        segments = [tuple(float(v) for v in segment) for segment in np.asarray(segments)]
+        textures = [int(texture) for texture in np.asarray(textures)]
+        offsets = [0.0] * len(segments) if offsets is None else [float(offset) for offset in offsets]
+
+        out_segments, out_textures, out_offsets = [], [], []
+        node_lines, node_children, node_segments, node_bounds = [], [], [], []
+
+        def build_node(items):
+            # items are (x1, y1, x2, y2, texture, offset) tuples
+            splitter = _pick_splitter(items)
+            sx, sy = splitter[0], splitter[1]
+            sdx, sdy = splitter[2] - sx, splitter[3] - sy
+            on, front, back = [], [], []
+            for item in items:
+                x1, y1, x2, y2, texture, offset = item
+                side1 = point_side(sx, sy, sdx, sdy, x1, y1)
+                side2 = point_side(sx, sy, sdx, sdy, x2, y2)
+                if abs(side1) <= ON_LINE and abs(side2) <= ON_LINE:
+                    on.append(item)
+                elif side1 >= -ON_LINE and side2 >= -ON_LINE:
+                    front.append(item)
+                elif side1 <= ON_LINE and side2 <= ON_LINE:
+                    back.append(item)
+                else:
+                    # Cut where it crosses the splitter; the far piece
+                    # carries on the texture from where the cut is
+                    t = side1 / (side1 - side2)
+                    mx, my = x1 + (x2 - x1) * t, y1 + (y2 - y1) * t
+                    first = (x1, y1, mx, my, texture, offset)
+                    second = (mx, my, x2, y2, texture, offset + t * math.hypot(x2 - x1, y2 - y1))
+                    (front if side1 > 0 else back).append(first)
+                    (front if side2 > 0 else back).append(second)
+
+            node = len(node_lines)
+            node_lines.append((sx, sy, sdx, sdy))
+            node_children.append([-1, -1])
+            node_segments.append((len(out_segments), len(on)))
+            for x1, y1, x2, y2, texture, offset in on:
+                out_segments.append((x1, y1, x2, y2))
+                out_textures.append(texture)
+                out_offsets.append(offset)
+            xs = [v for item in items for v in (item[0], item[2])]
+            ys = [v for item in items for v in (item[1], item[3])]
+            node_bounds.append((min(xs), min(ys), max(xs), max(ys)))
+            if front:
+                node_children[node][0] = build_node(front)
+            if back:
+                node_children[node][1] = build_node(back)
+            return node
+
+        if segments:
+            build_node([segment + (texture, offset) for segment, texture, offset in zip(segments, textures, offsets)])
+
+        return cls(np.array(out_segments, dtype=np.float64).reshape(-1, 4),
+                   np.array(out_textures, dtype=np.uint8),
+                   np.array(out_offsets, dtype=np.float64),
+                   np.array(node_lines, dtype=np.float64).reshape(-1, 4),
+                   np.array(node_children, dtype=np.int32).reshape(-1, 2),
+                   np.array(node_segments, dtype=np.int32).reshape(-1, 2),
+                   np.array(node_bounds, dtype=np.float64).reshape(-1, 4))
+
+    @classmethod
+    def from_grid(cls, grid, textures=None):
+        """Tree over the merged wall segments of a cell grid, see grid_segments()"""
+        return cls.build(*grid_segments(grid, textures))
+
+    def save(self, path):
+        """Bake the tree to a level file (see level_file) so it need not be rebuilt"""
+        write_level(path, {
+            'segments': self.segments,
+            'textures': self.textures,
+            'offsets': self.offsets,
+            'node_lines': self.node_lines,
+            'node_children': self.node_children,
+            'node_segments': self.node_segments,
+            'node_bounds': self.node_bounds,
+        }, {'kind': 'bsp'})
+
+    @classmethod
+    def load(cls, path):
+        """Map a tree baked by save()"""
+        meta, arrays = read_level(path)
+        if meta.get('kind') != 'bsp':
+            raise ValueError(f"{path} does not hold a BSP tree")
+        return cls(arrays['segments'], arrays['textures'], arrays['offsets'], arrays['node_lines'],
+                   arrays['node_children'], arrays['node_segments'], arrays['node_bounds'])
+
+    def cast_columns(self, x, y, angle, tan_half_fov, coverage, depth, texture, wall_u):
+        """
+        Find the nearest wall in every screen column from camera (x, y, angle).
+
+        The tree is walked front to back. Each wall facing the camera is
+        projected to a range of columns and clipped against coverage; the
+        columns left over get the wall's perpendicular depth, texture and
+        texture coordinate written into depth, texture and wall_u, and are
+        then covered. Subtrees whose bounds project into covered columns are
+        skipped, and the walk stops once every column is covered. Columns no
+        wall reaches keep depth inf. Returns the number of nodes visited.
+        """
+        width = len(depth)
+        depth[:] = np.inf
+        coverage.reset()
+        dir_x, dir_y = math.cos(angle), math.sin(angle)
+        right_x, right_y = -dir_y, dir_x
+        camera = np.linspace(-1.0, 1.0, width, endpoint=False) + 1.0 / width
+        ray_x = dir_x + right_x * tan_half_fov * camera
+        ray_y = dir_y + right_y * tan_half_fov * camera
+        focal = width / (2.0 * tan_half_fov)
+
+        def columns(points):
+            # Screen columns covered by a polygon (or segment) of camera
+            # space (depth, lateral) points, after near plane clipping
+            ratios = []
+            count = len(points)
+            for i in range(count):
+                d0, l0 = points[i]
+                d1, l1 = points[(i + 1) % count]
+                if d0 >= NEAR_PLANE:
+                    ratios.append(l0 / d0)
+                if (d0 >= NEAR_PLANE) != (d1 >= NEAR_PLANE):
+                    t = (NEAR_PLANE - d0) / (d1 - d0)
+                    ratios.append((l0 + (l1 - l0) * t) / NEAR_PLANE)
+            if not ratios:
+                return None
+            first = max(0, math.ceil(width / 2.0 + min(ratios) * focal - 0.5))
+            last = min(width - 1, math.floor(width / 2.0 + max(ratios) * focal - 0.5))
+            if first > last:
+                return None
+            return first, last
+
+        def to_camera(px, py):
+            rx, ry = px - x, py - y
+            return rx * dir_x + ry * dir_y, rx * right_x + ry * right_y
+
+        def visible(node):
+            min_x, min_y, max_x, max_y = self.node_bounds[node]
+            if min_x <= x <= max_x and min_y <= y <= max_y:
+                return not coverage.is_full()
+            span = columns([to_camera(min_x, min_y), to_camera(max_x, min_y),
+                            to_camera(max_x, max_y), to_camera(min_x, max_y)])
+            return span is not None and not coverage.is_covered(*span)
+
+        def draw_node(node):
+            first, count = self.node_segments[node]
+            for index in range(first, first + count):
+                x1, y1, x2, y2 = self.segments[index]
+                # Backface culling: only walls the camera is in front of
+                if point_side(x1, y1, x2 - x1, y2 - y1, x, y) <= 0:
+                    continue
+                span = columns([to_camera(x1, y1), to_camera(x2, y2)])
+                if span is None:
+                    continue
+                for a, b in coverage.clip(*span):
+                    # Where each column's ray meets the wall's line
+                    ex, ey = x2 - x1, y2 - y1
+                    denominator = ray_x[a:b + 1] * ey - ray_y[a:b + 1] * ex
+                    denominator[denominator == 0] = 1e-12
+                    px, py = x1 - x, y1 - y
+                    depth[a:b + 1] = np.maximum((px * ey - py * ex) / denominator, NEAR_PLANE)
+                    t = np.clip((px * ray_y[a:b + 1] - py * ray_x[a:b + 1]) / denominator, 0.0, 1.0)
+                    texture[a:b + 1] = self.textures[index]
+                    wall_u[a:b + 1] = self.offsets[index] + t * math.hypot(ex, ey)
+
+        visited = 0
+        stack = [(0, False)] if len(self.node_lines) else []
+        # Explicit stack of (node, expanded): a node is first expanded into
+        # near child, its own walls and far child, then its walls are drawn
+        while stack and not coverage.is_full():
+            node, expanded = stack.pop()
+            if expanded:
+                draw_node(node)
+                continue
+            if not visible(node):
+                continue
+            visited += 1
+            sx, sy, sdx, sdy = self.node_lines[node]
+            front_child, back_child = self.node_children[node]
+            if point_side(sx, sy, sdx, sdy, x, y) >= 0:
+                near, far = front_child, back_child
+            else:
+                near, far = back_child, front_child
+            if far >= 0:
+                stack.append((far, False))
+            stack.append((node, True))
+            if near >= 0:
+                stack.append((near, False))
+        return visited
+
+
+def _pick_splitter(items):
+    """The candidate splitter with the fewest cuts and best balance among items"""
+    step = max(1, len(items) // SPLITTER_CANDIDATES)
+    best, best_score = items[0], math.inf
+    for candidate in items[::step]:
+        sx, sy = candidate[0], candidate[1]
+        sdx, sdy = candidate[2] - sx, candidate[3] - sy
+        front = back = splits = 0
+        for x1, y1, x2, y2, _, _ in items:
+            side1 = point_side(sx, sy, sdx, sdy, x1, y1)
+            side2 = point_side(sx, sy, sdx, sdy, x2, y2)
+            if abs(side1) <= ON_LINE and abs(side2) <= ON_LINE:
+                continue
+            if side1 >= -ON_LINE and side2 >= -ON_LINE:
+                front += 1
+            elif side1 <= ON_LINE and side2 <= ON_LINE:
+                back += 1
+            else:
+                splits += 1
+        score = splits * SPLIT_COST + abs(front - back)
+        if score < best_score:
+            best, best_score = candidate, score
+    return best
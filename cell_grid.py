@@ -0,0 +1,85 @@
+from enum import IntEnum
+import numpy as np
+
+
+class WallType(IntEnum):
+    """
+    Cell codes shared by every map grid.
+
+    Grids store these as uint8. Anything other than EMPTY is solid in the
+    packed occupancy bitmap; what a solid cell does when a ray or the player
+    reaches it is up to the engine.
+    """
+    EMPTY = 0                    # Open space
+    WALL = 1                     # Normal wall
+    PORTAL = 2                   # Portal entrance/exit
+    NON_EUCLIDEAN_ENTRANCE = 3   # Entrance to a space that is bigger inside
+    REALITY_DISTORTION = 4       # Reality distortion wall
+    PERSPECTIVE_SHIFT = 5        # Perspective shift wall
+    HYPERCUBE_ENTRANCE = 6       # Entrance to the 4D hypercube
+    REALITY_FRACTURE = 7         # Reality fracture
+    DIMENSIONAL_SHIFT = 8        # Dimensional shift
+    RECURSIVE_BOUNDARY = 9       # Boundary of a recursive room
+    RECURSIVE_PORTAL = 10        # Recursive portal; hypercube rooms use 10-14
+    MIRROR = 11                  # Mirror wall
+    ROOM_CONNECTION = 20         # Connection to another room; 20 + connection index
+    HYPERCUBE_CONNECTION = 30    # 4D hypercube connection
+
+
+def pack_solid(cells):
+    """Bit-packed occupancy of a grid: bit (x & 7) of bits[y, x >> 3] is set for non-empty cells"""
+    return np.packbits(np.asarray(cells) != WallType.EMPTY, axis=1, bitorder='little')
+
+
+class CellGrid:
+    """
+    uint8 grid of WallType codes with a bit-packed solid/empty bitmap kept in
+    sync on every write. Index it like a NumPy array, MAP[y, x], or use the
+    accessors; the bitmap is one bit per cell, so is_solid() touches an
+    eighth of the memory a cell read does.
+    """
+
+    def __init__(self, width, height):
+        self.width = width
+        self.height = height
+        self.cells = np.zeros((height, width), dtype=np.uint8)
+        self.bits = pack_solid(self.cells)
+
+    @classmethod
+    def from_array(cls, cells):
+        """Build a grid from any 2D array or nested list of cell codes"""
+        cells = np.asarray(cells)
+        grid = cls(cells.shape[1], cells.shape[0])
+        grid.cells[:] = cells
+        grid.bits = pack_solid(grid.cells)
+        return grid
+
+    @property
+    def shape(self):
+        return self.cells.shape
+
+    def __getitem__(self, key):
+        return self.cells[key]
+
+    def __setitem__(self, key, value):
+        self.cells[key] = value
+        # Repack only the rows the write touched
+        rows = np.arange(self.height)[key[0] if isinstance(key, tuple) else key]
+        self.bits[rows] = pack_solid(self.cells[rows].reshape(-1, self.width))
+
+    def in_bounds(self, x, y):
+        return 0 <= x < self.width and 0 <= y < self.height
+
+    def get(self, x, y):
+        """Cell code at (x, y) as a plain int"""
+        return int(self.cells[y, x])
+
+    def is_solid(self, x, y):
+        """Whether (x, y) holds anything at all; cells outside the grid count as solid"""
+        if 0 <= x < self.width and 0 <= y < self.height:
+            return bool((self.bits[y, x >> 3] >> (x & 7)) & 1)
+        return True
+
+    def solid_mask(self):
+        """Unpacked (height, width) bool array of solid cells"""
+        return np.unpackbits(self.bits, axis=1, count=self.width, bitorder='little').astype(bool)
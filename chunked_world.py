@@ -0,0 +1,203 @@
+import math
+import queue
+import threading
+from collections import OrderedDict, namedtuple
+import numpy as np
+from non_euclidean_map import stamp_wall_segments, label_regions
+
+CHUNK_SIZE = 64                  # Cells along each side of a chunk
+CHUNK_MEMORY_BUDGET = 64 << 20   # Bytes of resident chunk data before the LRU evicts
+PREFETCH_CHUNKS = 3              # How many chunks ahead of the player to prefetch
+
+# One generated chunk: uint8 (size, size) cell types (0 = empty, 1 = wall) and texture ids
+Chunk = namedtuple('Chunk', ['cells', 'textures'])
+
+
+def generate_chunk(seed, chunk_x, chunk_y, size=CHUNK_SIZE):
+    """
+    Generate the chunk at (chunk_x, chunk_y) of the world with the given seed.
+    The same arguments always give the same chunk, so evicted chunks can be
+    regenerated on demand. Walls never touch the outermost ring of cells, so
+    every chunk is open to its neighbours and the whole world is connected.
+    """
+    # SeedSequence entropy must be non-negative, so interleave the coordinate signs
+    rng = np.random.default_rng([seed, chunk_x * 2 if chunk_x >= 0 else -chunk_x * 2 - 1,
+                                 chunk_y * 2 if chunk_y >= 0 else -chunk_y * 2 - 1])
+    cells = np.zeros((size, size), dtype=np.uint8)
+    stamp_wall_segments(cells, rng, max(1, size * size * 20 // 256))
+
+    # Knock openings into 20% of the walls, then fill pockets cut off from the edge ring
+    cells[(cells == 1) & (rng.random(cells.shape) < 0.2)] = 0
+    labels = label_regions(cells == 0)
+    cells[(labels >= 0) & (labels != labels[0, 0])] = 1
+
+    # One texture per 8x8 block of cells
+    blocks = -(-size // 8)
+    block_textures = rng.integers(0, 4, (blocks, blocks)).astype(np.uint8)
+    textures = np.kron(block_textures, np.ones((8, 8), dtype=np.uint8))[:size, :size]
+    textures[cells == 0] = 0
+
+    return Chunk(cells, textures)
+
+
+class ChunkedWorld:
+    """
+    Endless grid world made of procedurally generated chunks.
+
+    Chunks are generated on demand and kept in an LRU cache bounded by a
+    memory budget; a background thread prefetches the chunks ahead of the
+    player so the renderer rarely has to wait for one. Cells are addressed
+    with unbounded integer coordinates, negative ones included.
+    """
+
+    def __init__(self, seed=0, chunk_size=CHUNK_SIZE, cell_size=64, memory_budget=CHUNK_MEMORY_BUDGET):
+        self.seed = seed
+        self.chunk_size = chunk_size
+        self.cell_size = cell_size
+
+        # Every chunk holds two uint8 arrays of chunk_size x chunk_size
+        self.max_chunks = max(9, memory_budget // (2 * chunk_size * chunk_size))
+        self.chunks = OrderedDict()
+        self.lock = threading.Lock()
+
+        # Chunk coordinates waiting for the prefetch thread
+        self.prefetch_queue = queue.Queue()
+        self.pending = set()
+        self.prefetch_thread = None
+        self.running = False
+
+    def get_chunk(self, chunk_x, chunk_y):
+        """Return the chunk at the given chunk coordinates, generating it if it is not resident"""
+        key = (chunk_x, chunk_y)
+        with self.lock:
+            chunk = self.chunks.get(key)
+            if chunk is not None:
+                self.chunks.move_to_end(key)
+                return chunk
+
+        # Generate outside the lock so the prefetch thread and renderer don't block each other
+        chunk = generate_chunk(self.seed, chunk_x, chunk_y, self.chunk_size)
+        with self.lock:
+            chunk = self.chunks.setdefault(key, chunk)
+            self.chunks.move_to_end(key)
+            while len(self.chunks) > self.max_chunks:
+                self.chunks.popitem(last=False)
+        return chunk
+
+    def get_cell(self, cell_x, cell_y):
+        """Cell type at integer cell coordinates"""
+        size = self.chunk_size
+        chunk = self.get_chunk(cell_x // size, cell_y // size)
+        return chunk.cells[cell_y % size, cell_x % size]
+
+    def is_wall(self, x, y):
+        """Check if a world position is inside a wall"""
+        return self.get_cell(math.floor(x / self.cell_size), math.floor(y / self.cell_size)) == 1
+
+    def get_texture(self, x, y):
+        """Get the texture ID for a wall at the given position"""
+        size = self.chunk_size
+        cell_x, cell_y = math.floor(x / self.cell_size), math.floor(y / self.cell_size)
+        return self.get_chunk(cell_x // size, cell_y // size).textures[cell_y % size, cell_x % size]
+
+    def cast_ray(self, x, y, angle, max_distance):
+        """
+        Grid DDA from world position (x, y) along angle, across chunk boundaries.
+        Returns (distance, side, texture) for the first wall hit, with side 0 for
+        walls facing along x and 1 along y, or None past max_distance.
+        """
+        cell_size = self.cell_size
+        size = self.chunk_size
+        pos_x, pos_y = x / cell_size, y / cell_size
+        map_x, map_y = math.floor(pos_x), math.floor(pos_y)
+        dir_x, dir_y = math.cos(angle), math.sin(angle)
+
+        delta_x = abs(1 / dir_x) if dir_x else math.inf
+        delta_y = abs(1 / dir_y) if dir_y else math.inf
+        step_x = 1 if dir_x >= 0 else -1
+        step_y = 1 if dir_y >= 0 else -1
+        side_x = (map_x + 1 - pos_x) * delta_x if dir_x >= 0 else (pos_x - map_x) * delta_x
+        side_y = (map_y + 1 - pos_y) * delta_y if dir_y >= 0 else (pos_y - map_y) * delta_y
+
+        # Read cells straight out of the current chunk's arrays; only look the
+        # chunk up again when the ray leaves it
+        chunk_x, chunk_y = map_x // size, map_y // size
+        chunk = self.get_chunk(chunk_x, chunk_y)
+        max_cells = max_distance / cell_size
+        distance = 0.0
+        while distance <= max_cells:
+            if side_x < side_y:
+                distance = side_x
+                side_x += delta_x
+                map_x += step_x
+                side = 0
+            else:
+                distance = side_y
+                side_y += delta_y
+                map_y += step_y
+                side = 1
+
+            if map_x // size != chunk_x or map_y // size != chunk_y:
+                chunk_x, chunk_y = map_x // size, map_y // size
+                chunk = self.get_chunk(chunk_x, chunk_y)
+
+            local_x, local_y = map_x - chunk_x * size, map_y - chunk_y * size
+            if chunk.cells[local_y, local_x] == 1:
+                if distance > max_cells:
+                    break
+                return distance * cell_size, side, int(chunk.textures[local_y, local_x])
+
+        return None
+
+    def prefetch(self, x, y, angle, chunks=PREFETCH_CHUNKS):
+        """Queue the chunks along the player's heading, and either side of it, for the prefetch thread"""
+        size = self.chunk_size * self.cell_size
+        chunk_x, chunk_y = math.floor(x / size), math.floor(y / size)
+        step_x, step_y = math.cos(angle), math.sin(angle)
+
+        wanted = []
+        for ahead in range(chunks + 1):
+            center_x = math.floor(x / size + step_x * ahead)
+            center_y = math.floor(y / size + step_y * ahead)
+            for offset_x, offset_y in ((0, 0), (1, 0), (-1, 0), (0, 1), (0, -1)):
+                key = (center_x + offset_x, center_y + offset_y)
+                if abs(key[0] - chunk_x) <= chunks + 1 and abs(key[1] - chunk_y) <= chunks + 1:
+                    wanted.append(key)
+
+        with self.lock:
+            wanted = [key for key in dict.fromkeys(wanted) if key not in self.chunks and key not in self.pending]
+            self.pending.update(wanted)
+        for key in wanted:
+            self.prefetch_queue.put(key)
+
+    def start(self):
+        """Start the background prefetch thread"""
+        if self.prefetch_thread is not None:
+            return
+        self.running = True
+        self.prefetch_thread = threading.Thread(target=self._prefetch_worker, daemon=True)
+        self.prefetch_thread.start()
+
+    def stop(self):
+        """Stop the background prefetch thread"""
+        if self.prefetch_thread is None:
+            return
+        self.running = False
+        self.prefetch_queue.put(None)
+        self.prefetch_thread.join()
+        self.prefetch_thread = None
+
+    def _prefetch_worker(self):
+        """Generate queued chunks until stopped"""
+        while self.running:
+            key = self.prefetch_queue.get()
+            if key is None:
+                break
+            self.get_chunk(*key)
+            with self.lock:
+                self.pending.discard(key)
+
+    def memory_usage(self):
+        """Bytes held by resident chunks"""
+        with self.lock:
+            return sum(chunk.cells.nbytes + chunk.textures.nbytes for chunk in self.chunks.values())
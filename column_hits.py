@@ -0,0 +1,103 @@
+import math
+import numpy as np
+from occupancy_pyramid import pyramid_step
+
+# Most hits kept for one screen column
+MAX_COLUMN_HITS = 8
+
+# Fields of one recorded hit, the last axis of a hit array
+HIT_DISTANCE = 0     # Distance along the ray, in cells
+HIT_CODE = 1         # Cell code that was hit
+HIT_WALL_X = 2       # Where across the face the ray hit, 0-1, for texturing
+HIT_TOP = 3          # Projected top row of the whole wall
+HIT_BOTTOM = 4       # Projected bottom row of the whole wall
+HIT_CLIP_TOP = 5     # First row of it left visible by nearer walls
+HIT_CLIP_BOTTOM = 6  # Row just past the last visible one
+HIT_FIELDS = 7
+
+
+def wall_heights(cells, height=1.0, heights=None):
+    """Per-cell wall heights for a grid: height everywhere, overridden by a {code: height} dict"""
+    cells = np.asarray(cells)
+    grid = np.full(cells.shape, height, dtype=np.float32)
+    for code, code_height in (heights or {}).items():
+        grid[cells == code] = code_height
+    return grid
+
+
+def see_through_codes(codes):
+    """Lookup table, indexed by cell code, of the codes rays carry on through"""
+    table = np.zeros(256, dtype=np.bool_)
+    table[list(codes)] = True
+    return table
+
+
+def column_hits(levels, heights, see_through, x, y, dir_x, dir_y, max_distance,
+                screen_height, eye_height, max_height, hits):
+    """
+    Walk one ray through a max occupancy pyramid (see hierarchical_dda())
+    and record, front to back, every wall it passes that shows on screen.
+
+    Walls stand on the floor and are heights[cell_y, cell_x] cells tall,
+    viewed from eye_height; a wall at distance d spans rows
+    screen_height / 2 + (eye_height - z) * screen_height / d for z from its
+    height down to 0. The column keeps a coverage buffer: rows from
+    open_bottom down are hidden behind nearer opaque walls, and each opaque
+    wall pulls open_bottom up to its top. Cells flagged in see_through
+    (indexed by cell code) are recorded but hide nothing. The walk stops
+    once nothing max_height tall further on could show above open_bottom,
+    or when hits (capacity x HIT_FIELDS) is full; walls hidden entirely
+    are not recorded. Returns the number of hits written.
+    Plain Python that Numba can compile as-is.
+    """
+    base = levels[0]
+    grid_height, grid_width = base.shape
+    capacity = hits.shape[0]
+    horizon = screen_height / 2.0
+    inv_x = 1.0 / dir_x if dir_x != 0 else math.inf
+    inv_y = 1.0 / dir_y if dir_y != 0 else math.inf
+
+    open_bottom = float(screen_height)
+    count = 0
+    cell_x = int(math.floor(x))
+    cell_y = int(math.floor(y))
+    distance = 0.0
+    side = -1
+    while distance <= max_distance:
+        if cell_x < 0 or cell_x >= grid_width or cell_y < 0 or cell_y >= grid_height:
+            break
+        code = base[cell_y, cell_x]
+        if side >= 0 and code != 0 and distance > 0:
+            scale = screen_height / distance
+            wall_top = horizon + (eye_height - heights[cell_y, cell_x]) * scale
+            wall_bottom = horizon + eye_height * scale
+            clip_top = max(wall_top, 0.0)
+            clip_bottom = min(wall_bottom, open_bottom)
+            if clip_bottom - clip_top >= 1.0:
+                if side == 0:
+                    wall_x = y + distance * dir_y
+                else:
+                    wall_x = x + distance * dir_x
+                wall_x -= math.floor(wall_x)
+                if (side == 0 and dir_x > 0) or (side == 1 and dir_y < 0):
+                    wall_x = 1.0 - wall_x
+                hits[count, HIT_DISTANCE] = distance
+                hits[count, HIT_CODE] = code
+                hits[count, HIT_WALL_X] = wall_x
+                hits[count, HIT_TOP] = wall_top
+                hits[count, HIT_BOTTOM] = wall_bottom
+                hits[count, HIT_CLIP_TOP] = clip_top
+                hits[count, HIT_CLIP_BOTTOM] = clip_bottom
+                count += 1
+                if count == capacity:
+                    break
+            if not see_through[code]:
+                open_bottom = min(open_bottom, max(wall_top, 0.0))
+            # Everything further on is at least this far away
+            if open_bottom <= max(0.0, horizon + (eye_height - max_height) * scale):
+                break
+
+        # Cross the largest empty block around the cell in one step
+        distance, cell_x, cell_y, side = pyramid_step(levels, x, y, dir_x, dir_y, inv_x, inv_y, cell_x, cell_y)
+
+    return count
@@ -0,0 +1,44 @@
+import numpy as np
+
+# Distances are capped here; rays never skip more than this many cells at once
+MAX_SKIP_CELLS = 32
+
+
+def chebyshev_distance(blocked, max_distance=MAX_SKIP_CELLS):
+    """
+    Chebyshev (chessboard) distance transform of a boolean grid.
+
+    Returns a uint8 array holding 0 on blocked cells and, on every other cell,
+    the ring number of the nearest blocked cell: 1 if one of its 8 neighbours
+    is blocked, 2 if the nearest is two rings out, and so on, capped at
+    max_distance. Everything outside the grid counts as blocked.
+    """
+    height, width = blocked.shape
+    distance = np.full((height, width), max_distance, dtype=np.uint8)
+
+    # Grow the blocked area one ring at a time; cells reached in pass k are k rings out
+    reached = np.pad(np.asarray(blocked, dtype=bool), 1, constant_values=True)
+    distance[reached[1:-1, 1:-1]] = 0
+    for ring in range(1, max_distance):
+        rows = reached.copy()
+        rows[:, 1:] |= reached[:, :-1]
+        rows[:, :-1] |= reached[:, 1:]
+        grown = rows.copy()
+        grown[1:] |= rows[:-1]
+        grown[:-1] |= rows[1:]
+
+        new = grown & ~reached
+        if not new.any():
+            break
+        distance[new[1:-1, 1:-1]] = ring
+        reached = grown
+
+    return distance
+
+
+def safe_step(distance_field, cell_x, cell_y):
+    """
+    How far, in cells, a ray anywhere inside the given cell can travel in a
+    straight line without entering a blocked cell (0 when next to one)
+    """
+    return max(0, int(distance_field[cell_y, cell_x]) - 1)
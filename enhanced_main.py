@@ -5,6 +5,7 @@ import random
 import time
 from trippy_effects import TrippyEffects
 from non_euclidean_map import NonEuclideanMap
+from light_tables import build_light_table, light_level
 
 # Initialize Pygame
 pygame.init()
@@ -96,7 +97,11 @@ textures = [
     create_texture(WHITE, GRAY, "psychedelic")
 ]
 
-# Function to cast a ray and find the distance to a wall
+# Pre-shaded texels for distance shading: texture_light_tables[wall][level, y * texture_width + x]
+texture_light_tables = [build_light_table(texture) for texture in textures]
+
+# Function to cast a ray and find the distance to a wall; the angle already
+# carries this frame's ray distortion
 def cast_ray(angle, player_pos_x, player_pos_y):
     # Normalize angle
     angle = angle % (2 * math.pi)
@@ -119,16 +124,9 @@ def cast_ray(angle, player_pos_x, player_pos_y):
     
     # Cast the ray with distortion
     while distance < MAX_DEPTH * CELL_SIZE:
-        # Only apply distortion every few steps for better performance
-        if distance % 30 < 0.1 or distance < 1:
-            # Apply distortion to the ray direction
-            distorted_angle = angle + effects.apply_ray_distortion(angle, distance / CELL_SIZE)
-            
-            # Add map-based distortion (less frequently)
-            if distance % 60 < 0.1:
-                map_distortion = map_generator.get_distortion(pos_x, pos_y, angle, distance)
-                distorted_angle += map_distortion
-            
+        # Add map-based distortion (only every few steps for better performance)
+        if distance % 60 < 0.1:
+            distorted_angle = angle + map_generator.get_distortion(pos_x, pos_y, angle, distance)
             dir_x = math.cos(distorted_angle)
             dir_y = math.sin(distorted_angle)
         
@@ -136,6 +134,9 @@ def cast_ray(angle, player_pos_x, player_pos_y):
         step_size = base_step_size + (distance / CELL_SIZE)
         step_size = min(step_size, 20)  # Cap at reasonable maximum
         
+        # Open space: jump straight to the edge of the nearest wall, portal or impossible space
+        step_size = max(step_size, map_generator.safe_distance(pos_x, pos_y))
+        
         # Move the ray
         pos_x += dir_x * step_size
         pos_y += dir_y * step_size
@@ -215,14 +216,18 @@ def render_3d_view(fps=0):
     
     # Cast rays for each column of the screen
     ray_histories = []
+    slices = []
 
     # Optimize by casting rays at intervals and interpolating between them
-    for x in range(0, WIDTH, 2):
-        # Calculate the ray angle with FOV distortion
-        ray_angle = (player_angle - math.radians(current_fov / 2)) + (x / WIDTH) * math.radians(current_fov)
-        
+    columns = np.arange(0, WIDTH, 2)
+    
+    # Ray angles with FOV distortion, and the trippy ray distortion for the whole frame at once
+    ray_angles = (player_angle - math.radians(current_fov / 2)) + columns / WIDTH * math.radians(current_fov)
+    distorted_angles = effects.apply_ray_distortion_array(ray_angles, 0.0)
+    
+    for x, ray_angle, distorted_angle in zip(columns.tolist(), ray_angles.tolist(), distorted_angles.tolist()):
         # Cast the ray
-        distance, ray_history, texture_x, wall_type = cast_ray(ray_angle, player_x, player_y)
+        distance, ray_history, texture_x, wall_type = cast_ray(distorted_angle, player_x, player_y)
         ray_histories.append(ray_history)
         
         # Apply fish-eye correction
@@ -235,40 +240,26 @@ def render_3d_view(fps=0):
         wall_top = max(0, HALF_HEIGHT - wall_height // 2)
         wall_bottom = min(HEIGHT, HALF_HEIGHT + wall_height // 2)
         
-        # Get the texture for this wall
-        texture = textures[wall_type % len(textures)]
+        # Get the pre-shaded texture for this wall at this distance
+        light_table = texture_light_tables[wall_type % len(textures)]
+        shaded = light_table[light_level(distance, MAX_DEPTH * CELL_SIZE, len(light_table))]
         
-        # Draw the textured wall slice
-        # Optimize by drawing vertical lines instead of individual pixels
         height = int(wall_bottom - wall_top)
         if height > 0:
-            # Create a small surface for this wall slice
-            slice_surf = pygame.Surface((2, height))
-            
-            # Draw the textured wall slice
-            for y in range(height):
-                # Calculate texture y-coordinate
-                texture_y = int((y / height) * texture_height)
-                
-                # Get the texture color
-                color = texture[texture_y, texture_x]
-                
-                # Apply distance shading and trippy effects
-                shade = 1.0 - min(1.0, distance / (MAX_DEPTH * CELL_SIZE))
-                
-                # Apply trippy color effects (but only sometimes to improve performance)
-                if x % 4 == 0:  # Apply effects to every 4th column
-                    color = effects.apply_color_distortion(color, distance, ray_angle)
-                
-                # Apply distance shading
-                color = tuple(int(c * shade) for c in color)
-                
-                # Draw the pixel
-                slice_surf.set_at((0, y), color)
-                slice_surf.set_at((1, y), color)  # Also draw to the next column
+            # Sample the whole texture column at once
+            texture_y = (np.arange(height) / height * texture_height).astype(np.intp)
+            colors = shaded[texture_y * texture_width + texture_x]
             
-            # Blit the slice to the main surface
-            view_surface.blit(slice_surf, (x, int(wall_top)))
+            slices.append((x, int(wall_top), distance, ray_angle, colors))
+    
+    # Apply trippy color effects to every 4th (already shaded) column in a single batch
+    slices = effects.apply_color_distortion_columns(slices, 4)
+    
+    # Draw the textured wall slices, two columns wide
+    for x, wall_top, _, _, colors in slices:
+        # Blit the slice to the main surface
+        slice_surf = pygame.surfarray.make_surface(np.repeat(colors[np.newaxis], 2, axis=0))
+        view_surface.blit(slice_surf, (x, wall_top))
     
     # Apply visual effects only if FPS is above threshold to prevent slowdowns
     if fps > 15 or fps == 0:  # Apply when FPS unknown (first frame) or good enough
@@ -290,7 +281,7 @@ def render_3d_view(fps=0):
     # Draw walls on minimap
     for y in range(map_generator.height):
         for x in range(map_generator.width):
-            if map_generator.grid[y][x] == 1:
+            if map_generator.is_solid_cell(x, y):
                 pygame.draw.rect(
                     minimap_surface,
                     WHITE,
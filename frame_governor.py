@@ -0,0 +1,22 @@
+class FrameGovernor:
+    """
+    Holds an optional per-frame work budget (mirror bounces, portal ray
+    segments, ...) at whatever the frame time allows. A frame over the
+    target halves the budget; every frame under it grows the budget back by
+    a fixed step, so a spike backs off at once and recovers gradually.
+    """
+
+    def __init__(self, target_ms, budget, minimum=0, maximum=None, step=None):
+        self.target_ms = target_ms
+        self.minimum = minimum
+        self.maximum = budget if maximum is None else maximum
+        self.step = step if step is not None else max(1, self.maximum // 32)
+        self.budget = budget
+
+    def update(self, frame_ms):
+        """Adjust the budget after a frame that took frame_ms of work, and return it"""
+        if frame_ms > self.target_ms:
+            self.budget = max(self.minimum, self.budget // 2)
+        else:
+            self.budget = min(self.maximum, self.budget + self.step)
+        return self.budget
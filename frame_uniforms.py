@@ -0,0 +1,69 @@
+import math
+import time
+from dataclasses import dataclass, field
+
+# Angular rates (per second of game time) of the time-only sinusoids the
+# engines and effects use, e.g. math.sin(time.time() * 3).  All of them are
+# evaluated once per frame by FrameUniforms.capture().
+SINUSOID_RATES = (0.1, 0.2, 0.3, 0.5, 1.0, 1.5, 2.0, 2.5, 3.0, 4.0, 5.0, 6.0, 7.0, 7.5)
+
+
+@dataclass(frozen=True)
+class FrameUniforms:
+    """
+    Immutable snapshot of everything a frame reads that does not change
+    while the frame is being drawn: the clock, the player state and the
+    time-only sinusoid terms derived from them.
+
+    Build one per frame with capture() and pass it down to the raycasters
+    and effects instead of calling time.time() or reading player_state
+    inside per-column loops.  Capturing with a recorded time reproduces
+    the same frame, which is what replay relies on.
+    """
+    time: float = 0.0
+    reality_level: float = 1.0
+    gravity_direction: int = 0
+    current_space: object = None
+    in_normal_space: bool = True
+    pulse_time: float = 0.0
+    sin_table: dict = field(default_factory=dict, repr=False)
+    cos_table: dict = field(default_factory=dict, repr=False)
+    pulse_sin: float = 0.0
+
+    @classmethod
+    def capture(cls, now=None, player_state=None, pulse_time=0.0, rates=SINUSOID_RATES):
+        """Snapshot the clock and player state for the frame about to be drawn"""
+        if now is None:
+            now = time.time()
+        state = player_state or {}
+
+        return cls(
+            time=now,
+            reality_level=state.get('reality_level', 1.0),
+            gravity_direction=state.get('gravity_direction', 0),
+            current_space=state.get('current_space'),
+            in_normal_space=state.get('in_normal_space', True),
+            pulse_time=pulse_time,
+            sin_table={rate: math.sin(now * rate) for rate in rates},
+            cos_table={rate: math.cos(now * rate) for rate in rates},
+            pulse_sin=math.sin(pulse_time),
+        )
+
+    @property
+    def reality_distortion(self):
+        """How far the current space is from normal reality (0.0 to 1.0)"""
+        return 1.0 - self.reality_level
+
+    def sin(self, rate):
+        """sin(time * rate), precomputed for the rates in SINUSOID_RATES"""
+        value = self.sin_table.get(rate)
+        if value is None:
+            value = math.sin(self.time * rate)
+        return value
+
+    def cos(self, rate):
+        """cos(time * rate), precomputed for the rates in SINUSOID_RATES"""
+        value = self.cos_table.get(rate)
+        if value is None:
+            value = math.cos(self.time * rate)
+        return value
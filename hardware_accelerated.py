@@ -8,6 +8,7 @@ import multiprocessing
 from concurrent.futures import ThreadPoolExecutor
 from trippy_effects import TrippyEffects
 from non_euclidean_map import NonEuclideanMap
+from light_tables import build_light_table, light_level
 
 # Initialize Pygame with hardware acceleration
 pygame.init()
@@ -102,6 +103,9 @@ textures = [
     create_texture(WHITE, GRAY, "psychedelic")
 ]
 
+# Pre-shaded texels for distance shading: texture_light_tables[wall][level, y * texture_width + x]
+texture_light_tables = [build_light_table(texture) for texture in textures]
+
 # Pre-compute sin and cos values for performance
 sin_table = np.array([math.sin(math.radians(i)) for i in range(360)], dtype=np.float32)
 cos_table = np.array([math.cos(math.radians(i)) for i in range(360)], dtype=np.float32)
@@ -116,7 +120,8 @@ def fast_cos(angle):
     index = int(math.degrees(angle) % 360)
     return cos_table[index]
 
-# Function to cast a ray and find the distance to a wall
+# Function to cast a ray and find the distance to a wall; the angle already
+# carries this frame's ray distortion
 def cast_ray(angle, player_pos_x, player_pos_y):
     # Normalize angle
     angle = angle % (2 * math.pi)
@@ -137,18 +142,14 @@ def cast_ray(angle, player_pos_x, player_pos_y):
     # Use larger step size for better performance
     base_step_size = 10
     
+    # Last cell whose impossible space, if any, has been traced
+    traced_cell = None
+    
     # Cast the ray with distortion
     while distance < MAX_DEPTH * CELL_SIZE:
-        # Only apply distortion every few steps for better performance
-        if distance % 30 < 0.1 or distance < 1:
-            # Apply distortion to the ray direction
-            distorted_angle = angle + effects.apply_ray_distortion(angle, distance / CELL_SIZE)
-            
-            # Add map-based distortion (less frequently)
-            if distance % 60 < 0.1:
-                map_distortion = map_generator.get_distortion(pos_x, pos_y, angle, distance)
-                distorted_angle += map_distortion
-            
+        # Add map-based distortion (only every few steps for better performance)
+        if distance % 60 < 0.1:
+            distorted_angle = angle + map_generator.get_distortion(pos_x, pos_y, angle, distance)
             dir_x = fast_cos(distorted_angle)
             dir_y = fast_sin(distorted_angle)
         
@@ -156,6 +157,9 @@ def cast_ray(angle, player_pos_x, player_pos_y):
         step_size = base_step_size + (distance / CELL_SIZE)
         step_size = min(step_size, 20)  # Cap at reasonable maximum
         
+        # Open space: jump straight to the edge of the nearest wall, portal or impossible space
+        step_size = max(step_size, map_generator.safe_distance(pos_x, pos_y))
+        
         # Move the ray
         pos_x += dir_x * step_size
         pos_y += dir_y * step_size
@@ -197,26 +201,48 @@ def cast_ray(angle, player_pos_x, player_pos_y):
                 wall_type = texture_id
             
             return distance, ray_history, texture_x, wall_type
-        elif distance % 30 < step_size and map_generator.is_in_impossible_space(pos_x, pos_y):
-            # Check impossible spaces less frequently
-            # Use a default texture for impossible spaces
-            texture_x = int((pos_x % CELL_SIZE) / CELL_SIZE * texture_width)
+        
+        # Impossible space: follow the ray through its inner grid, scaled into
+        # the cell, once on the first step into each cell
+        cell = (int(pos_x // CELL_SIZE), int(pos_y // CELL_SIZE))
+        if cell == traced_cell:
+            continue
+        traced_cell = cell
+        traced = map_generator.trace_impossible_space(pos_x, pos_y, dir_x, dir_y)
+        if traced is None:
+            continue
+        inner_distance, side, hit = traced
+        if hit and inner_distance >= -step_size:
+            # The step usually overshoots the inner wall, so move back to it
+            pos_x += dir_x * inner_distance
+            pos_y += dir_y * inner_distance
+            distance += inner_distance
+            
+            # Texture coordinate along the inner wall face
+            if side == 0:
+                texture_x = int((pos_y % CELL_SIZE) / CELL_SIZE * texture_width)
+            else:
+                texture_x = int((pos_x % CELL_SIZE) / CELL_SIZE * texture_width)
             wall_type = 3  # Use the psychedelic texture for impossible spaces
             
             return distance, ray_history, texture_x, wall_type
+        elif not hit and inner_distance >= 0:
+            # Out the other side: carry on in the outer grid from the exit point
+            pos_x += dir_x * inner_distance
+            pos_y += dir_y * inner_distance
+            distance += inner_distance
     
     # If we didn't hit anything, return maximum distance
     return MAX_DEPTH * CELL_SIZE, ray_history, 0, 0
 
 # Function to process a batch of rays in parallel
-def process_ray_batch(start_x, end_x, player_angle, current_fov, player_x, player_y):
+def process_ray_batch(start_x, end_x, ray_angles, distorted_angles, player_angle, player_x, player_y):
     results = []
     for x in range(start_x, end_x):
-        # Calculate the ray angle with FOV distortion
-        ray_angle = (player_angle - math.radians(current_fov / 2)) + (x / WIDTH) * math.radians(current_fov)
+        ray_angle = float(ray_angles[x])
         
         # Cast the ray
-        distance, ray_history, texture_x, wall_type = cast_ray(ray_angle, player_x, player_y)
+        distance, ray_history, texture_x, wall_type = cast_ray(float(distorted_angles[x]), player_x, player_y)
         
         # Apply fish-eye correction
         distance = distance * math.cos(ray_angle - player_angle)
@@ -258,6 +284,10 @@ def render_3d_view(fps=0):
     fov_distortion = effects.get_fov_distortion()
     current_fov = FOV + fov_distortion
     
+    # Ray angles with FOV distortion, and the trippy ray distortion for the whole frame at once
+    ray_angles = (player_angle - math.radians(current_fov / 2)) + np.arange(WIDTH) / WIDTH * math.radians(current_fov)
+    distorted_angles = effects.apply_ray_distortion_array(ray_angles, 0.0)
+    
     # Divide the screen into batches for multithreading
     batch_size = WIDTH // NUM_THREADS
     batches = [(i * batch_size, min((i + 1) * batch_size, WIDTH)) for i in range(NUM_THREADS)]
@@ -265,7 +295,7 @@ def render_3d_view(fps=0):
     # Process ray batches in parallel
     ray_results = []
     with ThreadPoolExecutor(max_workers=NUM_THREADS) as executor:
-        futures = [executor.submit(process_ray_batch, start, end, player_angle, current_fov, player_x, player_y) 
+        futures = [executor.submit(process_ray_batch, start, end, ray_angles, distorted_angles, player_angle, player_x, player_y) 
                   for start, end in batches]
         
         for future in futures:
@@ -277,7 +307,8 @@ def render_3d_view(fps=0):
     # Extract ray histories for minimap
     ray_histories = [result[2] for result in ray_results]
     
-    # Create wall slices
+    # Gather the textured wall slices
+    slices = []
     for x, distance, _, texture_x, wall_type, ray_angle in ray_results:
         # Calculate wall height based on distance
         wall_height = (CELL_SIZE / distance) * ((WIDTH / 2) / math.tan(math.radians(HALF_FOV)))
@@ -286,38 +317,26 @@ def render_3d_view(fps=0):
         wall_top = max(0, HALF_HEIGHT - wall_height // 2)
         wall_bottom = min(HEIGHT, HALF_HEIGHT + wall_height // 2)
         
-        # Optimize by drawing vertical lines instead of individual pixels
         height = int(wall_bottom - wall_top)
         if height > 0:
-            # Create a small surface for this wall slice
-            slice_surf = pygame.Surface((1, height))
+            # Get the pre-shaded texture for this wall at this distance
+            light_table = texture_light_tables[wall_type % len(textures)]
+            shaded = light_table[light_level(distance, MAX_DEPTH * CELL_SIZE, len(light_table))]
             
-            # Get the texture for this wall
-            texture = textures[wall_type % len(textures)]
+            # Sample the whole texture column at once
+            texture_y = (np.arange(height) / height * texture_height).astype(np.intp)
+            colors = shaded[texture_y * texture_width + texture_x]
             
-            # Draw the textured wall slice
-            for y in range(height):
-                # Calculate texture y-coordinate
-                texture_y = int((y / height) * texture_height)
-                
-                # Get the texture color
-                color = texture[texture_y, texture_x]
-                
-                # Apply distance shading and trippy effects
-                shade = 1.0 - min(1.0, distance / (MAX_DEPTH * CELL_SIZE))
-                
-                # Apply trippy color effects (but only sometimes to improve performance)
-                if x % 4 == 0:  # Apply effects to every 4th column
-                    color = effects.apply_color_distortion(color, distance, ray_angle)
-                
-                # Apply distance shading
-                color = tuple(int(c * shade) for c in color)
-                
-                # Draw the pixel
-                slice_surf.set_at((0, y), color)
-            
-            # Blit the slice to the main surface
-            view_surface.blit(slice_surf, (x, int(wall_top)))
+            slices.append((x, int(wall_top), distance, ray_angle, colors))
+    
+    # Apply trippy color effects to every 4th (already shaded) column in a single batch
+    slices = effects.apply_color_distortion_columns(slices, 4)
+    
+    # Create wall slices
+    for x, wall_top, _, _, colors in slices:
+        # Blit the slice to the main surface
+        slice_surf = pygame.surfarray.make_surface(colors[np.newaxis])
+        view_surface.blit(slice_surf, (x, wall_top))
     
     # Apply visual effects only if FPS is above threshold to prevent slowdowns
     if fps > 20 or fps == 0:  # Apply when FPS unknown (first frame) or good enough
@@ -339,7 +358,7 @@ def render_3d_view(fps=0):
     # Draw walls on minimap
     for y in range(map_generator.height):
         for x in range(map_generator.width):
-            if map_generator.grid[y][x] == 1:
+            if map_generator.is_solid_cell(x, y):
                 pygame.draw.rect(
                     minimap_surface,
                     WHITE,
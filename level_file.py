@@ -0,0 +1,77 @@
+import json
+import struct
+import numpy as np
+
+# Baked level file layout:
+#   magic (8 bytes) | format version (uint32) | table length (uint32) | table (JSON)
+#   followed by each array's raw little-endian bytes, starting on a page boundary.
+# The table holds the level's scalar metadata and, per array, its dtype, shape
+# and byte offset, so read_level() can hand back np.memmap views without
+# copying anything and several processes mapping the same file share pages.
+LEVEL_MAGIC = b'NEMLEVEL'
+LEVEL_FORMAT_VERSION = 1
+LEVEL_ALIGNMENT = 4096
+
+_HEADER = struct.Struct('<8sII')
+
+
+def _align(offset):
+    return -(-offset // LEVEL_ALIGNMENT) * LEVEL_ALIGNMENT
+
+
+def write_level(path, arrays, meta=None):
+    """
+    Write a dict of arrays and a dict of JSON-serializable metadata to a
+    baked level file.
+    """
+    arrays = {name: np.ascontiguousarray(array, dtype=np.asarray(array).dtype.newbyteorder('<'))
+              for name, array in arrays.items()}
+
+    # Lay the arrays out after the table; the table size depends on the
+    # offsets, so grow the reserved space until the layout fits
+    reserved = LEVEL_ALIGNMENT
+    while True:
+        offset = reserved
+        table = {'meta': meta or {}, 'arrays': {}}
+        for name, array in arrays.items():
+            table['arrays'][name] = {'dtype': array.dtype.str, 'shape': list(array.shape), 'offset': offset}
+            offset = _align(offset + array.nbytes)
+        encoded = json.dumps(table).encode('utf-8')
+        if _HEADER.size + len(encoded) <= reserved:
+            break
+        reserved = _align(_HEADER.size + len(encoded))
+
+    with open(path, 'wb') as level:
+        level.write(_HEADER.pack(LEVEL_MAGIC, LEVEL_FORMAT_VERSION, len(encoded)))
+        level.write(encoded)
+        for name, array in arrays.items():
+            level.seek(table['arrays'][name]['offset'])
+            level.write(array.tobytes())
+        level.truncate(max(reserved, offset))
+
+
+def read_level(path):
+    """
+    Map a baked level file written by write_level().
+    Returns (meta, arrays) where every array is a read-only np.memmap.
+    """
+    with open(path, 'rb') as level:
+        magic, version, length = _HEADER.unpack(level.read(_HEADER.size))
+        if magic != LEVEL_MAGIC:
+            raise ValueError(f"{path} is not a baked level file")
+        if version != LEVEL_FORMAT_VERSION:
+            raise ValueError(f"{path} has level format version {version}, expected {LEVEL_FORMAT_VERSION}")
+        table = json.loads(level.read(length).decode('utf-8'))
+
+    arrays = {}
+    for name, entry in table['arrays'].items():
+        dtype, shape = np.dtype(entry['dtype']), tuple(entry['shape'])
+        if np.prod(shape) == 0:
+            # mmap cannot map zero bytes
+            array = np.zeros(shape, dtype=dtype)
+            array.flags.writeable = False
+        else:
+            array = np.memmap(path, dtype=dtype, mode='r', offset=entry['offset'], shape=shape)
+        arrays[name] = array
+
+    return table['meta'], arrays
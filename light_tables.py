@@ -0,0 +1,26 @@
+import numpy as np
+
+# Number of distance shading steps, from black (0) to full brightness
+LIGHT_LEVELS = 32
+
+
+def build_light_table(texture, levels=LIGHT_LEVELS):
+    """
+    Pre-shade every texel of a texture at each light level, Doom colormap style.
+    Returns a (levels, texels, 3) uint8 array; texel index is y * texture_width + x.
+    A list of flat colors works too, with one texel per color.
+    """
+    texels = np.asarray(texture, dtype=np.float64).reshape(-1, 3)
+    shades = np.arange(levels) / (levels - 1)
+    return (shades[:, np.newaxis, np.newaxis] * texels[np.newaxis]).astype(np.uint8)
+
+
+def light_level(distance, max_distance, levels=LIGHT_LEVELS):
+    """Quantized light level for a distance: levels - 1 up close, 0 at max_distance and beyond"""
+    return int((1.0 - min(1.0, distance / max_distance)) * (levels - 1) + 0.5)
+
+
+def light_levels(distances, max_distance, levels=LIGHT_LEVELS):
+    """Array version of light_level"""
+    shade = 1.0 - np.minimum(1.0, np.asarray(distances) / max_distance)
+    return (shade * (levels - 1) + 0.5).astype(np.intp)
@@ -3,6 +3,9 @@ import numpy as np
 import math
 import random
 from collections import deque
+from light_tables import build_light_table, light_level
+from distance_field import chebyshev_distance, safe_step
+from cell_grid import CellGrid
 
 # Initialize Pygame
 pygame.init()
@@ -36,7 +39,7 @@ pygame.display.set_caption("Trippy Raycasting Engine")
 clock = pygame.time.Clock()
 
 # Create a simple map (1 = wall, 0 = empty space)
-MAP = [
+MAP = CellGrid.from_array([
     [1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1],
     [1, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 1],
     [1, 0, 0, 0, 0, 0, 0, 0, 0, 0, 1, 1, 1, 0, 0, 1],
@@ -53,10 +56,10 @@ MAP = [
     [1, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 1],
     [1, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 1],
     [1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1],
-]
+])
 
-MAP_WIDTH = len(MAP[0])
-MAP_HEIGHT = len(MAP)
+MAP_WIDTH = MAP.width
+MAP_HEIGHT = MAP.height
 
 # Player settings
 player_x = CELL_SIZE * 2
@@ -73,6 +76,12 @@ wave_frequency = 0.1  # Frequency of the sine wave for ray bending
 color_shift_speed = 0.02  # Speed of color shifting
 portal_positions = [(8, 8, 12, 3)]  # (x1, y1, x2, y2) pairs for portals
 
+# Distance from each cell to the nearest wall or portal, for skipping open space
+blocked_cells = MAP.solid_mask()
+for portal_x1, portal_y1, _, _ in portal_positions:
+    blocked_cells[portal_y1, portal_x1] = True
+EMPTY_DISTANCE = chebyshev_distance(blocked_cells)
+
 # Texture settings
 texture_width = 64
 texture_height = 64
@@ -114,15 +123,16 @@ textures = [
     create_texture(WHITE, GRAY, "checker")
 ]
 
+# Pre-shaded texels for distance shading: texture_light_tables[wall][level, y * texture_width + x]
+texture_light_tables = [build_light_table(texture) for texture in textures]
+
 # Function to check if a position is inside a wall
 def is_wall(x, y):
     map_x = int(x / CELL_SIZE)
     map_y = int(y / CELL_SIZE)
     
-    if map_x < 0 or map_x >= MAP_WIDTH or map_y < 0 or map_y >= MAP_HEIGHT:
-        return True
-    
-    return MAP[map_y][map_x] == 1
+    # Out of bounds counts as solid
+    return MAP.is_solid(map_x, map_y)
 
 # Function to apply distortion to a ray angle
 def apply_distortion(angle, distance, time):
@@ -170,8 +180,12 @@ def cast_ray(angle, player_pos_x, player_pos_y):
         dir_x = math.cos(distorted_angle)
         dir_y = math.sin(distorted_angle)
         
-        # Step size (smaller steps for more accurate distortion)
+        # Step size (smaller steps for more accurate distortion), or a jump
+        # straight across open space when the nearest wall is further away
         step_size = 5
+        map_x, map_y = int(pos_x / CELL_SIZE), int(pos_y / CELL_SIZE)
+        if 0 <= map_x < MAP_WIDTH and 0 <= map_y < MAP_HEIGHT:
+            step_size = max(step_size, safe_step(EMPTY_DISTANCE, map_x, map_y) * CELL_SIZE)
         
         # Move the ray
         pos_x += dir_x * step_size
@@ -258,31 +272,24 @@ def render_3d_view():
         wall_top = max(0, HALF_HEIGHT - wall_height // 2)
         wall_bottom = min(HEIGHT, HALF_HEIGHT + wall_height // 2)
         
-        # Get the texture for this wall
-        texture = textures[wall_type]
+        # Get the pre-shaded texture for this wall at this distance
+        light_table = texture_light_tables[wall_type]
+        shaded = light_table[light_level(distance, MAX_DEPTH * CELL_SIZE, len(light_table))]
         
         # Draw the textured wall slice
-        for y in range(int(wall_top), int(wall_bottom)):
-            # Calculate texture y-coordinate
-            texture_y = int((y - wall_top) / (wall_bottom - wall_top) * texture_height)
-            
-            # Get the texture color
-            color = texture[texture_y, texture_x]
-            
-            # Apply distance shading and trippy effects
-            shade = 1.0 - min(1.0, distance / (MAX_DEPTH * CELL_SIZE))
+        ys = np.arange(int(wall_top), int(wall_bottom))
+        if len(ys) > 0:
+            # Calculate texture y-coordinates and look up the shaded colors
+            texture_y = ((ys - wall_top) / (wall_bottom - wall_top) * texture_height).astype(np.intp)
+            colors = shaded[texture_y * texture_width + texture_x]
             
             # Apply color shifting if distortion is enabled
             if distortion_enabled:
-                r = int(color[0] * shade * (1 + color_shift * 0.3))
-                g = int(color[1] * shade * (1 + (1 - color_shift) * 0.3))
-                b = int(color[2] * shade)
-                color = (min(255, r), min(255, g), min(255, b))
-            else:
-                color = tuple(int(c * shade) for c in color)
+                tint = np.array([1 + color_shift * 0.3, 1 + (1 - color_shift) * 0.3, 1])
+                colors = np.minimum(255, colors * tint).astype(np.uint8)
             
-            # Draw the pixel
-            screen.set_at((x, y), color)
+            # Draw the slice
+            screen.blit(pygame.surfarray.make_surface(colors[np.newaxis]), (x, int(wall_top)))
     
     # Draw a minimap in the corner
     minimap_size = 150
@@ -293,7 +300,7 @@ def render_3d_view():
     # Draw walls on minimap
     for y in range(MAP_HEIGHT):
         for x in range(MAP_WIDTH):
-            if MAP[y][x] == 1:
+            if MAP.is_solid(x, y):
                 pygame.draw.rect(
                     minimap_surface,
                     WHITE,
@@ -0,0 +1,88 @@
+import numpy as np
+from cell_grid import WallType
+
+# Most times a single ray may bounce between mirrors
+MAX_BOUNCES = 4
+
+
+def cast_reflecting_rays(cells, x, y, dir_x, dir_y, max_distance,
+                         bounce_budget, max_bounces=MAX_BOUNCES, mirror=WallType.MIRROR):
+    """
+    Cast a batch of rays through a grid in which mirror cells reflect.
+
+    Every ray is one lane of a cell-by-cell DDA run on whole arrays at once,
+    so bounces are just per-lane state: a ray reaching a mirror face has its
+    step along that axis reversed and carries on from the cell it came from.
+    Mirrors act as flat, axis-aligned faces. Each bounce is paid for from
+    bounce_budget, shared by all lanes and handed out in lane order; once it
+    or a ray's own max_bounces runs out, mirrors stop rays like any wall.
+
+    x and y are the shared ray origin, dir_x and dir_y per-lane directions,
+    all in cell units. Returns (distance, cell_x, cell_y, side, bounces,
+    bounce_budget): the total path length to the cell each ray stopped in,
+    with side 0 for an x crossing and 1 for a y crossing, and whatever is
+    left of the budget. Rays that leave the grid stop on the cell just
+    outside it; rays that go too far get max_distance and cell -1.
+    """
+    height, width = cells.shape
+    dir_x = np.asarray(dir_x, dtype=np.float64)
+    dir_y = np.asarray(dir_y, dtype=np.float64)
+    lanes = len(dir_x)
+
+    cell_x = np.full(lanes, int(np.floor(x)), dtype=np.intp)
+    cell_y = np.full(lanes, int(np.floor(y)), dtype=np.intp)
+    with np.errstate(divide='ignore'):
+        delta_x = np.abs(1.0 / dir_x)
+        delta_y = np.abs(1.0 / dir_y)
+    step_x = np.where(dir_x >= 0, 1, -1)
+    step_y = np.where(dir_y >= 0, 1, -1)
+    side_x = np.where(dir_x >= 0, cell_x + 1.0 - x, x - cell_x) * delta_x
+    side_y = np.where(dir_y >= 0, cell_y + 1.0 - y, y - cell_y) * delta_y
+
+    distance = np.full(lanes, float(max_distance))
+    hit_x = np.full(lanes, -1, dtype=np.intp)
+    hit_y = np.full(lanes, -1, dtype=np.intp)
+    side = np.full(lanes, -1, dtype=np.intp)
+    bounces = np.zeros(lanes, dtype=np.intp)
+
+    active = np.arange(lanes)
+    while active.size:
+        # One DDA step for every ray still going
+        along_x = side_x[active] < side_y[active]
+        t = np.where(along_x, side_x[active], side_y[active])
+        lanes_x = active[along_x]
+        lanes_y = active[~along_x]
+        side_x[lanes_x] += delta_x[lanes_x]
+        cell_x[lanes_x] += step_x[lanes_x]
+        side_y[lanes_y] += delta_y[lanes_y]
+        cell_y[lanes_y] += step_y[lanes_y]
+
+        cx = cell_x[active]
+        cy = cell_y[active]
+        far = t > max_distance
+        inside = (cx >= 0) & (cx < width) & (cy >= 0) & (cy < height) & ~far
+        code = np.zeros(active.size, dtype=cells.dtype)
+        code[inside] = cells[cy[inside], cx[inside]]
+
+        # Bounce off mirrors while the ray and the frame can still afford it
+        bouncing = (code == mirror) & inside & (bounces[active] < max_bounces)
+        bouncing &= np.cumsum(bouncing) <= bounce_budget
+        bounce_budget -= int(np.count_nonzero(bouncing))
+        reflect_x = active[bouncing & along_x]
+        reflect_y = active[bouncing & ~along_x]
+        cell_x[reflect_x] -= step_x[reflect_x]
+        step_x[reflect_x] *= -1
+        cell_y[reflect_y] -= step_y[reflect_y]
+        step_y[reflect_y] *= -1
+        bounces[active[bouncing]] += 1
+
+        # Stop on anything solid, on leaving the grid, or when out of range
+        stopped = ~far & ~bouncing & (~inside | (code != 0))
+        done = active[stopped]
+        distance[done] = t[stopped]
+        hit_x[done] = cx[stopped]
+        hit_y[done] = cy[stopped]
+        side[done] = np.where(along_x[stopped], 0, 1)
+        active = active[~(stopped | far)]
+
+    return distance, hit_x, hit_y, side, bounces, bounce_budget
@@ -0,0 +1,92 @@
+import math
+
+# Traversal of small inner grids drawn inside a single outer map cell: the
+# impossible spaces of a NonEuclideanMap and the bigger-on-the-inside rooms
+# behind a non-Euclidean entrance. The inner grid is scaled to fill the
+# cell, so a ray crossing the cell crosses the whole inner grid.
+
+
+def cell_entry(x, y, dir_x, dir_y, cell_x, cell_y):
+    """
+    Where a ray now at (x, y), inside cell (cell_x, cell_y), came into it,
+    in cell units. Returns (back, side): the distance back along the ray to
+    the cell's edge, and 0 if it came through an x side or 1 for a y side.
+    """
+    if dir_x > 0:
+        back_x = (x - cell_x) / dir_x
+    elif dir_x < 0:
+        back_x = (x - cell_x - 1) / dir_x
+    else:
+        back_x = math.inf
+    if dir_y > 0:
+        back_y = (y - cell_y) / dir_y
+    elif dir_y < 0:
+        back_y = (y - cell_y - 1) / dir_y
+    else:
+        back_y = math.inf
+    if back_x < back_y:
+        return back_x, 0
+    return back_y, 1
+
+
+def nested_dda(inner, width, height, x, y, dir_x, dir_y, side, test_entry=True):
+    """
+    Walk a ray through an inner grid scaled into one outer cell.
+
+    (x, y) is where the ray enters, in the cell's own 0-1 coordinates, side
+    the side it came in through (see cell_entry()), and inner[iy, ix] is
+    non-zero for solid inner cells in the top-left width x height corner.
+    With test_entry False the inner cell the ray comes in through is
+    passed over, for inner grids whose border ring is the cell's own walls.
+    Returns (distance, inner_x, inner_y, side) with the distance in outer
+    cell units for the first solid inner cell, or (distance, -1, -1, side)
+    for where the ray leaves the cell again.
+    Plain Python that Numba can compile as-is.
+    """
+    # Inner cell units: the ray parameter stays in outer cell units
+    gx = x * width
+    gy = y * height
+    step_dir_x = dir_x * width
+    step_dir_y = dir_y * height
+    cell_x = min(max(int(math.floor(gx)), 0), width - 1)
+    cell_y = min(max(int(math.floor(gy)), 0), height - 1)
+    if test_entry and inner[cell_y, cell_x] != 0:
+        return 0.0, cell_x, cell_y, side
+
+    delta_x = abs(1.0 / step_dir_x) if step_dir_x != 0 else math.inf
+    delta_y = abs(1.0 / step_dir_y) if step_dir_y != 0 else math.inf
+    step_x = 1 if step_dir_x >= 0 else -1
+    step_y = 1 if step_dir_y >= 0 else -1
+    side_x = (cell_x + 1.0 - gx) * delta_x if step_dir_x >= 0 else (gx - cell_x) * delta_x
+    side_y = (cell_y + 1.0 - gy) * delta_y if step_dir_y >= 0 else (gy - cell_y) * delta_y
+
+    while True:
+        if side_x < side_y:
+            distance = side_x
+            side_x += delta_x
+            cell_x += step_x
+            side = 0
+        else:
+            distance = side_y
+            side_y += delta_y
+            cell_y += step_y
+            side = 1
+
+        if cell_x < 0 or cell_x >= width or cell_y < 0 or cell_y >= height:
+            return distance, -1, -1, side
+        if inner[cell_y, cell_x] != 0:
+            return distance, cell_x, cell_y, side
+
+
+def trace_cell(inner, width, height, x, y, dir_x, dir_y, cell_x, cell_y, test_entry=True):
+    """
+    nested_dda() for a ray now at (x, y) somewhere inside outer cell
+    (cell_x, cell_y), all in cell units. The ray is traced from where it
+    came into the cell; the distance returned is measured from (x, y), so
+    it is negative for an inner wall the ray has already passed.
+    """
+    back, side = cell_entry(x, y, dir_x, dir_y, cell_x, cell_y)
+    distance, inner_x, inner_y, side = nested_dda(
+        inner, width, height, x - dir_x * back - cell_x, y - dir_y * back - cell_y,
+        dir_x, dir_y, side, test_entry)
+    return distance - back, inner_x, inner_y, side
@@ -1,6 +1,97 @@
 import random
 import math
+from collections import namedtuple
 import numpy as np
+from portal_index import PortalIndex
+from level_file import write_level, read_level
+from distance_field import chebyshev_distance, safe_step
+from occupancy_pyramid import OccupancyPyramid
+from cell_grid import WallType, pack_solid
+from nested_grid import trace_cell
+
+# Read-only struct-of-arrays snapshot of a NonEuclideanMap, see NonEuclideanMap.compile()
+CompiledMap = namedtuple('CompiledMap', [
+    'version',                   # Map version the snapshot was built from
+    'width', 'height', 'cell_size',
+    'cells',                     # uint8 (height, width) cell types
+    'solid_bits',                # uint8 (height, ceil(width / 8)) bit-packed non-empty cells
+    'textures',                  # uint8 (height, width) wall texture ids
+    'portal_cells',              # int32 (height, width) portal id, or -1
+    'portal_destinations',       # float64 (portals, 2) destination in world units
+    'portal_offsets',            # float64 (portals, 2) destination minus source
+    'portal_rotations',          # float64 (portals, 2, 2) rotation matrices
+    'impossible_resolution',     # Raster samples per cell along each axis
+    'impossible_cells',          # int32 (height, width) raster id, or -1
+    'impossible_rasters',        # bool (spaces, res, res) inner wall occupancy
+    'distortion_resolution',     # Baked field samples per cell along each axis
+    'distortion_coefficients',   # float32 (height*res+1, width*res+1, 5) baked field
+    'empty_distance',            # uint8 (height, width) Chebyshev distance to the nearest non-empty cell
+    'occupancy_levels',          # tuple of uint8 max occupancy pyramid levels, finest first
+])
+
+# Distortion field types, in the order their codes are stored in level files
+DISTORTION_FIELD_TYPES = ('vortex', 'expansion', 'sine_wave')
+
+# Most distortion field nodes the vectorized generator will bake; bigger maps
+# get a coarser field (fewer samples per cell) instead of more memory
+DISTORTION_NODE_BUDGET = 1 << 22
+
+
+def stamp_wall_segments(grid, rng, count):
+    """
+    Stamp `count` random horizontal and vertical wall segments of length 3-8
+    into a grid, keeping clear of its outermost cells.
+    """
+    height, width = grid.shape
+    horizontal = rng.random(count) < 0.5
+    length = rng.integers(3, 9, count)
+    x = np.where(horizontal, rng.integers(1, width - 2, count), rng.integers(1, width - 1, count))
+    y = np.where(horizontal, rng.integers(1, height - 1, count), rng.integers(1, height - 2, count))
+    length = np.minimum(length, np.where(horizontal, width - x - 1, height - y - 1))
+    
+    for i in range(8):
+        part = length > i
+        grid[y[part] + i * ~horizontal[part], x[part] + i * horizontal[part]] = 1
+
+
+def label_regions(mask):
+    """
+    Label the 4-connected regions of a boolean grid.
+    Returns an int array where every True cell holds the flat index of the
+    lowest cell in its region, and every False cell holds -1.
+    """
+    height, width = mask.shape
+    if not mask.any():
+        return np.full((height, width), -1, dtype=np.intp)
+    
+    # Number the horizontal runs of the mask; each run is one connected piece
+    run_start = mask.copy()
+    run_start[:, 1:] &= ~mask[:, :-1]
+    run_cell = np.flatnonzero(run_start)
+    run = (np.cumsum(run_start.ravel()) - 1).reshape(height, width)
+    
+    # Runs are joined where cells of two adjacent rows touch
+    down = mask[:-1] & mask[1:]
+    a, b = run[:-1][down], run[1:][down]
+    
+    # Hook the larger root of every edge under the smaller one, then flatten
+    # the trees by pointer jumping, until both ends of every edge agree
+    parent = np.arange(len(run_cell))
+    while len(a):
+        root_a, root_b = parent[a], parent[b]
+        differ = root_a != root_b
+        a, b, root_a, root_b = a[differ], b[differ], root_a[differ], root_b[differ]
+        parent[np.maximum(root_a, root_b)] = np.minimum(root_a, root_b)
+        while True:
+            grandparent = parent[parent]
+            if np.array_equal(grandparent, parent):
+                break
+            parent = grandparent
+    
+    # Roots are the lowest run of each region, so their first cell is the lowest cell
+    parent = run_cell[parent][run]
+    return np.where(mask, parent, -1)
+
 
 class NonEuclideanMap:
     """
@@ -8,28 +99,63 @@ class NonEuclideanMap:
     portals, and other reality-bending features.
     """
     
-    def __init__(self, width=16, height=16, cell_size=64):
+    def __init__(self, width=16, height=16, cell_size=64, seed=None, vectorized=False):
         self.width = width
         self.height = height
         self.cell_size = cell_size
         
-        # Initialize empty map (0 = empty, 1 = wall)
-        self.grid = np.ones((height, width), dtype=int)
+        # Initialize empty map of cell_grid.WallType codes (0 = empty, 1 = wall)
+        self.grid = np.ones((height, width), dtype=np.uint8)
+        
+        # Bit-packed copy of which cells are non-empty, see cell_grid.pack_solid()
+        self.solid_bits = None
         
         # Portal connections (x1, y1, x2, y2) pairs
         self.portals = []
         
+        # Per-cell lookup of portal and impossible space destinations
+        self.portal_index = PortalIndex(width, height)
+        
         # Impossible spaces (regions that are bigger on the inside)
         self.impossible_spaces = []
         
+        # Inner walls of each impossible space rasterized at sub-cell resolution:
+        # impossible_cells[y, x] is an index into impossible_rasters, or -1
+        self.impossible_resolution = 1  # Raster samples per cell along each axis
+        self.impossible_cells = np.full((height, width), -1, dtype=np.int32)
+        self.impossible_rasters = np.zeros((0, 1, 1), dtype=bool)
+        
+        # The same inner grids for exact ray traversal, padded to the largest:
+        # impossible_sizes[i] is the (width, height) of impossible_grids[i]
+        self.impossible_grids = np.zeros((0, 1, 1), dtype=np.uint8)
+        self.impossible_sizes = np.zeros((0, 2), dtype=np.int32)
+        
         # Reality distortion fields (x, y, radius, strength)
         self.distortion_fields = []
         
+        # Combined distortion of all fields baked at sub-cell resolution
+        self.distortion_resolution = 4  # Samples per cell along each axis
+        self.distortion_coefficients = None
+        
+        # Chebyshev distance in cells from each cell to the nearest wall, portal
+        # or impossible space; rays can skip ahead that far through open areas
+        self.empty_distance = None
+        
+        # Min/max occupancy pyramid of the same cells, for hierarchical DDA
+        self.occupancy = None
+        
         # Wall textures assignment
-        self.wall_textures = np.zeros((height, width), dtype=int)
+        self.wall_textures = np.zeros((height, width), dtype=np.uint8)
         
-        # Generate a basic map
-        self.generate_basic_map()
+        # Bumped whenever the map changes; compile() reuses its snapshot until then
+        self.version = 0
+        self._compiled = None
+        
+        # Generate a basic map, or a seeded one built with array operations
+        if vectorized:
+            self.generate_vectorized_map(seed)
+        else:
+            self.generate_basic_map()
         
     def generate_basic_map(self):
         """Generate a basic map with rooms and corridors"""
@@ -63,12 +189,172 @@ class NonEuclideanMap:
         
         # Add some impossible spaces
         self._add_impossible_spaces(2)
+        self._rasterize_impossible_spaces()
+        
+        # Index portals and impossible space entrances by cell
+        self._build_portal_index()
+        self.build_acceleration_structures()
         
         # Add distortion fields
         self._add_distortion_fields(4)
+        self.bake_distortion_field()
         
         # Assign wall textures
         self._assign_wall_textures()
+        
+        self.version += 1
+    
+    def generate_vectorized_map(self, seed=None):
+        """
+        Generate a map like generate_basic_map, scaled to the map size and
+        built with array operations so very large worlds take seconds.
+        
+        The same seed always produces the same map. Empty cells that end up
+        cut off from the largest open region are filled in, so every open
+        cell is reachable.
+        """
+        rng = np.random.default_rng(seed)
+        height, width = self.height, self.width
+        cells = width * height
+        
+        self.grid = np.ones((height, width), dtype=np.uint8)
+        self.grid[1:-1, 1:-1] = 0
+        self.wall_textures = np.zeros((height, width), dtype=np.uint8)
+        self.portals = []
+        self.impossible_spaces = []
+        self.distortion_fields = []
+        
+        # Random walls at the same density as the basic map: 20 per 16x16
+        stamp_wall_segments(self.grid, rng, max(20, cells * 20 // 256))
+        
+        # 20% of the cells in the middle of a wall run become openings
+        grid = self.grid
+        wall = np.zeros_like(grid, dtype=bool)
+        wall[1:-1, 1:-1] = grid[1:-1, 1:-1] == 1
+        horizontal = np.zeros_like(wall)
+        horizontal[:, 2:-2] = wall[:, 2:-2] & (grid[:, 1:-3] == 1) & (grid[:, 3:-1] == 1)
+        vertical = np.zeros_like(wall)
+        vertical[2:-2] = wall[2:-2] & (grid[1:-3] == 1) & (grid[3:-1] == 1)
+        grid[(horizontal | vertical) & (rng.random(grid.shape) < 0.2)] = 0
+        
+        # Fill every pocket that the largest open region cannot reach
+        labels = label_regions(grid == 0)
+        open_labels = labels[labels >= 0]
+        if len(open_labels):
+            largest = np.bincount(open_labels).argmax()
+            grid[(labels >= 0) & (labels != largest)] = 1
+        
+        empty_y, empty_x = np.nonzero(grid == 0)
+        self._place_portals(rng, empty_x, empty_y, max(3, cells // 1024))
+        self._place_impossible_spaces(rng, max(2, cells // 4096))
+        self._rasterize_impossible_spaces()
+        self._build_portal_index()
+        self.build_acceleration_structures()
+        
+        # Bake the distortion field as finely as the node budget allows
+        self._place_distortion_fields(rng, max(4, cells // 4096))
+        res = 4
+        while res > 1 / 64 and cells * res * res > DISTORTION_NODE_BUDGET:
+            res /= 2
+        self.distortion_resolution = res
+        self.bake_distortion_field()
+        
+        self._stamp_wall_textures(rng, max(10, cells // 64))
+        
+        self.version += 1
+    
+    def _place_portals(self, rng, empty_x, empty_y, count):
+        """Pair up random empty cells more than 5 cells apart as portals"""
+        if len(empty_x) < 2:
+            return
+        
+        # Draw spare candidate pairs and keep the first ones far enough apart
+        first = rng.integers(0, len(empty_x), count * 4)
+        second = rng.integers(0, len(empty_x), count * 4)
+        distance = np.hypot(empty_x[second] - empty_x[first], empty_y[second] - empty_y[first])
+        keep = np.flatnonzero(distance > 5)[:count]
+        
+        self.portals = list(zip(empty_x[first[keep]].tolist(), empty_y[first[keep]].tolist(),
+                                empty_x[second[keep]].tolist(), empty_y[second[keep]].tolist()))
+    
+    def _place_impossible_spaces(self, rng, count):
+        """Place impossible spaces on random empty cells with four empty neighbours"""
+        grid = self.grid
+        open_cross = np.zeros_like(grid, dtype=bool)
+        open_cross[2:-2, 2:-2] = ((grid[2:-2, 2:-2] == 0) & (grid[1:-3, 2:-2] == 0) & (grid[3:-1, 2:-2] == 0) &
+                                  (grid[2:-2, 1:-3] == 0) & (grid[2:-2, 3:-1] == 0))
+        candidates_y, candidates_x = np.nonzero(open_cross)
+        if not len(candidates_x):
+            return
+        chosen = rng.choice(len(candidates_x), min(count, len(candidates_x)), replace=False)
+        count = len(chosen)
+        
+        # Build every inner grid at once in a padded 5x5 stack
+        inner_width = rng.integers(3, 6, count)
+        inner_height = rng.integers(3, 6, count)
+        iy, ix = np.mgrid[0:5, 0:5]
+        w = inner_width[:, np.newaxis, np.newaxis]
+        h = inner_height[:, np.newaxis, np.newaxis]
+        inner = ((iy == 0) | (iy == h - 1) | (ix == 0) | (ix == w - 1)).astype(int)
+        
+        # A quarter of the cells get random inner walls
+        walls = rng.random((count, 6))
+        wall_count = inner_width * inner_height // 4
+        wall_x = 1 + (rng.random((count, 6)) * (inner_width - 2)[:, np.newaxis]).astype(np.intp)
+        wall_y = 1 + (walls * (inner_height - 2)[:, np.newaxis]).astype(np.intp)
+        placed = np.arange(6) < wall_count[:, np.newaxis]
+        space_index = np.broadcast_to(np.arange(count)[:, np.newaxis], placed.shape)
+        inner[space_index[placed], wall_y[placed], wall_x[placed]] = 1
+        
+        # Open the entrance: 0=top, 1=right, 2=bottom, 3=left
+        entrance_side = rng.integers(0, 4, count)
+        entrance_x = np.choose(entrance_side, [inner_width // 2, inner_width - 1, inner_width // 2, 0])
+        entrance_y = np.choose(entrance_side, [0, inner_height // 2, inner_height - 1, inner_height // 2])
+        inner[np.arange(count), entrance_y, entrance_x] = 0
+        
+        for i, cell in enumerate(chosen):
+            self.impossible_spaces.append({
+                'x': int(candidates_x[cell]),
+                'y': int(candidates_y[cell]),
+                'grid': inner[i, :inner_height[i], :inner_width[i]].copy(),
+                'width': int(inner_width[i]),
+                'height': int(inner_height[i]),
+                'entrance_side': int(entrance_side[i])
+            })
+    
+    def _place_distortion_fields(self, rng, count):
+        """Scatter distortion fields with the same parameter ranges as the basic map"""
+        x = rng.integers(1, self.width - 1, count)
+        y = rng.integers(1, self.height - 1, count)
+        radius = rng.uniform(1.5, 3.0, count)
+        strength = rng.uniform(0.2, 0.8, count)
+        field_type = rng.choice(['vortex', 'expansion', 'sine_wave'], count)
+        
+        self.distortion_fields = [
+            {'x': int(x[i]), 'y': int(y[i]), 'radius': float(radius[i]),
+             'strength': float(strength[i]), 'type': str(field_type[i])}
+            for i in range(count)
+        ]
+    
+    def _stamp_wall_textures(self, rng, count):
+        """Paint square texture regions of radius 1-3 around random wall cells"""
+        wall_y, wall_x = np.nonzero(self.grid[1:-1, 1:-1] == 1)
+        if not len(wall_x):
+            return
+        seeds = rng.integers(0, len(wall_x), count)
+        x, y = wall_x[seeds] + 1, wall_y[seeds] + 1
+        texture = rng.integers(1, 4, count).astype(np.uint8)
+        size = rng.integers(1, 4, count)
+        
+        # One pass per offset in the largest square; later regions paint over earlier ones
+        for dy in range(-3, 4):
+            for dx in range(-3, 4):
+                ny, nx = y + dy, x + dx
+                part = ((size >= max(abs(dx), abs(dy))) & (nx >= 0) & (nx < self.width) &
+                        (ny >= 0) & (ny < self.height))
+                ny, nx = ny[part], nx[part]
+                wall = self.grid[ny, nx] == 1
+                self.wall_textures[ny[wall], nx[wall]] = texture[part][wall]
     
     def _create_openings(self):
         """Create openings in walls to ensure the map is traversable"""
@@ -166,6 +452,78 @@ class NonEuclideanMap:
                 
                 attempts += 1
     
+    def _build_portal_index(self):
+        """Index every portal end and impossible space entrance by grid cell"""
+        self.portal_index = PortalIndex(self.width, self.height)
+        
+        # Portals work both ways and take priority over impossible spaces
+        ends = np.array(self.portals, dtype=np.float64).reshape(-1, 2, 2)
+        sources = ends.reshape(-1, 2)
+        destinations = ends[:, ::-1].reshape(-1, 2)
+        self.portal_index.extend(sources[:, 0], sources[:, 1],
+                                 (sources + 0.5) * self.cell_size,
+                                 (destinations + 0.5) * self.cell_size)
+        
+        # Impossible spaces lead to the entry point on their entrance side
+        entry_points = np.array([(0.5, 0.1), (0.9, 0.5), (0.5, 0.9), (0.1, 0.5)])
+        spaces = np.array([(space['x'], space['y'], space['entrance_side'])
+                           for space in self.impossible_spaces], dtype=np.intp).reshape(-1, 3)
+        cells = spaces[:, :2].astype(np.float64)
+        self.portal_index.extend(spaces[:, 0], spaces[:, 1],
+                                 (cells + 0.5) * self.cell_size,
+                                 (cells + entry_points[spaces[:, 2]]) * self.cell_size)
+    
+    def build_acceleration_structures(self):
+        """
+        Recompute solid_bits, empty_distance and the occupancy pyramid from the
+        grid, portals and impossible spaces. Call this again after editing any of them.
+        """
+        self.solid_bits = pack_solid(self.grid)
+        special = (self.portal_index.cells >= 0) | (self.impossible_cells >= 0)
+        self.empty_distance = chebyshev_distance((self.grid != 0) | special)
+        self.occupancy = OccupancyPyramid(self.grid, special)
+        self.version += 1
+    
+    def _rasterize_impossible_spaces(self):
+        """Rasterize the inner grid of every impossible space into a per-cell occupancy bitmap"""
+        # A multiple of every inner grid size, so each sample lies in exactly one inner cell
+        res = int(np.lcm.reduce([space[side] for space in self.impossible_spaces
+                                 for side in ('width', 'height')] or [1]))
+        samples = np.arange(res) / res
+        
+        self.impossible_resolution = res
+        self.impossible_cells = np.full((self.height, self.width), -1, dtype=np.int32)
+        rasters = []
+        for space in self.impossible_spaces:
+            # The first space placed on a cell wins, as in the old lookup order
+            if self.impossible_cells[space['y'], space['x']] >= 0:
+                continue
+            
+            # Map each sample to the inner grid cell it falls into
+            inner_x = (samples * space['width']).astype(np.intp)
+            inner_y = (samples * space['height']).astype(np.intp)
+            rasters.append(space['grid'][np.ix_(inner_y, inner_x)] == 1)
+            self.impossible_cells[space['y'], space['x']] = len(rasters) - 1
+        
+        self.impossible_rasters = np.array(rasters, dtype=bool).reshape(-1, res, res)
+        self._index_impossible_grids()
+    
+    def _index_impossible_grids(self):
+        """Gather the inner grid of each rasterized impossible space, in impossible_cells order"""
+        count = len(self.impossible_rasters)
+        spaces = [None] * count
+        for space in reversed(self.impossible_spaces):
+            # Going backwards, the first space placed on a cell is the one kept
+            spaces[self.impossible_cells[space['y'], space['x']]] = space
+        
+        inner_height = max([space['height'] for space in spaces] or [1])
+        inner_width = max([space['width'] for space in spaces] or [1])
+        self.impossible_grids = np.zeros((count, inner_height, inner_width), dtype=np.uint8)
+        self.impossible_sizes = np.zeros((count, 2), dtype=np.int32)
+        for i, space in enumerate(spaces):
+            self.impossible_grids[i, :space['height'], :space['width']] = space['grid'] == 1
+            self.impossible_sizes[i] = space['width'], space['height']
+    
     def _add_distortion_fields(self, count):
         """Add reality distortion fields that bend rays"""
         for _ in range(count):
@@ -183,6 +541,75 @@ class NonEuclideanMap:
                 'type': field_type
             })
     
+    def bake_distortion_field(self):
+        """
+        Bake the combined effect of all distortion fields into a grid.
+        
+        The distortion at a point for a ray angle and distance is
+            a*cos(angle) + b*sin(angle) + c*sin(0.1*d) + d*sin(0.2*d) + e*cos(0.2*d)
+        so each grid node stores the five coefficients (a, b, c, d, e), summed
+        over every field. Call this again whenever distortion_fields changes.
+        """
+        res = self.distortion_resolution
+        rows, cols = int(self.height * res) + 1, int(self.width * res) + 1
+        coefficients = np.zeros((rows, cols, 5), dtype=np.float32)
+        
+        for field in self.distortion_fields:
+            # Only the nodes inside the field's bounding box can be affected
+            radius = field['radius']
+            x0 = max(0, math.ceil((field['x'] - radius) * res))
+            y0 = max(0, math.ceil((field['y'] - radius) * res))
+            x1 = min(cols, math.floor((field['x'] + radius) * res) + 1)
+            y1 = min(rows, math.floor((field['y'] + radius) * res) + 1)
+            if x0 >= x1 or y0 >= y1:
+                continue
+            
+            grid_y, grid_x = np.mgrid[y0:y1, x0:x1] / res
+            local = coefficients[y0:y1, x0:x1]
+            dx = grid_x - field['x']
+            dy = grid_y - field['y']
+            dist_to_field = np.sqrt(dx*dx + dy*dy)
+            
+            # Influence is stronger closer to the center and zero outside the radius
+            weight = np.maximum(0.0, 1.0 - dist_to_field / radius) * field['strength']
+            
+            if field['type'] == 'vortex':
+                # sin(angle_to_center - angle), split into cos(angle) and sin(angle) terms
+                angle_to_center = np.arctan2(dy, dx)
+                local[..., 0] += weight * np.sin(angle_to_center)
+                local[..., 1] -= weight * np.cos(angle_to_center)
+            elif field['type'] == 'expansion':
+                local[..., 2] += weight
+            else:  # sine_wave or default
+                # sin(distance * 0.2 + dist_to_field * 2), split into sin and cos terms
+                local[..., 3] += weight * np.cos(dist_to_field * 2)
+                local[..., 4] += weight * np.sin(dist_to_field * 2)
+        
+        self.distortion_coefficients = coefficients
+        self.version += 1
+    
+    def sample_distortion(self, x, y, angle, distance):
+        """Bilinearly sample the baked distortion for arrays of world positions, angles and distances"""
+        res = self.distortion_resolution
+        coefficients = self.distortion_coefficients
+        max_y, max_x = coefficients.shape[0] - 1, coefficients.shape[1] - 1
+        
+        grid_x = np.clip(np.asarray(x, dtype=np.float64) / self.cell_size * res, 0, max_x)
+        grid_y = np.clip(np.asarray(y, dtype=np.float64) / self.cell_size * res, 0, max_y)
+        ix = np.minimum(grid_x.astype(np.intp), max_x - 1)
+        iy = np.minimum(grid_y.astype(np.intp), max_y - 1)
+        fx = (grid_x - ix)[..., np.newaxis]
+        fy = (grid_y - iy)[..., np.newaxis]
+        
+        coef = ((coefficients[iy, ix] * (1 - fx) + coefficients[iy, ix + 1] * fx) * (1 - fy) +
+                (coefficients[iy + 1, ix] * (1 - fx) + coefficients[iy + 1, ix + 1] * fx) * fy)
+        
+        angle = np.asarray(angle, dtype=np.float64)
+        distance = np.asarray(distance, dtype=np.float64)
+        return (coef[..., 0] * np.cos(angle) + coef[..., 1] * np.sin(angle) +
+                coef[..., 2] * np.sin(distance * 0.1) +
+                coef[..., 3] * np.sin(distance * 0.2) + coef[..., 4] * np.cos(distance * 0.2))
+    
     def _assign_wall_textures(self):
         """Assign different textures to walls"""
         # Assign a base texture to all walls
@@ -222,12 +649,20 @@ class NonEuclideanMap:
         grid_x = int(x / self.cell_size)
         grid_y = int(y / self.cell_size)
         
-        # Check if out of bounds
+        # Out of bounds counts as a wall
+        return self.is_solid_cell(grid_x, grid_y)
+    
+    def is_solid_cell(self, grid_x, grid_y):
+        """Check the packed occupancy bitmap for a grid cell; out of bounds is solid"""
         if grid_x < 0 or grid_x >= self.width or grid_y < 0 or grid_y >= self.height:
             return True
-        
-        # Check if inside a wall
-        return self.grid[grid_y][grid_x] == 1
+        return bool((self.solid_bits[grid_y, grid_x >> 3] >> (grid_x & 7)) & 1)
+    
+    def get_cell(self, grid_x, grid_y):
+        """WallType code of a grid cell; out of bounds reads as a wall"""
+        if grid_x < 0 or grid_x >= self.width or grid_y < 0 or grid_y >= self.height:
+            return WallType.WALL
+        return int(self.grid[grid_y, grid_x])
     
     def get_texture(self, x, y):
         """Get the texture ID for a wall at the given position"""
@@ -248,152 +683,268 @@ class NonEuclideanMap:
         grid_x = int(x / self.cell_size)
         grid_y = int(y / self.cell_size)
         
-        # Check each portal
-        for x1, y1, x2, y2 in self.portals:
-            if grid_x == x1 and grid_y == y1:
-                # Return the destination in world coordinates
-                return (x2 * self.cell_size + self.cell_size / 2, 
-                        y2 * self.cell_size + self.cell_size / 2)
-            elif grid_x == x2 and grid_y == y2:
-                # Portals work both ways
-                return (x1 * self.cell_size + self.cell_size / 2, 
-                        y1 * self.cell_size + self.cell_size / 2)
-        
-        # Check if inside an impossible space entrance
-        for space in self.impossible_spaces:
-            if grid_x == space['x'] and grid_y == space['y']:
-                # Determine entry point to impossible space
-                if space['entrance_side'] == 0:  # top
-                    return (space['x'] * self.cell_size + self.cell_size / 2,
-                            space['y'] * self.cell_size + self.cell_size * 0.1)
-                elif space['entrance_side'] == 1:  # right
-                    return (space['x'] * self.cell_size + self.cell_size * 0.9,
-                            space['y'] * self.cell_size + self.cell_size / 2)
-                elif space['entrance_side'] == 2:  # bottom
-                    return (space['x'] * self.cell_size + self.cell_size / 2,
-                            space['y'] * self.cell_size + self.cell_size * 0.9)
-                else:  # left
-                    return (space['x'] * self.cell_size + self.cell_size * 0.1,
-                            space['y'] * self.cell_size + self.cell_size / 2)
-        
-        return None
+        # One read of the per-cell index covers portals and impossible spaces
+        portal = self.portal_index.lookup(grid_x, grid_y)
+        if portal < 0:
+            return None
+        
+        # Return the destination in world coordinates
+        dest_x, dest_y = self.portal_index.destination[portal]
+        return (float(dest_x), float(dest_y))
     
     def get_distortion(self, x, y, angle, distance):
         """Get ray distortion at a given position"""
-        # Convert world coordinates to grid coordinates
-        grid_x = x / self.cell_size
-        grid_y = y / self.cell_size
-        
         # Performance optimization: early return if no distortion fields
         if not self.distortion_fields:
             return 0.0
-            
-        # Performance optimization: only check closest field
-        closest_field = None
-        min_dist = float('inf')
         
-        # Find the closest field
-        for field in self.distortion_fields:
-            dx = grid_x - field['x']
-            dy = grid_y - field['y']
-            dist_to_field = dx*dx + dy*dy  # Avoid sqrt for performance
-            
-            if dist_to_field < min_dist:
-                min_dist = dist_to_field
-                closest_field = field
-        
-        # If no field is close enough, return 0
-        if not closest_field or min_dist > closest_field['radius'] * closest_field['radius']:
+        # Convert world coordinates to baked grid coordinates
+        res = self.distortion_resolution
+        coefficients = self.distortion_coefficients
+        max_y, max_x = coefficients.shape[0] - 1, coefficients.shape[1] - 1
+        grid_x = min(max(x / self.cell_size * res, 0.0), max_x)
+        grid_y = min(max(y / self.cell_size * res, 0.0), max_y)
+        ix = min(int(grid_x), max_x - 1)
+        iy = min(int(grid_y), max_y - 1)
+        fx = grid_x - ix
+        fy = grid_y - iy
+        
+        # Bilinear blend of the four surrounding nodes
+        a, b, c, d, e = ((coefficients[iy, ix] * (1 - fx) + coefficients[iy, ix + 1] * fx) * (1 - fy) +
+                         (coefficients[iy + 1, ix] * (1 - fx) + coefficients[iy + 1, ix + 1] * fx) * fy)
+        
+        return float(a * math.cos(angle) + b * math.sin(angle) +
+                     c * math.sin(distance * 0.1) +
+                     d * math.sin(distance * 0.2) + e * math.cos(distance * 0.2))
+    
+    def safe_distance(self, x, y):
+        """How far a ray at a world position can travel in a straight line without reaching anything"""
+        grid_x = int(x / self.cell_size)
+        grid_y = int(y / self.cell_size)
+        if grid_x < 0 or grid_x >= self.width or grid_y < 0 or grid_y >= self.height:
             return 0.0
-            
-        # Now calculate distortion for the closest field only
-        field = closest_field
-        dx = grid_x - field['x']
-        dy = grid_y - field['y']
-        dist_to_field = math.sqrt(min_dist)  # Now use sqrt
-        
-        # Calculate influence based on distance (stronger closer to center)
-        influence = 1.0 - (dist_to_field / field['radius'])
-        
-        # Apply different distortion types
-        if field['type'] == 'vortex':
-            # Vortex effect - rays curve around the center
-            angle_to_center = math.atan2(dy, dx)
-            distortion = math.sin(angle_to_center - angle) * influence * field['strength']
         
-        elif field['type'] == 'expansion':
-            # Expansion effect - rays bend away from or toward center
-            distortion = math.sin(distance * 0.1) * influence * field['strength']
-        
-        else:  # sine_wave or default
-            # Sine wave distortion
-            distortion = math.sin(distance * 0.2 + dist_to_field * 2) * influence * field['strength']
-        
-        return distortion
+        return safe_step(self.empty_distance, grid_x, grid_y) * self.cell_size
     
-    # Cache for impossible space checks
-    _impossible_space_cache = {}
-    _cache_hits = 0
-    _cache_misses = 0
-    _cache_size_limit = 1000  # Limit cache size to prevent memory issues
+    def cast_ray(self, x, y, angle, max_distance):
+        """
+        Cast a straight ray from a world position with the occupancy pyramid.
+        Returns (distance, grid_x, grid_y, side) for the first wall, portal or
+        impossible space cell, or None if nothing is within max_distance.
+        """
+        distance, grid_x, grid_y, side = self.occupancy.cast_ray(
+            x / self.cell_size, y / self.cell_size, math.cos(angle), math.sin(angle),
+            max_distance / self.cell_size)
+        if grid_x < 0:
+            return None
+        return distance * self.cell_size, grid_x, grid_y, side
+    
+    def trace_impossible_space(self, x, y, dir_x, dir_y):
+        """
+        Follow a ray through the impossible space in the cell at world position
+        (x, y), with its inner grid scaled to fill the cell. The ray is taken
+        back to where it came into the cell first, so (x, y) can be anywhere
+        in the cell. Returns (distance, side, hit): the distance in world
+        units from (x, y) to the inner wall it hits, or to where it leaves
+        the cell again when hit is False; negative for a wall already passed.
+        Returns None if the cell holds no impossible space.
+        """
+        grid_x = int(x // self.cell_size)
+        grid_y = int(y // self.cell_size)
+        if grid_x < 0 or grid_x >= self.width or grid_y < 0 or grid_y >= self.height:
+            return None
+        space = self.impossible_cells[grid_y, grid_x]
+        if space < 0:
+            return None
+        
+        width, height = self.impossible_sizes[space]
+        distance, inner_x, inner_y, side = trace_cell(
+            self.impossible_grids[space], width, height,
+            x / self.cell_size, y / self.cell_size, dir_x, dir_y, grid_x, grid_y)
+        return distance * self.cell_size, side, inner_x >= 0
     
     def is_in_impossible_space(self, x, y):
         """Check if a position is inside an impossible space and handle accordingly"""
-        # Performance optimization: early return if no impossible spaces
-        if not self.impossible_spaces:
-            return False
-            
         # Convert world coordinates to grid coordinates
         grid_x = int(x / self.cell_size)
         grid_y = int(y / self.cell_size)
+        if grid_x < 0 or grid_x >= self.width or grid_y < 0 or grid_y >= self.height:
+            return False
         
-        # Check cache first
-        cache_key = (grid_x, grid_y, int(x) % self.cell_size, int(y) % self.cell_size)
-        if cache_key in self._impossible_space_cache:
-            self._cache_hits += 1
-            return self._impossible_space_cache[cache_key]
-            
-        self._cache_misses += 1
-        
-        # Check each impossible space
-        for space in self.impossible_spaces:
-            if grid_x == space['x'] and grid_y == space['y']:
-                # We're in an impossible space - need to map to the inner coordinates
-                
-                # Calculate relative position within the cell (0.0 to 1.0)
-                rel_x = (x % self.cell_size) / self.cell_size
-                rel_y = (y % self.cell_size) / self.cell_size
-                
-                # Map to inner grid coordinates
-                inner_x = rel_x * space['width']
-                inner_y = rel_y * space['height']
-                
-                # Check if this position is a wall in the inner grid
-                inner_grid_x = int(inner_x)
-                inner_grid_y = int(inner_y)
-                
-                # Bounds check
-                result = False
-                if (0 <= inner_grid_x < space['width'] and 
-                    0 <= inner_grid_y < space['height']):
-                    result = space['grid'][inner_grid_y][inner_grid_x] == 1
-                
-                # Cache the result
-                if len(self._impossible_space_cache) < self._cache_size_limit:
-                    self._impossible_space_cache[cache_key] = result
-                    
-                return result
+        # Performance optimization: most cells hold no impossible space
+        space = self.impossible_cells[grid_y, grid_x]
+        if space < 0:
+            return False
         
-        # Cache negative result
-        if len(self._impossible_space_cache) < self._cache_size_limit:
-            self._impossible_space_cache[cache_key] = False
-            
-        return False
+        # Look up the inner walls at this position within the cell
+        res = self.impossible_resolution
+        sample_x = int((x % self.cell_size) / self.cell_size * res)
+        sample_y = int((y % self.cell_size) / self.cell_size * res)
+        return bool(self.impossible_rasters[space, sample_y, sample_x])
+    
+    def compile(self):
+        """
+        Return a CompiledMap snapshot of the map for raycast kernels.
+        
+        All arrays are read-only copies, so the snapshot can be handed to
+        Numba or NumPy code and worker processes as-is. It is rebuilt only
+        when the map version changes; bump self.version after editing the
+        map by hand.
+        """
+        if self._compiled is not None and self._compiled.version == self.version:
+            return self._compiled
+        
+        def frozen(array, dtype):
+            array = np.array(array, dtype=dtype)
+            array.flags.writeable = False
+            return array
+        
+        self._compiled = CompiledMap(
+            version=self.version,
+            width=self.width,
+            height=self.height,
+            cell_size=self.cell_size,
+            cells=frozen(self.grid, np.uint8),
+            solid_bits=frozen(self.solid_bits, np.uint8),
+            textures=frozen(self.wall_textures, np.uint8),
+            portal_cells=frozen(self.portal_index.cells, np.int32),
+            portal_destinations=frozen(self.portal_index.destination, np.float64),
+            portal_offsets=frozen(self.portal_index.offset, np.float64),
+            portal_rotations=frozen(self.portal_index.rotation, np.float64),
+            impossible_resolution=self.impossible_resolution,
+            impossible_cells=frozen(self.impossible_cells, np.int32),
+            impossible_rasters=frozen(self.impossible_rasters, np.bool_),
+            distortion_resolution=self.distortion_resolution,
+            distortion_coefficients=frozen(self.distortion_coefficients, np.float32),
+            empty_distance=frozen(self.empty_distance, np.uint8),
+            occupancy_levels=tuple(frozen(level, np.uint8) for level in self.occupancy.max_levels),
+        )
+        return self._compiled
+    
+    def save(self, path):
+        """
+        Write the map to a baked level file that load() maps straight back in.
+        The compiled arrays are stored along with the portal, impossible space
+        and distortion field records they were built from.
+        """
+        compiled = self.compile()
+        index = self.portal_index
+        
+        # Impossible space records and their inner grids, padded to the largest
+        spaces = self.impossible_spaces
+        inner_height = max([space['height'] for space in spaces] or [0])
+        inner_width = max([space['width'] for space in spaces] or [0])
+        inner_grids = np.zeros((len(spaces), inner_height, inner_width), dtype=np.uint8)
+        for i, space in enumerate(spaces):
+            inner_grids[i, :space['height'], :space['width']] = space['grid']
+        
+        arrays = {name: getattr(compiled, name) for name in (
+            'cells', 'solid_bits', 'textures', 'portal_cells', 'portal_destinations', 'portal_offsets',
+            'portal_rotations', 'impossible_cells', 'impossible_rasters', 'distortion_coefficients',
+            'empty_distance')}
+        for i, (max_level, min_level) in enumerate(zip(self.occupancy.max_levels, self.occupancy.min_levels)):
+            arrays[f'occupancy_max_{i}'] = max_level
+            arrays[f'occupancy_min_{i}'] = min_level
+        arrays.update({
+            'portal_sources': index.source,
+            'portal_angles': index.angle,
+            'portal_facings': index.facing,
+            'portals': np.array(self.portals, dtype=np.int32).reshape(-1, 4),
+            'impossible_spaces': np.array([(space['x'], space['y'], space['width'], space['height'],
+                                            space['entrance_side']) for space in spaces],
+                                          dtype=np.int32).reshape(-1, 5),
+            'impossible_grids': inner_grids,
+            'distortion_fields': np.array([(field['x'], field['y'], field['radius'], field['strength'],
+                                            DISTORTION_FIELD_TYPES.index(field['type']))
+                                           for field in self.distortion_fields],
+                                          dtype=np.float64).reshape(-1, 5),
+        })
+        write_level(path, arrays, {
+            'width': self.width,
+            'height': self.height,
+            'cell_size': self.cell_size,
+            'impossible_resolution': self.impossible_resolution,
+            'distortion_resolution': self.distortion_resolution,
+            'occupancy_levels': len(self.occupancy),
+        })
+    
+    @classmethod
+    def load(cls, path):
+        """
+        Load a map written by save(). The large arrays stay memory-mapped and
+        read-only, so loading is near-instant and processes share the pages;
+        generate_new_map() replaces them with fresh in-memory arrays.
+        """
+        meta, arrays = read_level(path)
+        level = cls.__new__(cls)
+        level.width = meta['width']
+        level.height = meta['height']
+        level.cell_size = meta['cell_size']
+        level.grid = arrays['cells']
+        level.solid_bits = arrays['solid_bits']
+        level.wall_textures = arrays['textures']
+        
+        level.portals = [tuple(portal) for portal in arrays['portals'].tolist()]
+        level.portal_index = PortalIndex(level.width, level.height)
+        level.portal_index.cells = arrays['portal_cells']
+        level.portal_index.source = arrays['portal_sources']
+        level.portal_index.destination = arrays['portal_destinations']
+        level.portal_index.offset = arrays['portal_offsets']
+        level.portal_index.angle = arrays['portal_angles']
+        level.portal_index.rotation = arrays['portal_rotations']
+        level.portal_index.facing = arrays['portal_facings']
+        
+        level.impossible_spaces = [
+            {'x': x, 'y': y, 'grid': arrays['impossible_grids'][i, :height, :width].astype(int),
+             'width': width, 'height': height, 'entrance_side': entrance_side}
+            for i, (x, y, width, height, entrance_side) in enumerate(arrays['impossible_spaces'].tolist())
+        ]
+        level.impossible_resolution = meta['impossible_resolution']
+        level.impossible_cells = arrays['impossible_cells']
+        level.impossible_rasters = arrays['impossible_rasters']
+        level._index_impossible_grids()
+        
+        level.distortion_fields = [
+            {'x': int(x), 'y': int(y), 'radius': radius, 'strength': strength,
+             'type': DISTORTION_FIELD_TYPES[int(field_type)]}
+            for x, y, radius, strength, field_type in arrays['distortion_fields'].tolist()
+        ]
+        level.distortion_resolution = meta['distortion_resolution']
+        level.distortion_coefficients = arrays['distortion_coefficients']
+        level.empty_distance = arrays['empty_distance']
+        levels = range(meta['occupancy_levels'])
+        level.occupancy = OccupancyPyramid.from_levels([arrays[f'occupancy_max_{i}'] for i in levels],
+                                                       [arrays[f'occupancy_min_{i}'] for i in levels])
+        
+        # The file already holds the compiled arrays, so compile() can use them as-is
+        level.version = 1
+        level._compiled = CompiledMap(
+            version=level.version,
+            width=level.width,
+            height=level.height,
+            cell_size=level.cell_size,
+            cells=arrays['cells'],
+            solid_bits=arrays['solid_bits'],
+            textures=arrays['textures'],
+            portal_cells=arrays['portal_cells'],
+            portal_destinations=arrays['portal_destinations'],
+            portal_offsets=arrays['portal_offsets'],
+            portal_rotations=arrays['portal_rotations'],
+            impossible_resolution=level.impossible_resolution,
+            impossible_cells=arrays['impossible_cells'],
+            impossible_rasters=arrays['impossible_rasters'],
+            distortion_resolution=level.distortion_resolution,
+            distortion_coefficients=arrays['distortion_coefficients'],
+            empty_distance=arrays['empty_distance'],
+            occupancy_levels=level.occupancy.max_levels,
+        )
+        return level
     
     def generate_new_map(self):
         """Generate a completely new map"""
         # Reset the map
-        self.grid = np.ones((self.height, self.width), dtype=int)
+        self.grid = np.ones((self.height, self.width), dtype=np.uint8)
+        self.wall_textures = np.zeros((self.height, self.width), dtype=np.uint8)
         self.portals = []
         self.impossible_spaces = []
         self.distortion_fields = []
@@ -0,0 +1,147 @@
+import math
+import numpy as np
+
+try:
+    from numba.extending import register_jitable
+except ImportError:
+    # Without Numba the kernels below are only ever run as plain Python
+    def register_jitable(function):
+        return function
+
+# Level 0 value for cells that are empty in the grid but must still stop a
+# ray, e.g. cells under a portal or impossible space of a NonEuclideanMap
+MARKED = 255
+
+
+def reduce_levels(level0, reduce, pad_value):
+    """Build the 2x2 reduction chain of a grid down to a single cell"""
+    levels = [level0]
+    while levels[-1].shape != (1, 1):
+        level = levels[-1]
+        height, width = level.shape
+        if height % 2 or width % 2:
+            level = np.pad(level, ((0, height % 2), (0, width % 2)), constant_values=pad_value)
+        level = reduce(reduce(level[0::2, 0::2], level[1::2, 0::2]),
+                       reduce(level[0::2, 1::2], level[1::2, 1::2]))
+        levels.append(level)
+    return tuple(np.ascontiguousarray(level) for level in levels)
+
+
+class OccupancyPyramid:
+    """
+    Min/max occupancy pyramid of a map grid, a quadtree stored as arrays.
+
+    Level 0 is the grid itself as uint8 cell codes (any wall type, 1-11,
+    20+ or 30, counts as occupied), with MARKED on extra blocked cells.
+    Each level above holds the max (max_levels) and min (min_levels) of
+    2x2 cells of the level below: a 0 in max_levels is a block with nothing
+    in it that a ray can cross in one step, a non-zero min_levels entry a
+    block that is occupied throughout. Cells outside the grid count as empty
+    for max_levels and occupied for min_levels.
+    """
+
+    def __init__(self, cells, blocked=None):
+        level0 = np.array(cells, dtype=np.uint8)
+        if blocked is not None:
+            level0[(level0 == 0) & blocked] = MARKED
+        self.max_levels = reduce_levels(level0, np.maximum, 0)
+        self.min_levels = reduce_levels(level0, np.minimum, MARKED)
+
+    @classmethod
+    def from_levels(cls, max_levels, min_levels):
+        """Wrap prebuilt level chains, e.g. ones mapped from a baked level file"""
+        pyramid = cls.__new__(cls)
+        pyramid.max_levels = tuple(max_levels)
+        pyramid.min_levels = tuple(min_levels)
+        return pyramid
+
+    def __len__(self):
+        return len(self.max_levels)
+
+    def cast_ray(self, x, y, dir_x, dir_y, max_distance):
+        """Hierarchical DDA in cell units, see hierarchical_dda()"""
+        return hierarchical_dda(self.max_levels, x, y, dir_x, dir_y, max_distance)
+
+
+def hierarchical_dda(levels, x, y, dir_x, dir_y, max_distance):
+    """
+    Walk a ray through a max occupancy pyramid, in cell units.
+
+    Empty cells are skipped a whole empty block at a time; the ray only
+    descends to single cells inside blocks that hold something, so no
+    occupied cell is ever skipped. The starting cell is not tested.
+    Returns (distance, cell_x, cell_y, side) for the first occupied cell,
+    with side 0 for an x crossing and 1 for a y crossing, or
+    (max_distance, -1, -1, -1) if the ray leaves the grid or goes too far.
+    Plain Python that Numba can compile as-is.
+    """
+    base = levels[0]
+    height, width = base.shape
+    inv_x = 1.0 / dir_x if dir_x != 0 else math.inf
+    inv_y = 1.0 / dir_y if dir_y != 0 else math.inf
+
+    cell_x = int(math.floor(x))
+    cell_y = int(math.floor(y))
+    distance = 0.0
+    side = -1
+    while distance <= max_distance:
+        if cell_x < 0 or cell_x >= width or cell_y < 0 or cell_y >= height:
+            break
+        if side >= 0 and base[cell_y, cell_x] != 0:
+            return distance, cell_x, cell_y, side
+
+        # Cross the largest empty block around the cell in one step
+        distance, cell_x, cell_y, side = pyramid_step(levels, x, y, dir_x, dir_y, inv_x, inv_y, cell_x, cell_y)
+
+    return max_distance, -1, -1, -1
+
+
+@register_jitable
+def pyramid_step(levels, x, y, dir_x, dir_y, inv_x, inv_y, cell_x, cell_y):
+    """
+    One step of a hierarchical DDA (see hierarchical_dda()): climb from
+    (cell_x, cell_y) to the largest empty block of the max occupancy pyramid
+    around it, then cross that block. inv_x and inv_y are 1 / dir_x and
+    1 / dir_y, or inf for a zero component.
+    Returns (distance, cell_x, cell_y, side) for the cell just past the
+    block's exit, with side 0 for an x crossing and 1 for a y crossing.
+    Plain Python that Numba can compile as-is, from other kernels too.
+    """
+    top = len(levels) - 1
+
+    # Climb to the largest empty block around the cell
+    level = 0
+    while level < top and levels[level + 1][cell_y >> (level + 1), cell_x >> (level + 1)] == 0:
+        level += 1
+    size = 1 << level
+    block_x = (cell_x >> level) << level
+    block_y = (cell_y >> level) << level
+
+    # Distance along the ray to the block's exit sides
+    if dir_x > 0:
+        exit_x = (block_x + size - x) * inv_x
+    elif dir_x < 0:
+        exit_x = (block_x - x) * inv_x
+    else:
+        exit_x = math.inf
+    if dir_y > 0:
+        exit_y = (block_y + size - y) * inv_y
+    elif dir_y < 0:
+        exit_y = (block_y - y) * inv_y
+    else:
+        exit_y = math.inf
+
+    # Step into the cell just past the exit; the other coordinate is
+    # clamped to the block so rounding can never skip a cell
+    if exit_x < exit_y:
+        distance = exit_x
+        side = 0
+        cell_x = block_x + size if dir_x > 0 else block_x - 1
+        cell_y = min(max(int(math.floor(y + dir_y * distance)), block_y), block_y + size - 1)
+    else:
+        distance = exit_y
+        side = 1
+        cell_y = block_y + size if dir_y > 0 else block_y - 1
+        cell_x = min(max(int(math.floor(x + dir_x * distance)), block_x), block_x + size - 1)
+
+    return distance, cell_x, cell_y, side
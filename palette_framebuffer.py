@@ -0,0 +1,95 @@
+import numpy as np
+import pygame
+
+PALETTE_SIZE = 256
+
+
+def quantize_colors(image, count):
+    """
+    Reduce an (..., 3) color image to at most `count` colors.
+    Returns the (count, 3) colors and an array of per-pixel color labels.
+    """
+    pixels = image.reshape(-1, 3)
+    unique, inverse = np.unique(pixels, axis=0, return_inverse=True)
+    inverse = inverse.reshape(-1)
+    if len(unique) <= count:
+        colors = np.zeros((count, 3), dtype=np.uint8)
+        colors[:len(unique)] = unique
+        return colors, inverse.reshape(image.shape[:-1])
+
+    # Too many colors: split the pixels into equally populated luminance bands
+    luminance = pixels @ np.array([0.299, 0.587, 0.114])
+    order = np.argsort(luminance, kind='stable')
+    labels = np.empty(len(pixels), dtype=np.intp)
+    labels[order] = np.arange(len(pixels)) * count // len(pixels)
+
+    colors = np.zeros((count, 3), dtype=np.float64)
+    np.add.at(colors, labels, pixels)
+    colors /= np.maximum(1, np.bincount(labels, minlength=count))[:, np.newaxis]
+    return colors.astype(np.uint8), labels.reshape(image.shape[:-1])
+
+
+class PaletteFramebuffer:
+    """8-bit palette-indexed framebuffer with palette-cycling color effects"""
+
+    def __init__(self, width, height):
+        self.width = width
+        self.height = height
+
+        # Palette indices in surfarray (x, y) order
+        self.pixels = np.zeros((width, height), dtype=np.uint8)
+        self.surface = pygame.Surface((width, height), 0, 8)
+
+        # Static colors, filled in by the add_* methods
+        self.base_palette = np.zeros((PALETTE_SIZE, 3), dtype=np.uint8)
+        self.next_index = 0
+
+        # Palette ranges rotated over time: (start, length, speed)
+        self.cycles = []
+        self.palette = self.base_palette.copy()
+
+    def add_colors(self, colors, cycle_speed=0.0):
+        """Reserve a run of palette entries for the given colors and return its first index"""
+        colors = np.asarray(colors, dtype=np.uint8).reshape(-1, 3)
+        start = self.next_index
+        if start + len(colors) > PALETTE_SIZE:
+            raise ValueError(f"Palette is full: cannot add {len(colors)} colors at index {start}")
+
+        self.base_palette[start:start + len(colors)] = colors
+        self.next_index += len(colors)
+        if cycle_speed:
+            self.cycles.append((start, len(colors), cycle_speed))
+        return start
+
+    def add_ramp(self, color1, color2, steps):
+        """Reserve a linear gradient from color1 to color2 and return its first index"""
+        t = np.linspace(0.0, 1.0, steps)[:, np.newaxis]
+        ramp = np.asarray(color1) * (1 - t) + np.asarray(color2) * t
+        return self.add_colors(ramp.astype(np.uint8))
+
+    def update(self, time, tint=None, tint_start=0, remap=None):
+        """
+        Rebuild the palette for this frame: rotate cycling ranges, tint
+        entries from tint_start on, then pass the entries from tint_start on
+        through remap, a function of a (n, 3) color array, if one is given.
+        """
+        palette = self.base_palette.copy()
+
+        # Rotate each cycling range; this animates every pixel that uses it
+        for start, length, speed in self.cycles:
+            shift = int(time * speed) % length
+            palette[start:start + length] = np.roll(self.base_palette[start:start + length], shift, axis=0)
+
+        # Per-channel color multiplier applied to a whole palette range at once
+        if tint is not None:
+            palette[tint_start:] = np.clip(palette[tint_start:] * np.asarray(tint), 0, 255)
+        if remap is not None:
+            palette[tint_start:] = remap(palette[tint_start:])
+
+        self.palette = palette
+        self.surface.set_palette([tuple(color) for color in palette])
+
+    def to_surface(self):
+        """Copy the index buffer into the 8-bit surface and return it"""
+        pygame.surfarray.blit_array(self.surface, self.pixels)
+        return self.surface
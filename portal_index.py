@@ -0,0 +1,92 @@
+import math
+import numpy as np
+
+
+class PortalIndex:
+    """
+    Per-cell portal lookup table.
+
+    cells[y, x] holds the id of the portal record that owns the cell, or -1.
+    Each record stores where the portal is, where it leads, the offset between
+    the two and the rotation to apply to anything passing through, so finding
+    the portal under a point is a single array read however many portals
+    the map has.
+    """
+
+    def __init__(self, width, height):
+        self.width = width
+        self.height = height
+        self.cells = np.full((height, width), -1, dtype=np.int32)
+
+        # Portal records, one row per portal id
+        self.source = np.zeros((0, 2), dtype=np.float64)
+        self.destination = np.zeros((0, 2), dtype=np.float64)
+        self.offset = np.zeros((0, 2), dtype=np.float64)
+        self.angle = np.zeros(0, dtype=np.float64)
+        self.rotation = np.zeros((0, 2, 2), dtype=np.float64)
+        self.facing = np.zeros(0, dtype=np.int32)
+
+    def __len__(self):
+        return len(self.source)
+
+    def add(self, cells, source, destination, angle=0.0, facing=-1):
+        """
+        Add a portal record and claim the given (x, y) cells for it.
+        Cells already claimed by an earlier portal keep their owner.
+        Returns the new portal id.
+        """
+        portal = len(self.source)
+        cos_a, sin_a = math.cos(angle), math.sin(angle)
+
+        self.source = np.vstack([self.source, source])
+        self.destination = np.vstack([self.destination, destination])
+        self.offset = np.vstack([self.offset, np.subtract(destination, source)])
+        self.angle = np.append(self.angle, angle)
+        self.rotation = np.concatenate([self.rotation, [[[cos_a, -sin_a], [sin_a, cos_a]]]])
+        self.facing = np.append(self.facing, np.int32(facing))
+
+        for x, y in cells:
+            if 0 <= x < self.width and 0 <= y < self.height and self.cells[y, x] < 0:
+                self.cells[y, x] = portal
+
+        return portal
+
+    def extend(self, cells_x, cells_y, source, destination):
+        """
+        Add one single-cell portal per row of the given arrays in one go.
+        Same claiming rules as add(): a cell keeps its first owner.
+        Returns the new portal ids.
+        """
+        cells_x = np.asarray(cells_x, dtype=np.intp)
+        cells_y = np.asarray(cells_y, dtype=np.intp)
+        source = np.asarray(source, dtype=np.float64).reshape(-1, 2)
+        destination = np.asarray(destination, dtype=np.float64).reshape(-1, 2)
+        portals = np.arange(len(self.source), len(self.source) + len(source), dtype=np.int32)
+
+        self.source = np.concatenate([self.source, source])
+        self.destination = np.concatenate([self.destination, destination])
+        self.offset = np.concatenate([self.offset, destination - source])
+        self.angle = np.concatenate([self.angle, np.zeros(len(source))])
+        self.rotation = np.concatenate([self.rotation, np.broadcast_to(np.eye(2), (len(source), 2, 2))])
+        self.facing = np.concatenate([self.facing, np.full(len(source), -1, dtype=np.int32)])
+
+        # First claim of each in-bounds cell that nobody owns yet
+        inside = (cells_x >= 0) & (cells_x < self.width) & (cells_y >= 0) & (cells_y < self.height)
+        flat = cells_y[inside] * self.width + cells_x[inside]
+        flat, first = np.unique(flat, return_index=True)
+        owners = portals[inside][first]
+        free = self.cells.flat[flat] < 0
+        self.cells.flat[flat[free]] = owners[free]
+
+        return portals
+
+    def lookup(self, x, y):
+        """Portal id owning cell (x, y), or -1 for none or out of bounds"""
+        if 0 <= x < self.width and 0 <= y < self.height:
+            return self.cells[y, x]
+        return -1
+
+    def rotate(self, portal, dx, dy):
+        """Rotate a direction vector by the portal's rotation"""
+        (a, b), (c, d) = self.rotation[portal]
+        return a * dx + b * dy, c * dx + d * dy
@@ -0,0 +1,136 @@
+import math
+import numpy as np
+
+# Room faces, matching the direction numbers the hypercube rooms use
+NORTH = 0   # y = 0 side
+EAST = 1    # x = size side
+SOUTH = 2   # y = size side
+WEST = 3    # x = 0 side
+
+# Outward unit normal of each face
+FACE_NORMALS = ((0, -1), (1, 0), (0, 1), (-1, 0))
+
+# One quarter turn of a direction: (dx, dy) -> (dy, -dx)
+QUARTER_TURN = np.array([[0.0, 1.0], [-1.0, 0.0]])
+
+
+class RoomAdjacency:
+    """
+    Precomputed room-to-room transforms for rays crossing between rooms.
+
+    Rooms are small square grids of cell codes, all stacked into one
+    (rooms, size, size) array. targets[room, face] is the room a ray
+    arrives in when it leaves through that face (-1 for a closed face) and
+    transforms[room, face] the 2x3 affine map from the room's coordinates
+    into the target's: the ray comes out of the opposite face of the target,
+    then the target is turned rotation quarter turns about its centre. The
+    map is rigid, so distances carry over unchanged. Cell codes listed in
+    see_through (connection markers on the faces) don't stop a ray.
+    """
+
+    def __init__(self, room_maps, see_through=()):
+        room_maps = [np.asarray(room_map) for room_map in room_maps]
+        self.sizes = np.array([len(room_map) for room_map in room_maps], dtype=np.int32)
+        side = int(self.sizes.max())
+        self.cells = np.zeros((len(room_maps), side, side), dtype=np.uint8)
+        for room, room_map in enumerate(room_maps):
+            self.cells[room, :len(room_map), :len(room_map)] = room_map
+        self.see_through = np.zeros(256, dtype=np.bool_)
+        self.see_through[0] = True
+        self.see_through[list(see_through)] = True
+        self.targets = np.full((len(room_maps), 4), -1, dtype=np.int32)
+        self.transforms = np.zeros((len(room_maps), 4, 2, 3))
+
+    def __len__(self):
+        return len(self.sizes)
+
+    def link(self, room, face, target, rotation=0):
+        """Send rays leaving room through face into target, turned rotation quarter turns"""
+        size = self.sizes[room]
+        target_size = self.sizes[target]
+        normal = np.array(FACE_NORMALS[face], dtype=np.float64)
+        turn = np.linalg.matrix_power(QUARTER_TURN, rotation % 4)
+
+        # Relative to the room centres, the exit face centre lands on the
+        # centre of the opposite face of the target, then the turn is applied
+        shift = -(size + target_size) / 2.0 * normal - size / 2.0
+        self.targets[room, face] = target
+        self.transforms[room, face, :, :2] = turn
+        self.transforms[room, face, :, 2] = turn @ shift + target_size / 2.0
+
+    def cast_ray(self, room, x, y, dir_x, dir_y, max_distance, max_crossings):
+        """Cell DDA through linked rooms, see room_dda()"""
+        return room_dda(self.cells, self.sizes, self.see_through, self.targets, self.transforms,
+                        room, x, y, dir_x, dir_y, max_distance, max_crossings)
+
+
+def room_dda(cells, sizes, see_through, targets, transforms, room, x, y, dir_x, dir_y, max_distance, max_crossings):
+    """
+    Walk a ray cell by cell through a room and on into linked rooms, in
+    cell units. The starting cell is not tested.
+    Returns (distance, room, cell_x, cell_y, side, crossings) for the first
+    solid cell, with side 0 for an x crossing and 1 for a y crossing. If the
+    ray stops on a face it may not cross (closed, or max_crossings used up)
+    the cell is the one just outside the room. A ray that goes too far
+    gives (max_distance, -1, -1, -1, -1, crossings).
+    Plain Python that Numba can compile as-is.
+    """
+    travelled = 0.0
+    crossings = 0
+    side = -1
+    while True:
+        size = sizes[room]
+        # Arrival points sit on the room's edge; clamp them inside
+        cell_x = min(max(int(math.floor(x)), 0), size - 1)
+        cell_y = min(max(int(math.floor(y)), 0), size - 1)
+        if side >= 0 and not see_through[cells[room, cell_y, cell_x]]:
+            return travelled, room, cell_x, cell_y, side, crossings
+
+        delta_x = abs(1.0 / dir_x) if dir_x != 0 else math.inf
+        delta_y = abs(1.0 / dir_y) if dir_y != 0 else math.inf
+        step_x = 1 if dir_x >= 0 else -1
+        step_y = 1 if dir_y >= 0 else -1
+        side_x = (cell_x + 1.0 - x) * delta_x if dir_x >= 0 else (x - cell_x) * delta_x
+        side_y = (cell_y + 1.0 - y) * delta_y if dir_y >= 0 else (y - cell_y) * delta_y
+
+        while True:
+            if side_x < side_y:
+                distance = side_x
+                side_x += delta_x
+                cell_x += step_x
+                side = 0
+            else:
+                distance = side_y
+                side_y += delta_y
+                cell_y += step_y
+                side = 1
+
+            if travelled + distance > max_distance:
+                return max_distance, -1, -1, -1, -1, crossings
+            if 0 <= cell_x < size and 0 <= cell_y < size:
+                if not see_through[cells[room, cell_y, cell_x]]:
+                    return travelled + distance, room, cell_x, cell_y, side, crossings
+                continue
+
+            # Left the room: carry the ray over into the linked room
+            if side == 0:
+                face = EAST if step_x > 0 else WEST
+            else:
+                face = SOUTH if step_y > 0 else NORTH
+            target = targets[room, face]
+            if target < 0 or crossings >= max_crossings:
+                return travelled + distance, room, cell_x, cell_y, side, crossings
+
+            transform = transforms[room, face]
+            exit_x = x + dir_x * distance
+            exit_y = y + dir_y * distance
+            x = transform[0, 0] * exit_x + transform[0, 1] * exit_y + transform[0, 2]
+            y = transform[1, 0] * exit_x + transform[1, 1] * exit_y + transform[1, 2]
+            dir_x, dir_y = (transform[0, 0] * dir_x + transform[0, 1] * dir_y,
+                            transform[1, 0] * dir_x + transform[1, 1] * dir_y)
+            if transform[0, 0] == 0:
+                side = 1 - side  # A quarter turn swaps the axes
+            travelled += distance
+            room = target
+            crossings += 1
+            break
@@ -0,0 +1,237 @@
+import pygame
+import numpy as np
+import math
+import time
+from trippy_effects import TrippyEffects
+from sector_map import SectorMap
+from room_adjacency import NORTH, EAST, SOUTH, WEST
+from light_tables import light_levels
+from texture_atlas import (create_texture_atlas, create_palette_framebuffer, TEXTURE_SIZE,
+                           SKY_STEPS, FLOOR_STEPS, PALETTE_LIGHT_LEVELS)
+
+# Sector-and-portal engine: rooms are convex sectors and every doorway is a
+# portal link, so the non-Euclidean spaces the grid engines build out of
+# special cell codes are plain links here. Drawing only ever looks at the
+# sectors seen through the current portal windows.
+
+# Initialize Pygame
+pygame.init()
+
+# Constants
+WIDTH, HEIGHT = 800, 600
+FOV = 60  # Field of view
+MAX_DISTANCE = 20.0  # Distance at which walls reach the darkest light level
+EYE_HEIGHT = 0.5
+PLAYER_RADIUS = 0.2
+PLAYER_SPEED = 0.05  # Units per frame at 60 FPS
+
+# Colors
+WHITE = (255, 255, 255)
+
+def create_world():
+    """
+    The demo map. Returns (world, start sector).
+
+    - A hub with a doorway on every side.
+    - East of the hub, a corridor with a low ceiling and a raised floor. It
+      runs out through its far end back into the hub's west doorway, a
+      seamless wraparound.
+    - North of the hub, a hall three times larger inside than its doorway
+      lets on.
+    - South of the hub, the first of four hypercube rooms. All four occupy
+      the same map coordinates and are linked to each other on every side,
+      some with half turns.
+    """
+    world = SectorMap()
+    hub, hub_doors = world.add_room(0, 0, 6, 6, {NORTH: (2.5, 3.5), EAST: (2.5, 3.5), SOUTH: (2.5, 3.5), WEST: (2.5, 3.5)})
+    corridor, corridor_doors = world.add_room(6, 2.5, 12, 3.5, {WEST: (2.5, 3.5), EAST: (2.5, 3.5)},
+                                              floor=0.1, ceiling=0.8, texture=2)
+    world.link_both(hub_doors[EAST], corridor_doors[WEST])
+    world.link_both(corridor_doors[EAST], hub_doors[WEST])
+
+    # Its doorway is 3 units wide inside, so everything in it is 3 times larger
+    hall, hall_doors = world.add_room(-10, -20, 20, 0, {SOUTH: (3.5, 6.5)}, ceiling=3.0, texture=1)
+    world.link_both(hub_doors[NORTH], hall_doors[SOUTH])
+
+    rooms = []
+    for texture in range(4):
+        room, doors = world.add_room(100, 100, 104, 104, {NORTH: (101.5, 102.5), EAST: (101.5, 102.5),
+                                                          SOUTH: (101.5, 102.5), WEST: (101.5, 102.5)},
+                                     texture=texture)
+        rooms.append(doors)
+    world.link_both(hub_doors[SOUTH], rooms[0][NORTH])
+    for i in range(4):
+        world.link_both(rooms[i][EAST], rooms[(i + 1) % 4][WEST])
+    world.link_both(rooms[0][SOUTH], rooms[2][SOUTH])
+    world.link_both(rooms[1][NORTH], rooms[3][SOUTH])
+    world.link_both(rooms[1][SOUTH], rooms[2][NORTH])
+    return world, hub
+
+world, start_sector = create_world()
+
+# Trippy effects
+effects = TrippyEffects()
+
+# Shared texture atlas, drawn through the palette framebuffer
+texture_atlas = create_texture_atlas()
+palette_framebuffer, PALETTE_BACKGROUND, PALETTE_TEXTURE_INDICES = create_palette_framebuffer(texture_atlas, WIDTH, HEIGHT)
+
+# Player state, in the coordinates of the sector the player is in; scale
+# is how many sector units the player spans
+player_state = {
+    'sector': start_sector,
+    'x': 3.0,
+    'y': 3.0,
+    'angle': 0.0,
+    'scale': 1.0,
+}
+
+# Counters from the last frame, for the status line
+frame_stats = {'sectors_drawn': 0, 'spans': 0}
+
+def render_frame(player_state):
+    """Render the player's view and return it as a surface"""
+    uniforms = effects.uniforms
+    scale = player_state['scale']
+    eye = world.floors[player_state['sector']] + EYE_HEIGHT * scale
+
+    # Field of view pulses with the effects
+    fov = FOV + effects.get_fov_distortion()
+    spans = []
+    sectors = world.cast_spans(player_state['sector'], player_state['x'], player_state['y'], eye,
+                               player_state['angle'], scale, math.tan(math.radians(fov) / 2),
+                               WIDTH, HEIGHT, spans)
+
+    # Every span fills its own pixels, so they can go in any order
+    pixels = palette_framebuffer.pixels
+    pixels[:] = PALETTE_BACKGROUND[np.newaxis, :]
+    for first, last, depth, u, v_top, v_scale, top, bottom, texture in spans:
+        top = np.clip(np.ceil(top), 0, HEIGHT).astype(np.intp)
+        bottom = np.clip(np.ceil(bottom), 0, HEIGHT).astype(np.intp)
+        if (bottom <= top).all():
+            continue
+        rows = np.arange(top.min(), bottom.max())[np.newaxis, :]
+        inside = (rows >= top[:, np.newaxis]) & (rows < bottom[:, np.newaxis])
+        texture_y = ((v_top[:, np.newaxis] + rows * v_scale[:, np.newaxis]) % 1.0 * TEXTURE_SIZE).astype(np.intp)
+        texture_x = ((u % 1.0) * TEXTURE_SIZE).astype(np.intp)
+
+        # Distance shading picks one of the pre-shaded palette blocks
+        level = light_levels(depth, MAX_DISTANCE, PALETTE_LIGHT_LEVELS)
+        indices = PALETTE_TEXTURE_INDICES[texture, level[:, np.newaxis],
+                                          np.minimum(texture_y, TEXTURE_SIZE - 1),
+                                          np.minimum(texture_x, TEXTURE_SIZE - 1)[:, np.newaxis]]
+        target = pixels[first:last + 1, rows[0, 0]:rows[0, -1] + 1]
+        np.copyto(target, indices, where=inside)
+
+    # Trippy color effects are applied once to the wall palette entries
+    remap = None
+    if effects.enabled:
+        remap = lambda colors: effects.apply_color_distortion_array(colors, 0.0, player_state['angle'])
+    palette_framebuffer.update(uniforms.time, tint_start=SKY_STEPS + FLOOR_STEPS, remap=remap)
+
+    # Expand to RGB for the screen-space effects
+    frame = pygame.Surface((WIDTH, HEIGHT))
+    frame.blit(palette_framebuffer.to_surface(), (0, 0))
+    effects.apply_visual_noise(frame)
+    effects.apply_afterimage(frame)
+
+    frame_stats['sectors_drawn'] = sectors
+    frame_stats['spans'] = len(spans)
+    return frame
+
+def move_player(player_state, dx, dy):
+    """Move the player by (dx, dy) in player units, following any portal crossed"""
+    scale = player_state['scale']
+    sector, x, y, turn, link_scale = world.move(player_state['sector'], player_state['x'], player_state['y'],
+                                                dx * scale, dy * scale, PLAYER_RADIUS * scale)
+    player_state['sector'] = sector
+    player_state['x'] = x
+    player_state['y'] = y
+    player_state['angle'] += turn
+    player_state['scale'] = scale * link_scale
+
+# Main game loop
+def main():
+    screen = pygame.display.set_mode((WIDTH, HEIGHT), pygame.HWSURFACE | pygame.DOUBLEBUF)
+    pygame.display.set_caption("Sector Portal Renderer")
+    clock = pygame.time.Clock()
+    font = pygame.font.SysFont(None, 24)
+
+    running = True
+    mouse_locked = True
+    pygame.mouse.set_visible(False)
+    pygame.event.set_grab(True)
+
+    # For FPS calculation
+    fps_counter = 0
+    fps_timer = time.time()
+    fps = 0
+
+    while running:
+        # Calculate delta time for smooth movement
+        dt = clock.get_time() / 1000.0
+
+        # Update trippy effects
+        effects.update(dt)
+
+        # Handle events
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT:
+                running = False
+
+            elif event.type == pygame.KEYDOWN:
+                if event.key == pygame.K_ESCAPE:
+                    # Toggle mouse lock
+                    mouse_locked = not mouse_locked
+                    pygame.mouse.set_visible(not mouse_locked)
+                    pygame.event.set_grab(mouse_locked)
+                elif event.key == pygame.K_SPACE:
+                    effects.toggle()
+                elif event.key == pygame.K_EQUALS or event.key == pygame.K_PLUS:
+                    effects.increase_intensity()
+                elif event.key == pygame.K_MINUS:
+                    effects.decrease_intensity()
+
+            # Handle mouse movement for looking around
+            elif event.type == pygame.MOUSEMOTION and mouse_locked:
+                player_state['angle'] += math.radians(event.rel[0] * 0.1)
+
+        # Update player position based on movement keys
+        keys = pygame.key.get_pressed()
+        move_speed = PLAYER_SPEED * dt * 60  # Normalize for 60 FPS
+        forward = keys[pygame.K_w] - keys[pygame.K_s]
+        strafe = keys[pygame.K_d] - keys[pygame.K_a]
+        if keys[pygame.K_LEFT]:
+            player_state['angle'] -= 0.05
+        if keys[pygame.K_RIGHT]:
+            player_state['angle'] += 0.05
+        angle = player_state['angle']
+        dx = (math.cos(angle) * forward - math.sin(angle) * strafe) * move_speed
+        dy = (math.sin(angle) * forward + math.cos(angle) * strafe) * move_speed
+        if dx or dy:
+            move_player(player_state, dx, dy)
+
+        # Render the 3D view
+        screen.blit(render_frame(player_state), (0, 0))
+
+        # Calculate and display FPS
+        fps_counter += 1
+        if time.time() - fps_timer > 1.0:
+            fps = fps_counter
+            fps_counter = 0
+            fps_timer = time.time()
+
+        status_text = (f"FPS: {fps}  Sector: {player_state['sector']}  "
+                       f"Sectors drawn: {frame_stats['sectors_drawn']}/{len(world)}")
+        screen.blit(font.render(status_text, True, WHITE), (10, 10))
+
+        # Update the display
+        pygame.display.flip()
+
+        # Cap the frame rate
+        clock.tick(60)
+
+    pygame.quit()
+
+if __name__ == "__main__":
+    main()
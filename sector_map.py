@@ -0,0 +1,278 @@
+import math
+import numpy as np
+from bsp_map import point_side, NEAR_PLANE
+from room_adjacency import NORTH, EAST, SOUTH, WEST
+
+# Most portals one view may pass through in a row; looping links would
+# otherwise recurse forever
+MAX_PORTAL_DEPTH = 32
+
+
+class SectorMap:
+    """
+    Build-style map of convex sectors joined by portal walls.
+
+    A sector is a convex polygon with a floor and ceiling height. Its walls
+    run between consecutive corners, clockwise on the map with y pointing
+    down, so the inside is in front of every wall (see bsp_map.point_side()).
+    A wall may link to a wall of any other sector, or of the same one. The
+    link is a similarity transform that lays this wall onto the other one,
+    facing back the way it came, so the two sectors meet seamlessly however
+    they are placed, turned or scaled. Overlapping sectors, rooms bigger on
+    the inside, wraparound corridors and hypercube rooms are all just links.
+
+    Per wall (indexed across all sectors):
+        walls[w] = (x1, y1, x2, y2), wall_sectors[w], wall_textures[w]
+        links[w] = target wall or -1 for a solid wall
+        transforms[w] = (cos, sin, scale, x, y) carrying points through it
+    """
+
+    def __init__(self):
+        self.sector_walls = []  # (first wall, count) per sector
+        self.floors = []
+        self.ceilings = []
+        self.walls = []
+        self.wall_sectors = []
+        self.wall_textures = []
+        self.links = []
+        self.transforms = []
+
+    def __len__(self):
+        return len(self.sector_walls)
+
+    def add_sector(self, points, floor=0.0, ceiling=1.0, texture=0):
+        """Add a convex sector with the given clockwise corners and return its index"""
+        points = [(float(x), float(y)) for x, y in points]
+        # Drop zero-length walls, e.g. where a doorway fills a whole side
+        points = [point for point, following in zip(points, points[1:] + points[:1]) if point != following]
+        sector = len(self.sector_walls)
+        self.sector_walls.append((len(self.walls), len(points)))
+        self.floors.append(float(floor))
+        self.ceilings.append(float(ceiling))
+        for (x1, y1), (x2, y2) in zip(points, points[1:] + points[:1]):
+            self.walls.append((x1, y1, x2, y2))
+            self.wall_sectors.append(sector)
+            self.wall_textures.append(texture)
+            self.links.append(-1)
+            self.transforms.append(None)
+        return sector
+
+    def add_room(self, x0, y0, x1, y1, doors=None, floor=0.0, ceiling=1.0, texture=0):
+        """
+        Add a rectangular sector with at most one doorway per side. doors maps
+        NORTH/EAST/SOUTH/WEST (see room_adjacency) to the (start, end) span
+        of the doorway along that side, in map coordinates.
+        Returns (sector, {side: doorway wall}).
+        """
+        doors = doors or {}
+        corners = {NORTH: ((x0, y0), (x1, y0)), EAST: ((x1, y0), (x1, y1)),
+                   SOUTH: ((x1, y1), (x0, y1)), WEST: ((x0, y1), (x0, y0))}
+        points = []
+        door_points = {}
+        for side in (NORTH, EAST, SOUTH, WEST):
+            start, end = corners[side]
+            points.append(start)
+            if side in doors:
+                lo, hi = doors[side]
+                # Doorway corners in the side's own running direction
+                if side in (NORTH, EAST):
+                    first, second = lo, hi
+                else:
+                    first, second = hi, lo
+                if side in (NORTH, SOUTH):
+                    door = ((first, y0 if side == NORTH else y1), (second, y0 if side == NORTH else y1))
+                else:
+                    door = ((x1 if side == EAST else x0, first), (x1 if side == EAST else x0, second))
+                door_points[side] = door[0]
+                points.extend(door)
+        sector = self.add_sector(points, floor, ceiling, texture)
+
+        first, count = self.sector_walls[sector]
+        door_walls = {}
+        for side, start in door_points.items():
+            for wall in range(first, first + count):
+                if self.walls[wall][:2] == (float(start[0]), float(start[1])):
+                    door_walls[side] = wall
+        return sector, door_walls
+
+    def link(self, wall, target):
+        """Make wall a portal into target: leaving through wall comes out of target"""
+        x1, y1, x2, y2 = self.walls[wall]
+        tx1, ty1, tx2, ty2 = self.walls[target]
+        length = math.hypot(x2 - x1, y2 - y1)
+        target_length = math.hypot(tx2 - tx1, ty2 - ty1)
+        # (x1, y1) lands on the far end of target and the wall runs back along it
+        turn = math.atan2(ty1 - ty2, tx1 - tx2) - math.atan2(y2 - y1, x2 - x1)
+        cos, sin = math.cos(turn), math.sin(turn)
+        scale = target_length / length
+        self.links[wall] = target
+        self.transforms[wall] = (cos, sin, scale,
+                                 tx2 - scale * (cos * x1 - sin * y1),
+                                 ty2 - scale * (sin * x1 + cos * y1))
+
+    def link_both(self, wall, target):
+        """Link two walls to each other"""
+        self.link(wall, target)
+        self.link(target, wall)
+
+    def transform_point(self, wall, x, y):
+        """Carry a point from wall's sector through the link into the target's coordinates"""
+        cos, sin, scale, offset_x, offset_y = self.transforms[wall]
+        return (scale * (cos * x - sin * y) + offset_x,
+                scale * (sin * x + cos * y) + offset_y)
+
+    def transform_height(self, wall, z):
+        """Carry a height through the link, which scales it like everything else"""
+        return z * self.transforms[wall][2]
+
+    def move(self, sector, x, y, dx, dy, radius):
+        """
+        Move a body of the given radius from (x, y) by (dx, dy) within
+        sector, sliding along solid walls and passing through portals.
+        Returns (sector, x, y, turn, scale): where it ended up, in that
+        sector's coordinates, and the angle and size change of the links it
+        went through.
+        """
+        turn, scale = 0.0, 1.0
+        first, count = self.sector_walls[sector]
+        new_x, new_y = x + dx, y + dy
+
+        # Passing through a portal
+        for wall in range(first, first + count):
+            if self.links[wall] < 0:
+                continue
+            x1, y1, x2, y2 = self.walls[wall]
+            length = math.hypot(x2 - x1, y2 - y1)
+            along = ((new_x - x1) * (x2 - x1) + (new_y - y1) * (y2 - y1)) / length
+            if point_side(x1, y1, x2 - x1, y2 - y1, new_x, new_y) < 0 and 0 <= along <= length:
+                cos, sin, link_scale = self.transforms[wall][:3]
+                new_x, new_y = self.transform_point(wall, new_x, new_y)
+                return self.wall_sectors[self.links[wall]], new_x, new_y, math.atan2(sin, cos), link_scale
+
+        # Sliding along solid walls the body would come too close to
+        for wall in range(first, first + count):
+            if self.links[wall] >= 0:
+                continue
+            x1, y1, x2, y2 = self.walls[wall]
+            length = math.hypot(x2 - x1, y2 - y1)
+            along = ((new_x - x1) * (x2 - x1) + (new_y - y1) * (y2 - y1)) / length
+            if not -radius <= along <= length + radius:
+                continue
+            distance = point_side(x1, y1, x2 - x1, y2 - y1, new_x, new_y) / length
+            if distance < radius:
+                # Push back out along the wall's inward normal
+                normal_x, normal_y = -(y2 - y1) / length, (x2 - x1) / length
+                new_x += normal_x * (radius - distance)
+                new_y += normal_y * (radius - distance)
+        return sector, new_x, new_y, turn, scale
+
+    def cast_spans(self, sector, x, y, z, angle, scale, tan_half_fov, width, height, spans):
+        """
+        Work out every wall piece visible from a camera at (x, y, z, angle)
+        in sector, Build style: walls of the camera's sector are drawn within
+        the screen, and each visible portal opens a window of columns and
+        rows through which the sector behind it is drawn in turn, with the
+        camera carried through the link. Only sectors seen through some
+        window are looked at, each wall piece is clipped to its window, and
+        every screen pixel is covered by at most one piece.
+
+        scale is how many sector units one camera unit spans. Pieces are
+        appended to spans as (first, last, depth, u, v_top, v_scale, top,
+        bottom, texture): columns first..last, then per column the depth in
+        camera units, the texture coordinate along the wall, the texture
+        coordinate down it as v_top + row * v_scale, and the rows
+        top..bottom to fill. Returns the number of sectors drawn.
+        """
+        camera = np.linspace(-1.0, 1.0, width, endpoint=False) + 1.0 / width
+        focal = width / (2.0 * tan_half_fov)
+        # Rows still open in each column
+        upper = np.zeros(width)
+        lower = np.full(width, float(height))
+        visited = 0
+
+        def columns(points):
+            # Screen columns of a camera space segment after near plane clipping
+            (d0, l0), (d1, l1) = points
+            ratios = []
+            for d, l, od, ol in ((d0, l0, d1, l1), (d1, l1, d0, l0)):
+                if d >= NEAR_PLANE:
+                    ratios.append(l / d)
+                elif od >= NEAR_PLANE:
+                    t = (NEAR_PLANE - d) / (od - d)
+                    ratios.append((l + (ol - l) * t) / NEAR_PLANE)
+            if not ratios:
+                return None
+            first = max(0, math.ceil(width / 2.0 + min(ratios) * focal - 0.5))
+            last = min(width - 1, math.floor(width / 2.0 + max(ratios) * focal - 0.5))
+            return (first, last) if first <= last else None
+
+        # Explicit stack of sectors to draw: (sector, camera, window, depth)
+        stack = [(sector, x, y, z, angle, scale, 0, width - 1, 0)]
+        while stack:
+            sector, x, y, z, angle, scale, window_first, window_last, depth = stack.pop()
+            visited += 1
+            dir_x, dir_y = math.cos(angle), math.sin(angle)
+            right_x, right_y = -dir_y, dir_x
+            floor, ceiling = self.floors[sector], self.ceilings[sector]
+            first_wall, count = self.sector_walls[sector]
+            for wall in range(first_wall, first_wall + count):
+                x1, y1, x2, y2 = self.walls[wall]
+                # Only walls the camera is inside of
+                if point_side(x1, y1, x2 - x1, y2 - y1, x, y) <= 0:
+                    continue
+                span = columns([((x1 - x) * dir_x + (y1 - y) * dir_y, (x1 - x) * right_x + (y1 - y) * right_y),
+                                ((x2 - x) * dir_x + (y2 - y) * dir_y, (x2 - x) * right_x + (y2 - y) * right_y)])
+                if span is None:
+                    continue
+                first, last = max(span[0], window_first), min(span[1], window_last)
+                if first > last:
+                    continue
+
+                # Where each column's ray meets the wall
+                ray_x = dir_x + right_x * tan_half_fov * camera[first:last + 1]
+                ray_y = dir_y + right_y * tan_half_fov * camera[first:last + 1]
+                ex, ey = x2 - x1, y2 - y1
+                denominator = ray_x * ey - ray_y * ex
+                denominator[denominator == 0] = 1e-12
+                px, py = x1 - x, y1 - y
+                wall_depth = np.maximum((px * ey - py * ex) / denominator, NEAR_PLANE * scale)
+                u = np.clip((px * ray_y - py * ray_x) / denominator, 0.0, 1.0) * math.hypot(ex, ey)
+
+                def row(height_z):
+                    return height / 2.0 - (height_z - z) * height / wall_depth
+
+                top = np.maximum(row(ceiling), upper[first:last + 1])
+                bottom = np.minimum(row(floor), lower[first:last + 1])
+                # The texture hangs from the ceiling: v at row r is v_top + r * v_scale
+                v_scale = wall_depth / height
+                v_top = ceiling - z - wall_depth / 2.0
+                light_depth = wall_depth / scale
+                texture = self.wall_textures[wall]
+                target = self.links[wall]
+                if target < 0 or depth >= MAX_PORTAL_DEPTH:
+                    spans.append((first, last, light_depth, u, v_top, v_scale, top, bottom, texture))
+                    upper[first:last + 1] = lower[first:last + 1]
+                    continue
+
+                # Steps where the sector behind has a lower ceiling or a higher floor
+                cos, sin, link_scale = self.transforms[wall][:3]
+                target_sector = self.wall_sectors[target]
+                target_floor = self.floors[target_sector] / link_scale
+                target_ceiling = self.ceilings[target_sector] / link_scale
+                opening_top = np.maximum(top, row(target_ceiling)) if target_ceiling < ceiling else top
+                opening_bottom = np.minimum(bottom, row(target_floor)) if target_floor > floor else bottom
+                if target_ceiling < ceiling:
+                    spans.append((first, last, light_depth, u, v_top, v_scale, top,
+                                  np.minimum(opening_top, bottom), texture))
+                if target_floor > floor:
+                    spans.append((first, last, light_depth, u, v_top, v_scale,
+                                  np.maximum(opening_bottom, top), bottom, texture))
+                upper[first:last + 1] = opening_top
+                lower[first:last + 1] = opening_bottom
+
+                # Draw what is behind through the opening
+                if (upper[first:last + 1] < lower[first:last + 1]).any():
+                    target_x, target_y = self.transform_point(wall, x, y)
+                    stack.append((target_sector, target_x, target_y, self.transform_height(wall, z),
+                                  angle + math.atan2(sin, cos), scale * link_scale, first, last, depth + 1))
+        return visited
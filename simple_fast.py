@@ -3,6 +3,14 @@ import numpy as np
 import math
 import random
 import time
+from frame_uniforms import FrameUniforms
+from portal_index import PortalIndex
+from cell_grid import CellGrid
+from distance_field import chebyshev_distance, safe_step
+from room_adjacency import RoomAdjacency
+from nested_grid import trace_cell
+from tiled_grid import ROW_MAJOR, grid_dda
+from chunked_world import ChunkedWorld
 
 # Initialize Pygame
 pygame.init()
@@ -31,7 +39,7 @@ clock = pygame.time.Clock()
 
 # Create a more complex map with impossible spaces
 MAP_SIZE = 16
-MAP = np.zeros((MAP_SIZE, MAP_SIZE), dtype=np.int32)
+MAP = CellGrid(MAP_SIZE, MAP_SIZE)
 
 # Fill the border with walls
 MAP[0, :] = 1
@@ -45,14 +53,7 @@ for _ in range(15):
     y = random.randint(2, MAP_SIZE-3)
     MAP[y, x] = 1
 
-# Wall types:
-# 0 = empty space
-# 1 = normal wall
-# 2 = portal entrance/exit
-# 3 = non-Euclidean space entrance
-# 4 = reality distortion wall
-# 5 = perspective shift wall
-# 6 = 4D hypercube entrance
+# Cell codes are the cell_grid.WallType values
 
 # Add seamless portals (special walls that you can see through and walk between)
 PORTALS = []
@@ -110,7 +111,7 @@ for _ in range(3):
             facing2 = 3  # Facing west
         
         # Check if the locations are valid (not already used)
-        if MAP[y1, x1] == 0 and MAP[y2, x2] == 0:
+        if MAP.get(x1, y1) == 0 and MAP.get(x2, y2) == 0:
             valid_placement = True
     
     if valid_placement:
@@ -126,11 +127,38 @@ for _ in range(3):
         # Also store the traditional portal data for compatibility
         PORTALS.append((x1, y1, x2, y2))
 
+# Index seamless portals by cell: a portal reacts within 0.5 of its (x, y)
+# corner, which touches the four cells around that corner
+SEAMLESS_PORTAL_INDEX = PortalIndex(MAP_SIZE, MAP_SIZE)
+for portal_pair in SEAMLESS_PORTALS:
+    for portal in portal_pair:
+        linked_portal = portal_pair[portal['linked_to']]
+        SEAMLESS_PORTAL_INDEX.add(
+            [(portal['x'] + cx, portal['y'] + cy) for cy in (-1, 0) for cx in (-1, 0)],
+            (portal['x'], portal['y']),
+            (linked_portal['x'], linked_portal['y']),
+            (linked_portal['facing'] - portal['facing']) * math.pi/2,
+            portal['facing']
+        )
+
+def approaching_portal(portal_facing, dx, dy):
+    """Check if something at offset (dx, dy) from a portal is moving through it from the front"""
+    # Approach from the side opposite to the portal's facing direction
+    if portal_facing == 0:  # North-facing portal, approaching from south
+        return dy > 0
+    elif portal_facing == 1:  # East-facing portal, approaching from west
+        return dx < 0
+    elif portal_facing == 2:  # South-facing portal, approaching from north
+        return dy < 0
+    elif portal_facing == 3:  # West-facing portal, approaching from east
+        return dx > 0
+    return False
+
 # Add non-Euclidean spaces (rooms bigger on the inside)
 NON_EUCLIDEAN_SPACES = []
 for _ in range(2):
     x, y = random.randint(2, MAP_SIZE-3), random.randint(2, MAP_SIZE-3)
-    if MAP[y, x] == 0:
+    if MAP.get(x, y) == 0:
         # Create a non-Euclidean space entrance
         MAP[y, x] = 3
         
@@ -159,11 +187,20 @@ for _ in range(2):
             'height': inner_height
         })
 
+# What each non-Euclidean entrance shows from outside: the inner map scaled
+# into the entrance cell, its outer ring drawn as the entrance itself
+SPACE_INTERIORS = {}
+for space in NON_EUCLIDEAN_SPACES:
+    interior = space['map'].astype(np.uint8)
+    interior[0, :] = interior[-1, :] = interior[:, 0] = interior[:, -1] = 3
+    SPACE_INTERIORS[space['entrance']] = interior
+
 # Add 4D hypercube entrances - now with brain-breaking recursive maps
 HYPERCUBES = []
+MAX_ROOM_CROSSINGS = 3
 for _ in range(2):
     x, y = random.randint(2, MAP_SIZE-3), random.randint(2, MAP_SIZE-3)
-    if MAP[y, x] == 0:
+    if MAP.get(x, y) == 0:
         MAP[y, x] = 6  # Mark as hypercube entrance
         
         # Create a completely different map structure for each hypercube
@@ -267,9 +304,19 @@ for _ in range(2):
             'is_central': True
         })
         
+        # Room adjacency for seeing across rooms: face f of each of the 16
+        # tesseract rooms leads to the room whose index differs in bit f.
+        # Connection markers (20-35) are see-through; the central room's
+        # faces stay closed and look out into the outer map instead.
+        adjacency = RoomAdjacency([room['map'] for room in rooms], see_through=range(20, 36))
+        for i in range(16):
+            for face in range(4):
+                adjacency.link(i, face, i ^ (1 << face))
+        
         HYPERCUBES.append({
             'entrance': (x, y),
             'rooms': rooms,
+            'adjacency': adjacency,
             'outer_map': outer_map,
             'outer_size': outer_size,
             'recursive_portals': recursive_portals
@@ -278,7 +325,7 @@ for _ in range(2):
 # Add reality distortion walls
 for _ in range(5):
     x, y = random.randint(2, MAP_SIZE-3), random.randint(2, MAP_SIZE-3)
-    if MAP[y, x] == 0:
+    if MAP.get(x, y) == 0:
         MAP[y, x] = 4  # Reality distortion wall
 
 # Create distortion fields
@@ -290,6 +337,15 @@ for _ in range(4):
     strength = random.uniform(0.2, 0.8)
     DISTORTION_FIELDS.append((x, y, radius, strength))
 
+# Distance from each cell to the nearest wall, special cell or portal, so rays
+# can cross open space in one step
+EMPTY_DISTANCE = chebyshev_distance(MAP.solid_mask() | (SEAMLESS_PORTAL_INDEX.cells >= 0))
+
+# Endless world of streamed chunks, entered with E; cells are one unit, like MAP
+ENDLESS_WORLD = ChunkedWorld(cell_size=1)
+ENDLESS_VIEW_DISTANCE = 20.0
+ENDLESS_COLORS = [(200, 70, 60), (60, 140, 200), (90, 200, 90), (200, 180, 60)]  # By chunk texture id
+
 # Player settings
 player_x = 1.5
 player_y = 1.5
@@ -321,21 +377,31 @@ def fast_cos(angle):
     return COS_TABLE[index]
 
 # Advanced ray casting with impossible spaces
-def advanced_raycast(player_x, player_y, player_angle):
+def advanced_raycast(player_x, player_y, player_angle, uniforms=None):
     # Results
     wall_heights = [0] * WIDTH
     wall_colors = [(0, 0, 0)] * WIDTH
     wall_types = [0] * WIDTH
     wall_effects = [None] * WIDTH
     
+    # Snapshot time and player state once for the whole frame
+    if uniforms is None:
+        uniforms = FrameUniforms.capture(player_state=player_state)
+    now = uniforms.time
+    reality_level = uniforms.reality_level
+    gravity_direction = uniforms.gravity_direction
+    
     # Check if player is in a special space
-    if not player_state['in_normal_space']:
+    if not uniforms.in_normal_space:
         # Handle non-Euclidean space
-        if player_state['current_space'] == 'non_euclidean':
-            return raycast_non_euclidean(player_state['space_position'][0], player_state['space_position'][1], player_angle)
+        if uniforms.current_space == 'non_euclidean':
+            return raycast_non_euclidean(player_state['space_position'][0], player_state['space_position'][1], player_angle, uniforms)
         # Handle hypercube
-        elif player_state['current_space'] == 'hypercube':
-            return raycast_hypercube(player_state['hypercube_room'], player_state['space_position'][0], player_state['space_position'][1], player_angle)
+        elif uniforms.current_space == 'hypercube':
+            return raycast_hypercube(player_state['hypercube_room'], player_state['space_position'][0], player_state['space_position'][1], player_angle, uniforms)
+        # Handle the endless chunked world
+        elif uniforms.current_space == 'endless':
+            return raycast_endless(player_state['space_position'][0], player_state['space_position'][1], player_angle, uniforms)
     
     # Cast a ray for each column of the screen
     for x in range(0, WIDTH, 1):  # Step by 1 for full resolution
@@ -343,8 +409,8 @@ def advanced_raycast(player_x, player_y, player_angle):
         ray_angle = (player_angle - math.radians(HALF_FOV)) + (x / WIDTH) * math.radians(FOV)
         
         # Apply reality distortion to ray angle
-        if player_state['reality_level'] < 1.0:
-            distortion = math.sin(time.time() * 3 + x * 0.05) * (1.0 - player_state['reality_level']) * 0.2
+        if reality_level < 1.0:
+            distortion = math.sin(now * 3 + x * 0.05) * (1.0 - reality_level) * 0.2
             ray_angle += distortion
         
         # Ray direction
@@ -352,11 +418,11 @@ def advanced_raycast(player_x, player_y, player_angle):
         ray_dir_y = fast_sin(ray_angle)
         
         # Apply gravity direction to ray
-        if player_state['gravity_direction'] == 1:  # Right
+        if gravity_direction == 1:  # Right
             ray_dir_x, ray_dir_y = ray_dir_y, -ray_dir_x
-        elif player_state['gravity_direction'] == 2:  # Up
+        elif gravity_direction == 2:  # Up
             ray_dir_x, ray_dir_y = -ray_dir_x, -ray_dir_y
-        elif player_state['gravity_direction'] == 3:  # Left
+        elif gravity_direction == 3:  # Left
             ray_dir_x, ray_dir_y = -ray_dir_y, ray_dir_x
         
         # Current position
@@ -370,82 +436,62 @@ def advanced_raycast(player_x, player_y, player_angle):
         special_effect = None
         portal_traversed = False  # Track if we've gone through a portal
         portal_distance = 0.0     # Distance at which we went through the portal
-        linked_portal = None      # The portal we're linked to
-        portal_offset_x = 0.0     # Offset to apply after portal traversal
-        portal_offset_y = 0.0     # Offset to apply after portal traversal
-        portal_rotation = 0.0     # Rotation to apply after portal traversal
         
         # Step size - larger for better performance
         step_size = 0.05
         
         # Cast the ray
         while not hit_wall and distance < 20:
-            # Move the ray
-            ray_x += ray_dir_x * step_size
-            ray_y += ray_dir_y * step_size
-            distance += step_size
+            # Move the ray, skipping ahead through open space
+            step = step_size
+            if 0 <= ray_x < MAP_SIZE and 0 <= ray_y < MAP_SIZE:
+                step = max(step_size, safe_step(EMPTY_DISTANCE, int(ray_x), int(ray_y)))
+            ray_x += ray_dir_x * step
+            ray_y += ray_dir_y * step
+            distance += step
             
             # Check if we hit a wall
             map_x = int(ray_x)
             map_y = int(ray_y)
             
-            # Check for portals - if we're near a portal, check if we should go through it
-            for portal_pair in SEAMLESS_PORTALS:
-                for i, portal in enumerate(portal_pair):
-                    # Check if we're close to this portal
-                    portal_x, portal_y = portal['x'], portal['y']
-                    portal_facing = portal['facing']
+            # Check for portals - the cell index tells us which portal, if any, is near
+            portal = SEAMLESS_PORTAL_INDEX.lookup(map_x, map_y)
+            if portal >= 0 and not portal_traversed:
+                portal_x, portal_y = SEAMLESS_PORTAL_INDEX.source[portal]
+                portal_dx = ray_x - portal_x
+                portal_dy = ray_y - portal_y
+                
+                # If we're close to the portal and approaching it from the front
+                if (portal_dx*portal_dx + portal_dy*portal_dy < 0.25 and
+                        approaching_portal(SEAMLESS_PORTAL_INDEX.facing[portal], portal_dx, portal_dy)):
+                    # We're going through the portal!
+                    portal_traversed = True
+                    portal_distance = distance
                     
-                    # Calculate distance to portal center
-                    dx = ray_x - portal_x
-                    dy = ray_y - portal_y
-                    dist_to_portal = math.sqrt(dx*dx + dy*dy)
+                    # Apply the portal transformation
+                    offset_x, offset_y = SEAMLESS_PORTAL_INDEX.offset[portal]
+                    ray_x += offset_x
+                    ray_y += offset_y
                     
-                    # If we're close to the portal and facing the right direction
-                    if dist_to_portal < 0.5:
-                        # Check if we're approaching from the right direction
-                        # (opposite to the portal's facing direction)
-                        approaching = False
-                        if portal_facing == 0 and dy > 0:  # North-facing portal, approaching from south
-                            approaching = True
-                        elif portal_facing == 1 and dx < 0:  # East-facing portal, approaching from west
-                            approaching = True
-                        elif portal_facing == 2 and dy < 0:  # South-facing portal, approaching from north
-                            approaching = True
-                        elif portal_facing == 3 and dx > 0:  # West-facing portal, approaching from east
-                            approaching = True
-                        
-                        # If we're approaching the portal and haven't gone through one yet
-                        if approaching and not portal_traversed:
-                            # We're going through the portal!
-                            portal_traversed = True
-                            portal_distance = distance
-                            
-                            # Get the linked portal
-                            linked_idx = portal['linked_to']
-                            linked_portal = portal_pair[linked_idx]
-                            
-                            # Calculate the offset to apply to the ray
-                            portal_offset_x = linked_portal['x'] - portal_x
-                            portal_offset_y = linked_portal['y'] - portal_y
-                            
-                            # Calculate rotation to apply (difference in facing directions)
-                            portal_rotation = (linked_portal['facing'] - portal_facing) * math.pi/2
-                            
-                            # Apply the portal transformation
-                            ray_x += portal_offset_x
-                            ray_y += portal_offset_y
-                            
-                            # Apply rotation to ray direction if portals face different directions
-                            if portal_rotation != 0:
-                                old_dir_x = ray_dir_x
-                                old_dir_y = ray_dir_y
-                                ray_dir_x = old_dir_x * math.cos(portal_rotation) - old_dir_y * math.sin(portal_rotation)
-                                ray_dir_y = old_dir_x * math.sin(portal_rotation) + old_dir_y * math.cos(portal_rotation)
+                    # Apply rotation to ray direction if portals face different directions
+                    ray_dir_x, ray_dir_y = SEAMLESS_PORTAL_INDEX.rotate(portal, ray_dir_x, ray_dir_y)
             
             # Check if we're in bounds and hit a wall
             if 0 <= map_x < MAP_SIZE and 0 <= map_y < MAP_SIZE:
-                wall_type = MAP[map_y, map_x]
+                wall_type = MAP.get(map_x, map_y)
+                if wall_type == 3 and (map_x, map_y) in SPACE_INTERIORS:
+                    # Look into the room through its entrance: the inner grid fills the cell
+                    interior = SPACE_INTERIORS[(map_x, map_y)]
+                    inner_distance, inner_x, inner_y, _ = trace_cell(
+                        interior, interior.shape[1], interior.shape[0],
+                        ray_x, ray_y, ray_dir_x, ray_dir_y, map_x, map_y, False)
+                    ray_x += ray_dir_x * inner_distance
+                    ray_y += ray_dir_y * inner_distance
+                    distance += inner_distance
+                    if inner_x < 0:
+                        continue  # Out the other side
+                    wall_type = int(interior[inner_y, inner_x])
+                
                 if wall_type > 0 and wall_type != 2:  # Not a portal
                     hit_wall = True
                     
@@ -470,7 +516,7 @@ def advanced_raycast(player_x, player_y, player_angle):
             # Apply perspective shifts for special walls
             if special_effect == 'perspective_shift':
                 # Make the wall appear to shift in perspective
-                shift = math.sin(time.time() * 2 + x * 0.1) * 0.3
+                shift = math.sin(now * 2 + x * 0.1) * 0.3
                 wall_height = int(wall_height * (1.0 + shift))
             
             wall_heights[x] = wall_height
@@ -498,7 +544,7 @@ def advanced_raycast(player_x, player_y, player_angle):
             wall_color = tuple(int(c * shade) for c in base_color)
             
             # Apply trippy color effect
-            time_factor = time.time() * 2
+            time_factor = now * 2
             r = min(255, int(wall_color[0] * (1 + math.sin(time_factor + x * 0.1) * 0.2)))
             g = min(255, int(wall_color[1] * (1 + math.sin(time_factor + x * 0.05) * 0.2)))
             b = min(255, int(wall_color[2] * (1 + math.sin(time_factor + x * 0.02) * 0.2)))
@@ -525,7 +571,11 @@ def advanced_raycast(player_x, player_y, player_angle):
     return wall_heights, wall_colors, wall_types, wall_effects
 
 # Raycasting for non-Euclidean spaces
-def raycast_non_euclidean(pos_x, pos_y, angle):
+def raycast_non_euclidean(pos_x, pos_y, angle, uniforms=None):
+    if uniforms is None:
+        uniforms = FrameUniforms.capture(player_state=player_state)
+    now = uniforms.time
+    
     # Find which non-Euclidean space we're in
     current_space = None
     for space in NON_EUCLIDEAN_SPACES:
@@ -535,7 +585,7 @@ def raycast_non_euclidean(pos_x, pos_y, angle):
     
     if not current_space:
         # Fallback to normal raycasting
-        return advanced_raycast(player_x, player_y, player_angle)
+        return advanced_raycast(player_x, player_y, player_angle, uniforms)
     
     # Results
     wall_heights = [0] * WIDTH
@@ -558,7 +608,7 @@ def raycast_non_euclidean(pos_x, pos_y, angle):
         
         # Apply non-Euclidean bending to ray direction
         # This creates the impossible space effect where angles don't add up to what they should
-        bend_factor = math.sin(time.time() * 0.5 + x * 0.01) * 0.05
+        bend_factor = math.sin(now * 0.5 + x * 0.01) * 0.05
         temp_x = ray_dir_x
         ray_dir_x = ray_dir_x * math.cos(bend_factor) - ray_dir_y * math.sin(bend_factor)
         ray_dir_y = temp_x * math.sin(bend_factor) + ray_dir_y * math.cos(bend_factor)
@@ -613,7 +663,7 @@ def raycast_non_euclidean(pos_x, pos_y, angle):
             # Apply perspective shifts for special walls
             if special_effect == 'perspective_shift':
                 # Make the wall appear to shift in perspective
-                shift = math.sin(time.time() * 2 + x * 0.1) * 0.3
+                shift = math.sin(now * 2 + x * 0.1) * 0.3
                 wall_height = int(wall_height * (1.0 + shift))
             
             wall_heights[x] = wall_height
@@ -637,7 +687,7 @@ def raycast_non_euclidean(pos_x, pos_y, angle):
             wall_color = tuple(int(c * shade) for c in base_color)
             
             # Apply trippy color effect
-            time_factor = time.time() * 2
+            time_factor = now * 2
             r = min(255, int(wall_color[0] * (1 + math.sin(time_factor + x * 0.1) * 0.2)))
             g = min(255, int(wall_color[1] * (1 + math.sin(time_factor + x * 0.05) * 0.2)))
             b = min(255, int(wall_color[2] * (1 + math.sin(time_factor + x * 0.02) * 0.2)))
@@ -646,8 +696,60 @@ def raycast_non_euclidean(pos_x, pos_y, angle):
     
     return wall_heights, wall_colors, wall_types, wall_effects
 
+# Raycasting for the endless chunked world
+def raycast_endless(pos_x, pos_y, angle, uniforms=None):
+    if uniforms is None:
+        uniforms = FrameUniforms.capture(player_state=player_state)
+    now = uniforms.time
+    
+    # Results
+    wall_heights = [0] * WIDTH
+    wall_colors = [(0, 0, 0)] * WIDTH
+    wall_types = [0] * WIDTH
+    wall_effects = [None] * WIDTH
+    
+    # Queue the chunks along the view for the background thread, so the
+    # rays below rarely have to generate one themselves
+    ENDLESS_WORLD.prefetch(pos_x, pos_y, angle)
+    
+    for x in range(WIDTH):
+        # Calculate ray angle
+        ray_angle = (angle - math.radians(HALF_FOV)) + (x / WIDTH) * math.radians(FOV)
+        
+        # Exact grid DDA that follows the ray across chunk boundaries
+        hit = ENDLESS_WORLD.cast_ray(pos_x, pos_y, ray_angle, ENDLESS_VIEW_DISTANCE)
+        if hit is None:
+            continue
+        distance, side, texture = hit
+        
+        # Apply fish-eye correction
+        distance = max(0.01, distance * math.cos(ray_angle - angle))
+        
+        wall_heights[x] = min(HEIGHT, int((1.0 / distance) * HEIGHT * 0.5))
+        wall_types[x] = 1
+        
+        # Apply distance shading, darker on walls facing along y
+        shade = 1.0 - min(1.0, distance / ENDLESS_VIEW_DISTANCE)
+        if side == 1:
+            shade *= 0.7
+        wall_color = tuple(int(c * shade) for c in ENDLESS_COLORS[texture % len(ENDLESS_COLORS)])
+        
+        # Apply trippy color effect
+        time_factor = now * 2
+        r = min(255, int(wall_color[0] * (1 + math.sin(time_factor + x * 0.1) * 0.2)))
+        g = min(255, int(wall_color[1] * (1 + math.sin(time_factor + x * 0.05) * 0.2)))
+        b = min(255, int(wall_color[2] * (1 + math.sin(time_factor + x * 0.02) * 0.2)))
+        
+        wall_colors[x] = (r, g, b)
+    
+    return wall_heights, wall_colors, wall_types, wall_effects
+
 # Raycasting for 4D hypercube spaces
-def raycast_hypercube(room_id, pos_x, pos_y, angle):
+def raycast_hypercube(room_id, pos_x, pos_y, angle, uniforms=None):
+    if uniforms is None:
+        uniforms = FrameUniforms.capture(player_state=player_state)
+    now = uniforms.time
+    
     # Find the current hypercube
     current_cube = None
     for cube in HYPERCUBES:
@@ -657,7 +759,7 @@ def raycast_hypercube(room_id, pos_x, pos_y, angle):
     
     if not current_cube:
         # Fallback to normal raycasting
-        return advanced_raycast(player_x, player_y, player_angle)
+        return advanced_raycast(player_x, player_y, player_angle, uniforms)
     
     # Get the current room in the hypercube
     current_room = current_cube['rooms'][room_id]
@@ -677,6 +779,26 @@ def raycast_hypercube(room_id, pos_x, pos_y, angle):
     else:
         room_x, room_y = current_room['position']
     
+    # Apply 4D rotation to ray direction based on w-coordinate
+    # This creates the effect of the 4th dimension influencing the 3D projection.
+    # It only depends on the room and the frame time, so compute it once per frame.
+    w_coord = room_id / 16.0  # Normalize to 0-1 range
+    w_effect = math.sin(w_coord * math.pi * 2 + now * 0.5) * 0.1
+    
+    # Apply a more extreme distortion in the central room
+    if is_central:
+        # In the central room, rays bend based on distance from center
+        center_x, center_y = room_size / 2, room_size / 2
+        dist_from_center = math.sqrt((pos_x - center_x)**2 + (pos_y - center_y)**2)
+        center_effect = 0.2 * math.sin(dist_from_center * 0.5 + now)
+        w_effect += center_effect
+    
+    # Per-frame 4D wall height and color shift terms
+    w_height_base = 1.0 + 0.3 * math.sin(w_coord * math.pi * 4 + now)
+    w_factor = math.sin(w_coord * math.pi * 4 + now * 2) * 0.3
+    
+    max_distance = room_size * 3  # Allow for longer rays to see distant features
+    
     # Cast rays in the hypercube room
     for x in range(WIDTH):
         # Calculate ray angle
@@ -686,93 +808,69 @@ def raycast_hypercube(room_id, pos_x, pos_y, angle):
         ray_dir_x = fast_cos(ray_angle)
         ray_dir_y = fast_sin(ray_angle)
         
-        # Apply 4D rotation to ray direction based on w-coordinate
-        # This creates the effect of the 4th dimension influencing the 3D projection
-        w_coord = room_id / 16.0  # Normalize to 0-1 range
-        w_effect = math.sin(w_coord * math.pi * 2 + time.time() * 0.5) * 0.1
-        
-        # Apply a more extreme distortion in the central room
-        if is_central:
-            # In the central room, rays bend based on distance from center
-            center_x, center_y = room_size / 2, room_size / 2
-            dist_from_center = math.sqrt((pos_x - center_x)**2 + (pos_y - center_y)**2)
-            center_effect = 0.2 * math.sin(dist_from_center * 0.5 + time.time())
-            w_effect += center_effect
-        
         # Apply the 4D rotation
         temp_x = ray_dir_x
         ray_dir_x = ray_dir_x * math.cos(w_effect) - ray_dir_y * math.sin(w_effect)
         ray_dir_y = temp_x * math.sin(w_effect) + ray_dir_y * math.cos(w_effect)
         
-        # Current position
-        ray_x = pos_x
-        ray_y = pos_y
-        
-        # Distance traveled
-        distance = 0.0
-        hit_wall = False
+        # Walk the ray through this room and on into the neighbouring rooms
+        distance, hit_room, map_x, map_y, side, crossings = current_cube['adjacency'].cast_ray(
+            room_id, pos_x, pos_y, ray_dir_x, ray_dir_y, max_distance, MAX_ROOM_CROSSINGS)
+        hit_wall = True
         wall_type = 0
         special_effect = None
-        connection_id = -1
-        portal_id = -1
         
-        # Cast the ray
-        max_distance = room_size * 3  # Allow for longer rays to see distant features
-        while not hit_wall and distance < max_distance:
-            # Move the ray
-            ray_x += ray_dir_x * 0.05
-            ray_y += ray_dir_y * 0.05
-            distance += 0.05
-            
-            # Check if we hit a wall in the room
-            map_x = int(ray_x)
-            map_y = int(ray_y)
-            
-            if 0 <= map_x < room_size and 0 <= map_y < room_size:
-                wall_type = room_map[map_y, map_x]
-                if wall_type > 0:
-                    hit_wall = True
-                    
-                    # Check for different wall types
-                    if wall_type >= 20 and wall_type < 36:  # Connections to other rooms (20-35)
-                        connection_id = wall_type - 20
-                        # Check if this connection is valid in the hypercube topology
-                        if connection_id in current_room['connections']:
-                            special_effect = f'hypercube_connection_{connection_id}'
-                    elif wall_type >= 10 and wall_type < 15:  # Recursive portals (10-14)
-                        portal_id = wall_type - 10
-                        special_effect = f'recursive_portal_{portal_id}'
-                    elif wall_type == 6:  # Exit back to normal space
-                        special_effect = 'hypercube_exit'
-                    elif wall_type == 7:  # Reality fracture
-                        special_effect = 'reality_fracture'
-                    elif wall_type == 8:  # Dimensional shift
-                        special_effect = 'dimensional_shift'
-                    elif wall_type == 4:  # Reality distortion
-                        special_effect = 'reality_distortion'
-                    elif wall_type == 5:  # Perspective shift
-                        special_effect = 'perspective_shift'
-            else:
-                # We've hit the boundary of the current room section
-                # In our recursive space, we can see into other sections of the outer map
-                
-                # Calculate position in the outer map
-                outer_x = room_x + map_x
-                outer_y = room_y + map_y
-                
-                # Check if this position is within the outer map
+        if hit_room < 0:
+            # Out of range
+            hit_wall = False
+        elif not (0 <= map_x < current_cube['adjacency'].sizes[hit_room] and 0 <= map_y < current_cube['adjacency'].sizes[hit_room]):
+            # Stopped on a closed face
+            if crossings == 0:
+                # We can see into the outer map - truly impossible space
                 outer_size = current_cube['outer_size']
-                if 0 <= outer_x < outer_size and 0 <= outer_y < outer_size:
-                    # We can see into the outer map - truly impossible space
-                    wall_type = current_cube['outer_map'][outer_y, outer_x]
-                    if wall_type > 0:
-                        hit_wall = True
-                        special_effect = 'outer_map_view'
+                exit_distance = distance - 1e-6
+                outer_x = room_x + pos_x + ray_dir_x * exit_distance
+                outer_y = room_y + pos_y + ray_dir_y * exit_distance
+                outer_distance, outer_x, outer_y, _ = grid_dda(
+                    current_cube['outer_map'].ravel(), ROW_MAJOR, outer_size, outer_size, 0,
+                    outer_x, outer_y, ray_dir_x, ray_dir_y, max_distance - exit_distance)
+                if outer_x >= 0:
+                    distance = exit_distance + outer_distance
+                    wall_type = int(current_cube['outer_map'][outer_y, outer_x])
+                    special_effect = 'outer_map_view'
                 else:
-                    # Hit the boundary of the entire space
-                    hit_wall = True
+                    # Hit the boundary of the entire space, if it is in range
+                    edge_x = (outer_size - room_x - pos_x if ray_dir_x > 0 else -room_x - pos_x) / ray_dir_x if ray_dir_x else math.inf
+                    edge_y = (outer_size - room_y - pos_y if ray_dir_y > 0 else -room_y - pos_y) / ray_dir_y if ray_dir_y else math.inf
+                    distance = min(edge_x, edge_y)
+                    hit_wall = distance < max_distance
                     wall_type = 6  # Hypercube exit
                     special_effect = 'hypercube_exit'
+            else:
+                wall_type = 6  # Hypercube exit
+                special_effect = 'hypercube_exit'
+        else:
+            wall_type = int(current_cube['adjacency'].cells[hit_room, map_y, map_x])
+            
+            # Check for different wall types
+            if wall_type >= 20 and wall_type < 36:  # Connections to other rooms (20-35)
+                connection_id = wall_type - 20
+                # Check if this connection is valid in the hypercube topology
+                if connection_id in current_cube['rooms'][hit_room]['connections']:
+                    special_effect = f'hypercube_connection_{connection_id}'
+            elif wall_type >= 10 and wall_type < 15:  # Recursive portals (10-14)
+                portal_id = wall_type - 10
+                special_effect = f'recursive_portal_{portal_id}'
+            elif wall_type == 6:  # Exit back to normal space
+                special_effect = 'hypercube_exit'
+            elif wall_type == 7:  # Reality fracture
+                special_effect = 'reality_fracture'
+            elif wall_type == 8:  # Dimensional shift
+                special_effect = 'dimensional_shift'
+            elif wall_type == 4:  # Reality distortion
+                special_effect = 'reality_distortion'
+            elif wall_type == 5:  # Perspective shift
+                special_effect = 'perspective_shift'
         
         # Calculate wall height
         if hit_wall:
@@ -781,16 +879,16 @@ def raycast_hypercube(room_id, pos_x, pos_y, angle):
             
             # Calculate wall height with 4D effect
             # The 4D effect makes walls appear to change height based on the 4th dimension
-            w_height_effect = 1.0 + 0.3 * math.sin(w_coord * math.pi * 4 + time.time())
+            w_height_effect = w_height_base
             
             # Add additional effects for special walls
             if special_effect == 'reality_fracture':
                 # Reality fractures cause walls to appear to break apart
-                fracture = math.sin(time.time() * 3 + x * 0.2) * 0.4
+                fracture = math.sin(now * 3 + x * 0.2) * 0.4
                 w_height_effect *= (1.0 + fracture)
             elif special_effect == 'dimensional_shift':
                 # Dimensional shifts cause walls to appear to shift between dimensions
-                shift = math.sin(time.time() * 2 + distance * 0.5) * 0.5
+                shift = math.sin(now * 2 + distance * 0.5) * 0.5
                 w_height_effect *= (1.0 + shift)
             elif special_effect == 'outer_map_view':
                 # Seeing into the outer map creates a sense of vast space
@@ -818,7 +916,7 @@ def raycast_hypercube(room_id, pos_x, pos_y, angle):
                 base_color = (r, g, b)
             elif wall_type >= 10 and wall_type < 15:  # Recursive portal
                 # Portals have shifting rainbow colors
-                portal_hue = (wall_type - 10) / 5.0 + time.time() * 0.2
+                portal_hue = (wall_type - 10) / 5.0 + now * 0.2
                 r = int(128 + 127 * math.sin(portal_hue * math.pi * 2))
                 g = int(128 + 127 * math.sin(portal_hue * math.pi * 2 + 2*math.pi/3))
                 b = int(128 + 127 * math.sin(portal_hue * math.pi * 2 + 4*math.pi/3))
@@ -827,17 +925,16 @@ def raycast_hypercube(room_id, pos_x, pos_y, angle):
                 base_color = (150, 150, 255)  # Light blue
             elif wall_type == 7:  # Reality fracture
                 # Reality fractures have unstable, glitchy colors
-                t = time.time() * 5
+                t = now * 5
                 r = int(200 + 55 * math.sin(t + x * 0.1))
-                g = int(100 + 100 * math.cos(t * 1.5))
+                g = int(100 + 100 * uniforms.cos(7.5))
                 b = int(50 + 50 * math.sin(t * 0.7 + x * 0.2))
                 base_color = (r, g, b)
             elif wall_type == 8:  # Dimensional shift
                 # Dimensional shifts have colors that shift between dimensions
-                t = time.time()
-                r = int(100 + 100 * math.sin(t * 0.5))
-                g = int(100 + 100 * math.sin(t * 0.5 + math.pi/2))
-                b = int(100 + 100 * math.sin(t * 0.5 + math.pi))
+                r = int(100 + 100 * uniforms.sin(0.5))
+                g = int(100 + 100 * uniforms.cos(0.5))
+                b = int(100 - 100 * uniforms.sin(0.5))
                 base_color = (r, g, b)
             elif wall_type == 4:  # Reality distortion
                 base_color = (255, 150, 0)  # Orange
@@ -847,7 +944,7 @@ def raycast_hypercube(room_id, pos_x, pos_y, angle):
                 # For walls in the outer map
                 if special_effect == 'outer_map_view':
                     # These walls have a dreamlike quality
-                    t = time.time() * 0.2
+                    t = now * 0.2
                     r = int(80 + 50 * math.sin(t + outer_x * 0.05))
                     g = int(80 + 50 * math.sin(t + outer_y * 0.05))
                     b = int(150 + 50 * math.sin(t + (outer_x + outer_y) * 0.05))
@@ -860,8 +957,7 @@ def raycast_hypercube(room_id, pos_x, pos_y, angle):
             wall_color = tuple(int(c * shade) for c in base_color)
             
             # Apply 4D color shifting effect
-            time_factor = time.time() * 2
-            w_factor = math.sin(w_coord * math.pi * 4 + time_factor) * 0.3
+            time_factor = now * 2
             r = min(255, int(wall_color[0] * (1 + math.sin(time_factor + x * 0.1 + w_factor) * 0.3)))
             g = min(255, int(wall_color[1] * (1 + math.sin(time_factor + x * 0.05 + w_factor) * 0.3)))
             b = min(255, int(wall_color[2] * (1 + math.sin(time_factor + x * 0.02 + w_factor) * 0.3)))
@@ -873,7 +969,7 @@ def raycast_hypercube(room_id, pos_x, pos_y, angle):
                     r, g, b = b, r, g  # Color channel swapping
             elif special_effect == 'dimensional_shift':
                 # Add color bleeding between dimensions
-                bleed = 0.2 * math.sin(time.time() * 3 + x * 0.1)
+                bleed = 0.2 * math.sin(now * 3 + x * 0.1)
                 r = int(r * (1 + bleed))
                 g = int(g * (1 - bleed))
                 b = int(b * (1 + bleed * 0.5))
@@ -884,7 +980,7 @@ def raycast_hypercube(room_id, pos_x, pos_y, angle):
     
     if not current_cube:
         # Fallback to normal raycasting
-        return advanced_raycast(player_x, player_y, player_angle)
+        return advanced_raycast(player_x, player_y, player_angle, uniforms)
     
     # Get the current room
     room = current_cube['rooms'][room_id]
@@ -967,7 +1063,7 @@ def raycast_hypercube(room_id, pos_x, pos_y, angle):
                 # Connection to another room
                 conn_id = int(special_effect.split('_')[-1])
                 # Pulsing color based on connection ID
-                pulse = (math.sin(time.time() * 3 + conn_id) + 1) / 2
+                pulse = (math.sin(now * 3 + conn_id) + 1) / 2
                 r = int(100 + pulse * 155)
                 g = int(100 + (1-pulse) * 155)
                 b = 255
@@ -982,7 +1078,7 @@ def raycast_hypercube(room_id, pos_x, pos_y, angle):
             wall_color = tuple(int(c * shade) for c in base_color)
             
             # Apply 4D visual effects
-            time_factor = time.time() * 2
+            time_factor = now * 2
             w_coord = math.sin(time_factor + room_id * 0.5)  # Simulated 4th dimension
             
             # The 4th dimension affects the color mixing
@@ -1000,30 +1096,36 @@ def raycast_hypercube(room_id, pos_x, pos_y, angle):
     return wall_heights, wall_colors, wall_types, wall_effects
 
 # Render a frame
-def render_frame(player_x, player_y, player_angle, distortion_level=0.0):
+def render_frame(player_x, player_y, player_angle, distortion_level=0.0, uniforms=None):
+    # Snapshot time and player state once; everything below reads from it
+    if uniforms is None:
+        uniforms = FrameUniforms.capture(player_state=player_state)
+    now = uniforms.time
+    reality_level = uniforms.reality_level
+    
     # Get wall heights, colors, types, and effects
-    wall_heights, wall_colors, wall_types, wall_effects = advanced_raycast(player_x, player_y, player_angle)
+    wall_heights, wall_colors, wall_types, wall_effects = advanced_raycast(player_x, player_y, player_angle, uniforms)
     
     # Clear the screen
     screen.fill(BLACK)
     
     # Draw sky based on current space and reality level
-    if player_state['in_normal_space']:
+    if uniforms.in_normal_space:
         # Normal space sky
-        if player_state['reality_level'] < 1.0:
+        if reality_level < 1.0:
             # Distorted reality sky
             for y in range(HALF_HEIGHT):
                 t = y / HALF_HEIGHT
-                r = int(50 * (1 - t) + 100 * t * player_state['reality_level'])
-                g = int(50 * (1 - t) + 150 * t * player_state['reality_level'])
+                r = int(50 * (1 - t) + 100 * t * reality_level)
+                g = int(50 * (1 - t) + 150 * t * reality_level)
                 b = int(100 * (1 - t) + 200 * t)
                 # Add wavy distortion
-                wave = math.sin(y * 0.1 + time.time() * 2) * (1.0 - player_state['reality_level']) * 20
+                wave = math.sin(y * 0.1 + now * 2) * (1.0 - reality_level) * 20
                 pygame.draw.line(screen, (r, g, b), (0, y), (WIDTH, y + int(wave)))
         else:
             # Normal sky
             pygame.draw.rect(screen, (0, 100, 200), (0, 0, WIDTH, HALF_HEIGHT))
-    elif player_state['current_space'] == 'non_euclidean':
+    elif uniforms.current_space == 'non_euclidean':
         # Non-Euclidean space sky (purple gradient)
         for y in range(HALF_HEIGHT):
             t = y / HALF_HEIGHT
@@ -1031,7 +1133,10 @@ def render_frame(player_x, player_y, player_angle, distortion_level=0.0):
             g = int(0 * (1 - t) + 50 * t)
             b = int(100 * (1 - t) + 200 * t)
             pygame.draw.line(screen, (r, g, b), (0, y), (WIDTH, y))
-    elif player_state['current_space'] == 'hypercube':
+    elif uniforms.current_space == 'endless':
+        # Endless world sky
+        pygame.draw.rect(screen, (0, 100, 200), (0, 0, WIDTH, HALF_HEIGHT))
+    elif uniforms.current_space == 'hypercube':
         # 4D hypercube sky (shifting based on 4D coordinates)
         room_id = player_state['hypercube_room']
         for y in range(HALF_HEIGHT):
@@ -1041,15 +1146,15 @@ def render_frame(player_x, player_y, player_angle, distortion_level=0.0):
             g = int(50 * (1 - t) + ((room_id & 2) * 75 + 50) * t)
             b = int(100 * (1 - t) + ((room_id & 4) * 50 + 150) * t)
             # Add 4D ripple effect
-            w_coord = math.sin(time.time() + room_id * 0.5)  # Simulated 4th dimension
+            w_coord = math.sin(now + room_id * 0.5)  # Simulated 4th dimension
             ripple = math.sin(y * 0.1 + w_coord) * 10
             pygame.draw.line(screen, (r, g, b), (int(ripple), y), (WIDTH + int(ripple), y))
     
     # Draw floor based on current space and gravity direction
-    if player_state['gravity_direction'] == 0:  # Normal down gravity
-        if player_state['in_normal_space']:
+    if uniforms.gravity_direction == 0:  # Normal down gravity
+        if uniforms.in_normal_space:
             # Normal space floor
-            if player_state['reality_level'] < 1.0:
+            if reality_level < 1.0:
                 # Distorted reality floor
                 for y in range(HALF_HEIGHT, HEIGHT):
                     t = (y - HALF_HEIGHT) / HALF_HEIGHT
@@ -1057,8 +1162,8 @@ def render_frame(player_x, player_y, player_angle, distortion_level=0.0):
                     g = int(50 * (1 - t) + 70 * t)
                     b = int(50 * (1 - t) + 70 * t)
                     # Add checkerboard pattern that shifts with reality level
-                    checker_size = int(10 + (1.0 - player_state['reality_level']) * 20)
-                    if ((y // checker_size) + (int(time.time() * 5) // checker_size)) % 2 == 0:
+                    checker_size = int(10 + (1.0 - reality_level) * 20)
+                    if ((y // checker_size) + (int(now * 5) // checker_size)) % 2 == 0:
                         r, g, b = r//2, g//2, b//2
                     pygame.draw.line(screen, (r, g, b), (0, y), (WIDTH, y))
             else:
@@ -1087,37 +1192,37 @@ def render_frame(player_x, player_y, player_angle, distortion_level=0.0):
             # Apply distortion effects
             if distortion_level > 0:
                 # Basic wave distortion
-                wave_distortion = math.sin(x * 0.05 + time.time() * 2) * distortion_level * 10
+                wave_distortion = math.sin(x * 0.05 + now * 2) * distortion_level * 10
                 wall_top += int(wave_distortion)
                 wall_bottom += int(wave_distortion)
                 
                 # Apply special effects based on wall type
                 if wall_effects[x] == 'non_euclidean_entrance':
                     # Non-Euclidean entrances warp and pulse
-                    pulse = math.sin(time.time() * 3) * 5
+                    pulse = uniforms.sin(3.0) * 5
                     wall_top -= int(pulse)
                     wall_bottom += int(pulse)
                 elif wall_effects[x] == 'reality_distortion':
                     # Reality distortion walls shimmer and bend
-                    shimmer = math.sin(x * 0.2 + time.time() * 5) * 8
+                    shimmer = math.sin(x * 0.2 + now * 5) * 8
                     wall_top += int(shimmer)
                     wall_bottom -= int(shimmer)
                 elif wall_effects[x] == 'perspective_shift':
                     # Perspective shift walls change apparent height
-                    shift = math.sin(time.time() * 2) * 0.3
+                    shift = uniforms.sin(2.0) * 0.3
                     height = wall_bottom - wall_top
                     new_height = int(height * (1.0 + shift))
                     wall_top = HALF_HEIGHT - new_height // 2
                     wall_bottom = HALF_HEIGHT + new_height // 2
                 elif wall_effects[x] == 'hypercube_entrance':
                     # Hypercube entrances have a 4D visual effect
-                    w_effect = math.sin(time.time() * 4 + x * 0.1) * 10
+                    w_effect = math.sin(now * 4 + x * 0.1) * 10
                     wall_top = int(wall_top + w_effect * math.sin(x * 0.05))
                     wall_bottom = int(wall_bottom - w_effect * math.sin(x * 0.05))
                 elif wall_effects[x] and wall_effects[x].startswith('hypercube_connection'):
                     # Connections between hypercube rooms pulse
                     conn_id = int(wall_effects[x].split('_')[-1])
-                    pulse = math.sin(time.time() * 3 + conn_id) * 8
+                    pulse = math.sin(now * 3 + conn_id) * 8
                     wall_top -= int(pulse)
                     wall_bottom += int(pulse)
             
@@ -1125,7 +1230,7 @@ def render_frame(player_x, player_y, player_angle, distortion_level=0.0):
             if wall_types[x] == 6:  # Hypercube walls have a 4D shimmer effect
                 # Draw multiple lines with slight offsets for a shimmering effect
                 for i in range(3):
-                    offset = math.sin(time.time() * (i+1) * 2 + x * 0.1) * 2
+                    offset = math.sin(now * (i+1) * 2 + x * 0.1) * 2
                     color = wall_colors[x]
                     # Adjust color for each layer
                     r, g, b = color
@@ -1156,12 +1261,12 @@ def render_frame(player_x, player_y, player_angle, distortion_level=0.0):
     # Draw walls
     for y in range(MAP_SIZE):
         for x in range(MAP_SIZE):
-            if MAP[y, x] == 1:  # Wall
+            if MAP.get(x, y) == 1:  # Wall
                 pygame.draw.rect(
                     screen, WHITE,
                     (10 + x * minimap_scale, 10 + y * minimap_scale, minimap_scale, minimap_scale)
                 )
-            elif MAP[y, x] == 2:  # Portal
+            elif MAP.get(x, y) == 2:  # Portal
                 pygame.draw.rect(
                     screen, (0, 255, 255),
                     (10 + x * minimap_scale, 10 + y * minimap_scale, minimap_scale, minimap_scale)
@@ -1277,6 +1382,17 @@ def main():
                 elif event.key == pygame.K_g:
                     # Change gravity direction (for testing)
                     player_state['gravity_direction'] = (player_state['gravity_direction'] + 1) % 4
+                elif event.key == pygame.K_e:
+                    # Toggle the endless chunked world
+                    if player_state['current_space'] == 'endless':
+                        ENDLESS_WORLD.stop()
+                        player_state['in_normal_space'] = True
+                        player_state['current_space'] = 'normal'
+                    elif player_state['in_normal_space']:
+                        ENDLESS_WORLD.start()
+                        player_state['in_normal_space'] = False
+                        player_state['current_space'] = 'endless'
+                        player_state['space_position'] = [0.5, 0.5]  # The outer ring of a chunk is always open
             
             # Handle key releases
             elif event.type == pygame.KEYUP:
@@ -1365,78 +1481,43 @@ def main():
             new_y = player_y + dy
             
             # Check for seamless portals - allow walking through them
-            portal_found = False  # Flag to track if we found a portal to go through
-            
-            for portal_pair in SEAMLESS_PORTALS:
-                if portal_found:
-                    break  # Skip remaining portal checks if we already found one
-                    
-                for i, portal in enumerate(portal_pair):
-                    portal_x, portal_y = portal['x'], portal['y']
-                    portal_facing = portal['facing']
-                    
-                    # Calculate distance to portal center
-                    dx = new_x - portal_x
-                    dy = new_y - portal_y
-                    dist_to_portal = math.sqrt(dx*dx + dy*dy)
+            portal = SEAMLESS_PORTAL_INDEX.lookup(int(new_x), int(new_y))
+            if portal >= 0:
+                portal_x, portal_y = SEAMLESS_PORTAL_INDEX.source[portal]
+                
+                # Calculate offset from the portal center
+                portal_dx = new_x - portal_x
+                portal_dy = new_y - portal_y
+                
+                # If we're close to the portal and about to walk through it from the front
+                if (portal_dx*portal_dx + portal_dy*portal_dy < 0.25 and
+                        approaching_portal(SEAMLESS_PORTAL_INDEX.facing[portal], portal_dx, portal_dy)):
+                    # Apply the portal transformation to position
+                    offset_x, offset_y = SEAMLESS_PORTAL_INDEX.offset[portal]
+                    new_x += offset_x
+                    new_y += offset_y
                     
-                    # If we're close to the portal and about to walk through it
-                    if dist_to_portal < 0.5:
-                        # Check if we're approaching from the right direction
-                        approaching = False
-                        if portal_facing == 0 and dy > 0:  # North-facing portal, approaching from south
-                            approaching = True
-                        elif portal_facing == 1 and dx < 0:  # East-facing portal, approaching from west
-                            approaching = True
-                        elif portal_facing == 2 and dy < 0:  # South-facing portal, approaching from north
-                            approaching = True
-                        elif portal_facing == 3 and dx > 0:  # West-facing portal, approaching from east
-                            approaching = True
+                    # Apply rotation to movement direction if portals face different directions
+                    rotation = SEAMLESS_PORTAL_INDEX.angle[portal]
+                    if rotation != 0:
+                        # Rotate the vector from the linked portal to player's new position
+                        linked_x, linked_y = SEAMLESS_PORTAL_INDEX.destination[portal]
+                        rot_x, rot_y = SEAMLESS_PORTAL_INDEX.rotate(portal, new_x - linked_x, new_y - linked_y)
                         
-                        # If we're approaching the portal
-                        if approaching:
-                            portal_found = True  # Mark that we found a portal
-                            
-                            # Get the linked portal
-                            linked_idx = portal['linked_to']
-                            linked_portal = portal_pair[linked_idx]
-                            
-                            # Calculate the offset to apply to the position
-                            offset_x = linked_portal['x'] - portal_x
-                            offset_y = linked_portal['y'] - portal_y
-                            
-                            # Calculate rotation to apply (difference in facing directions)
-                            rotation = (linked_portal['facing'] - portal_facing) * math.pi/2
-                            
-                            # Apply the portal transformation to position
-                            new_x += offset_x
-                            new_y += offset_y
-                            
-                            # Apply rotation to movement direction if portals face different directions
-                            if rotation != 0:
-                                # Calculate the vector from portal to player's new position
-                                rel_x = new_x - linked_portal['x']
-                                rel_y = new_y - linked_portal['y']
-                                
-                                # Rotate this vector
-                                rot_x = rel_x * math.cos(rotation) - rel_y * math.sin(rotation)
-                                rot_y = rel_x * math.sin(rotation) + rel_y * math.cos(rotation)
-                                
-                                # Apply the rotated vector to get the new position
-                                new_x = linked_portal['x'] + rot_x
-                                new_y = linked_portal['y'] + rot_y
-                                
-                                # Also rotate the player's viewing angle
-                                player_angle += rotation
-                            
-                            # Apply a subtle reality distortion effect when walking through portals
-                            reality_distortion_timer = current_time
-                            player_state['reality_level'] = max(0.8, player_state['reality_level'] - 0.05)
-                            break  # Stop checking other portals in this pair
+                        # Apply the rotated vector to get the new position
+                        new_x = linked_x + rot_x
+                        new_y = linked_y + rot_y
+                        
+                        # Also rotate the player's viewing angle
+                        player_angle += rotation
+                    
+                    # Apply a subtle reality distortion effect when walking through portals
+                    reality_distortion_timer = current_time
+                    player_state['reality_level'] = max(0.8, player_state['reality_level'] - 0.05)
             
             # Check for non-Euclidean space entrances
             if 0 <= int(new_x) < MAP_SIZE and 0 <= int(new_y) < MAP_SIZE:
-                wall_type = MAP[int(new_y), int(new_x)]
+                wall_type = MAP.get(int(new_x), int(new_y))
                 if wall_type == 3:  # Non-Euclidean space entrance
                     # Enter non-Euclidean space
                     player_state['in_normal_space'] = False
@@ -1463,9 +1544,9 @@ def main():
             
             # Check for collisions in normal space
             if 0 <= int(new_x) < MAP_SIZE and 0 <= int(new_y) < MAP_SIZE:
-                if MAP[int(new_y), int(player_x)] != 1:  # Not a wall
+                if MAP.get(int(player_x), int(new_y)) != 1:  # Not a wall
                     player_y = new_y
-                if MAP[int(player_y), int(new_x)] != 1:  # Not a wall
+                if MAP.get(int(new_x), int(player_y)) != 1:  # Not a wall
                     player_x = new_x
         else:
             # Movement in special spaces
@@ -1503,6 +1584,13 @@ def main():
                         player_x, player_y = player_state['non_euclidean_center']
                         player_x += 1.0  # Move slightly away from entrance
             
+            elif player_state['current_space'] == 'endless':
+                # Chunks generate on demand, so there is no edge to run into
+                if not ENDLESS_WORLD.is_wall(new_x, player_state['space_position'][1]):
+                    player_state['space_position'][0] = new_x
+                if not ENDLESS_WORLD.is_wall(player_state['space_position'][0], new_y):
+                    player_state['space_position'][1] = new_y
+            
             elif player_state['current_space'] == 'hypercube':
                 # Get the current hypercube
                 for cube in HYPERCUBES:
@@ -1627,10 +1715,11 @@ def main():
         
         # Render the frame
         current_distortion = distortion_level if distortion_enabled else 0.0
-        if player_state['in_normal_space']:
-            render_frame(player_x, player_y, player_angle, current_distortion)
+        uniforms = FrameUniforms.capture(current_time, player_state)
+        if uniforms.in_normal_space:
+            render_frame(player_x, player_y, player_angle, current_distortion, uniforms)
         else:
-            render_frame(player_state['space_position'][0], player_state['space_position'][1], player_angle, current_distortion)
+            render_frame(player_state['space_position'][0], player_state['space_position'][1], player_angle, current_distortion, uniforms)
         
         # Display FPS
         fps_counter += 1
@@ -1651,13 +1740,15 @@ def main():
             space_text = "Non-Euclidean Space"
         elif player_state['current_space'] == 'hypercube':
             space_text = f"4D Hypercube Room {player_state['hypercube_room']}"
+        elif player_state['current_space'] == 'endless':
+            space_text = f"Endless World ({len(ENDLESS_WORLD.chunks)} chunks)"
         
         status_text = f"{space_text} | Reality: {player_state['reality_level']:.1f} | Gravity: {['Down', 'Right', 'Up', 'Left'][player_state['gravity_direction']]}"
         text_surface = font.render(status_text, True, WHITE)
         screen.blit(text_surface, (10, 10))
         
         # Display controls
-        controls_text = f"Distortion: {'ON' if distortion_enabled else 'OFF'} (SPACE) | Level: {distortion_level:.1f} (+/-) | R: Toggle Reality | G: Change Gravity"
+        controls_text = f"Distortion: {'ON' if distortion_enabled else 'OFF'} (SPACE) | Level: {distortion_level:.1f} (+/-) | R: Toggle Reality | G: Change Gravity | E: Endless World"
         text_surface = font.render(controls_text, True, WHITE)
         screen.blit(text_surface, (10, HEIGHT - 30))
         
@@ -1667,6 +1758,7 @@ def main():
         # Cap the frame rate
         clock.tick(144)
     
+    ENDLESS_WORLD.stop()
     pygame.quit()
 
 if __name__ == "__main__":
@@ -0,0 +1,98 @@
+import math
+import numpy as np
+from palette_framebuffer import PaletteFramebuffer, quantize_colors
+
+# A single texture holding all wall textures side by side
+TEXTURE_SIZE = 64
+NUM_TEXTURES = 4
+ATLAS_WIDTH = TEXTURE_SIZE * NUM_TEXTURES
+ATLAS_HEIGHT = TEXTURE_SIZE
+
+
+def create_texture_atlas():
+    """Build the (ATLAS_HEIGHT, ATLAS_WIDTH, 3) atlas of the wall textures"""
+    atlas = np.zeros((ATLAS_HEIGHT, ATLAS_WIDTH, 3), dtype=np.uint8)
+
+    # Texture 1: Brick
+    for y in range(TEXTURE_SIZE):
+        for x in range(TEXTURE_SIZE):
+            # Brick pattern
+            brick_x = x % 16
+            brick_y = y % 16
+            if brick_x == 0 or brick_y == 0:
+                atlas[y, x] = [120, 60, 30]  # Mortar
+            else:
+                atlas[y, x] = [200, 70, 60]  # Brick
+
+    # Texture 2: Psychedelic
+    for y in range(TEXTURE_SIZE):
+        for x in range(TEXTURE_SIZE):
+            # Psychedelic pattern
+            r = int(127 + 127 * math.sin(x * 0.1 + y * 0.1))
+            g = int(127 + 127 * math.sin(x * 0.1 + y * 0.2 + 2))
+            b = int(127 + 127 * math.sin(x * 0.1 + y * 0.3 + 4))
+            atlas[y, x + TEXTURE_SIZE] = [r, g, b]
+
+    # Texture 3: Checkerboard
+    for y in range(TEXTURE_SIZE):
+        for x in range(TEXTURE_SIZE):
+            # Checkerboard pattern
+            if (x // 8 + y // 8) % 2 == 0:
+                atlas[y, x + TEXTURE_SIZE * 2] = [240, 240, 240]  # White
+            else:
+                atlas[y, x + TEXTURE_SIZE * 2] = [20, 20, 20]  # Black
+
+    # Texture 4: Gradient
+    for y in range(TEXTURE_SIZE):
+        for x in range(TEXTURE_SIZE):
+            # Gradient pattern
+            t = y / TEXTURE_SIZE
+            r = int(255 * t)
+            g = int(100 + 100 * math.sin(t * 10))
+            b = int(255 * (1 - t))
+            atlas[y, x + TEXTURE_SIZE * 3] = [r, g, b]
+
+    return atlas
+
+
+# Palette-indexed mode: sky and floor ramps plus every texture at several light levels
+SKY_STEPS = 16
+FLOOR_STEPS = 16
+PALETTE_LIGHT_LEVELS = 7
+TEXTURE_COLORS = 8
+PSYCHEDELIC_CYCLE_SPEED = 6.0  # Palette entries per second
+
+
+def create_palette_framebuffer(atlas, width, height):
+    """
+    Lay out the 256-entry palette of a width x height framebuffer for the
+    textures of an atlas. Returns (framebuffer, background, texture_indices).
+    """
+    framebuffer = PaletteFramebuffer(width, height)
+    sky_start = framebuffer.add_ramp((0, 0, 50), (100, 150, 255), SKY_STEPS)
+    floor_start = framebuffer.add_ramp((50, 50, 50), (100, 100, 100), FLOOR_STEPS)
+
+    # Background index for every screen row; on an odd height the floor gets
+    # the extra row, clamped to its last step
+    half_height = height // 2
+    sky_rows = np.arange(half_height)
+    floor_rows = np.arange(height - half_height)
+    background = np.concatenate([
+        sky_start + sky_rows * SKY_STEPS // half_height,
+        floor_start + np.minimum(floor_rows * FLOOR_STEPS // half_height, FLOOR_STEPS - 1),
+    ]).astype(np.uint8)
+
+    # texture_indices[texture, light level, y, x] is a palette index
+    texture_indices = np.zeros((NUM_TEXTURES, PALETTE_LIGHT_LEVELS, TEXTURE_SIZE, TEXTURE_SIZE), dtype=np.uint8)
+    for texture_id in range(NUM_TEXTURES):
+        texture = atlas[:, texture_id * TEXTURE_SIZE:(texture_id + 1) * TEXTURE_SIZE]
+        colors, labels = quantize_colors(texture, TEXTURE_COLORS)
+
+        # The psychedelic texture animates by rotating its colors
+        cycle_speed = PSYCHEDELIC_CYCLE_SPEED if texture_id == 1 else 0.0
+        for level in range(PALETTE_LIGHT_LEVELS):
+            shade = level / (PALETTE_LIGHT_LEVELS - 1)
+            start = framebuffer.add_colors(colors * shade, cycle_speed)
+            texture_indices[texture_id, level] = start + labels
+
+    return framebuffer, background, texture_indices
@@ -0,0 +1,134 @@
+import math
+import numpy as np
+
+try:
+    from numba import njit
+except ImportError:
+    # Without Numba the helpers below still work, as plain Python
+    def njit(function):
+        return function
+
+# Cell storage orders for TiledGrid
+ROW_MAJOR = 0   # cells[y, x] flattened row by row
+TILED = 1       # TILE_SIZE x TILE_SIZE tiles stored one after another, each row-major inside
+MORTON = 2      # Z-order curve: the bits of x and y interleaved
+
+TILE_SHIFT = 3              # 8x8 uint8 tiles: one 64-byte cache line per tile
+TILE_SIZE = 1 << TILE_SHIFT
+
+
+@njit
+def spread_bits(n):
+    """Spread the low 16 bits of n apart so a zero sits between each pair (works on arrays too)"""
+    n = n & 0xFFFF
+    n = (n | (n << 8)) & 0x00FF00FF
+    n = (n | (n << 4)) & 0x0F0F0F0F
+    n = (n | (n << 2)) & 0x33333333
+    n = (n | (n << 1)) & 0x55555555
+    return n
+
+
+@njit
+def morton_index(x, y):
+    """Z-order index of cell (x, y), for coordinates below 65536"""
+    return spread_bits(x) | (spread_bits(y) << 1)
+
+
+@njit
+def tiled_index(x, y, tiles_width):
+    """Index of cell (x, y) in TILED order, with tiles_width tiles per row of tiles"""
+    tile = (y >> TILE_SHIFT) * tiles_width + (x >> TILE_SHIFT)
+    return (tile << (2 * TILE_SHIFT)) | ((y & (TILE_SIZE - 1)) << TILE_SHIFT) | (x & (TILE_SIZE - 1))
+
+
+@njit
+def cell_index(layout, x, y, width, tiles_width):
+    """Flat index of cell (x, y) in any layout, for scalars or arrays"""
+    if layout == TILED:
+        return tiled_index(x, y, tiles_width)
+    if layout == MORTON:
+        return morton_index(x, y)
+    return y * width + x
+
+
+class TiledGrid:
+    """
+    A 2D map layer (cell types, texture ids, ...) stored in a cache-friendly
+    order. Row-major storage puts vertically adjacent cells a whole row
+    apart, so rays heading north or south touch a new cache line every
+    step on wide maps; the tiled and Morton orders keep nearby cells close
+    in memory in both directions. The grid is padded with pad_value to
+    whole tiles (TILED) or a power-of-two square (MORTON).
+    """
+
+    def __init__(self, cells, layout=TILED, pad_value=0):
+        cells = np.asarray(cells)
+        self.height, self.width = cells.shape
+        self.layout = layout
+
+        if layout == TILED:
+            self.tiles_width = -(-self.width // TILE_SIZE)
+            padded_height = -(-self.height // TILE_SIZE) * TILE_SIZE
+            padded_width = self.tiles_width * TILE_SIZE
+        elif layout == MORTON:
+            self.tiles_width = 0
+            side = 1 << max(0, math.ceil(math.log2(max(self.width, self.height))))
+            padded_height = padded_width = side
+        else:
+            self.tiles_width = 0
+            padded_height, padded_width = self.height, self.width
+
+        padded = np.full((padded_height, padded_width), pad_value, dtype=cells.dtype)
+        padded[:self.height, :self.width] = cells
+        y, x = np.mgrid[0:padded_height, 0:padded_width]
+        self.data = np.empty(padded.size, dtype=cells.dtype)
+        self.data[cell_index(layout, x, y, padded_width, self.tiles_width).ravel()] = padded.ravel()
+
+    def index(self, x, y):
+        """Flat index of cell (x, y) into data"""
+        return cell_index(self.layout, x, y, self.width, self.tiles_width)
+
+    def get(self, x, y):
+        return self.data[self.index(x, y)]
+
+    def to_array(self):
+        """Back to a row-major (height, width) array"""
+        y, x = np.mgrid[0:self.height, 0:self.width]
+        return self.data[self.index(x, y)]
+
+
+@njit
+def grid_dda(data, layout, width, height, tiles_width, x, y, dir_x, dir_y, max_distance):
+    """
+    Cell-by-cell DDA over a flat grid in any layout, in cell units.
+    Returns (distance, cell_x, cell_y, side) for the first non-zero cell,
+    or (max_distance, -1, -1, -1).
+    """
+    cell_x = int(math.floor(x))
+    cell_y = int(math.floor(y))
+    delta_x = abs(1.0 / dir_x) if dir_x != 0 else math.inf
+    delta_y = abs(1.0 / dir_y) if dir_y != 0 else math.inf
+    step_x = 1 if dir_x >= 0 else -1
+    step_y = 1 if dir_y >= 0 else -1
+    side_x = (cell_x + 1.0 - x) * delta_x if dir_x >= 0 else (x - cell_x) * delta_x
+    side_y = (cell_y + 1.0 - y) * delta_y if dir_y >= 0 else (y - cell_y) * delta_y
+
+    distance = 0.0
+    while distance <= max_distance:
+        if side_x < side_y:
+            distance = side_x
+            side_x += delta_x
+            cell_x += step_x
+            side = 0
+        else:
+            distance = side_y
+            side_y += delta_y
+            cell_y += step_y
+            side = 1
+
+        if cell_x < 0 or cell_x >= width or cell_y < 0 or cell_y >= height or distance > max_distance:
+            break
+        if data[cell_index(layout, cell_x, cell_y, width, tiles_width)] != 0:
+            return distance, cell_x, cell_y, side
+
+    return max_distance, -1, -1, -1
@@ -2,6 +2,7 @@ import math
 import numpy as np
 import pygame
 import random
+from frame_uniforms import FrameUniforms
 
 class TrippyEffects:
     """Class to handle various trippy visual and spatial effects for the raycasting engine"""
@@ -28,7 +29,12 @@ class TrippyEffects:
         self.visual_noise = 0.05  # Static/noise overlay intensity
         self.color_bleeding = 0.2  # How much colors bleed into each other
         self.afterimage_strength = 0.1  # Strength of afterimage effect
-        self.afterimages = []  # Store previous frames for afterimage effect
+        self.afterimage_decay = 0.8  # How much each older frame fades
+        self.afterimage_frames = 5  # Number of past frames the trail spans
+        self.afterimage_buffer = None  # Running average of previous frames, float32 bytes
+        self.afterimage_scratch = None  # Work array the same shape as the buffer
+        self.noise_block = 8  # Size of the square noise blocks in pixels
+        self.rng = np.random.default_rng()
         
         # Time-based effects
         self.time_dilation = 0.0  # Time slowing/speeding effect
@@ -44,6 +50,9 @@ class TrippyEffects:
         self.pulse_speed = 0.05
         self.pulse_strength = 0.2
         
+        # Per-frame snapshot of the effect clock, rebuilt in update()
+        self.uniforms = FrameUniforms.capture(self.time, pulse_time=self.pulse_time)
+        
         # Create noise texture for visual effects
         self.noise_texture = self.generate_noise_texture(256, 256)
     
@@ -54,36 +63,41 @@ class TrippyEffects:
             
         self.time += dt
         self.pulse_time += self.pulse_speed * dt
+        self.uniforms = FrameUniforms.capture(self.time, pulse_time=self.pulse_time)
         
         # Slowly increase reality breakdown over time
         if random.random() < 0.001:  # Occasional random increases
             self.reality_breakdown = min(1.0, self.reality_breakdown + 0.01)
-        
-        # Update afterimages
-        if len(self.afterimages) > 5:
-            self.afterimages.pop(0)
     
     def apply_ray_distortion(self, angle, distance):
         """Apply distortion to a ray angle based on distance and time"""
         if not self.enabled:
             return angle
         
+        return float(self.apply_ray_distortion_array(angle, distance))
+    
+    def apply_ray_distortion_array(self, angles, distances):
+        """Apply ray distortion to whole arrays of ray angles and distances"""
+        angles = np.asarray(angles, dtype=np.float64)
+        if not self.enabled:
+            return angles
+        distances = np.asarray(distances, dtype=np.float64)
+        
         # Basic sine wave distortion
-        distortion = math.sin(distance * self.wave_frequency + self.time * self.frequency) * self.wave_amplitude
+        distortion = np.sin(distances * self.wave_frequency + self.time * self.frequency) * self.wave_amplitude
         
         # Add pulsing effect
-        pulse = math.sin(self.pulse_time) * self.pulse_strength
-        distortion += pulse * math.sin(distance * 0.2)
+        pulse = self.uniforms.pulse_sin * self.pulse_strength
+        distortion += pulse * np.sin(distances * 0.2)
         
         # Add reality breakdown effect - more chaotic at higher levels
         if self.reality_breakdown > 0:
-            chaos = math.sin(distance * 0.3 + self.time * 0.2) * self.reality_breakdown * 0.3
-            distortion += chaos
+            distortion += np.sin(distances * 0.3 + self.time * 0.2) * self.reality_breakdown * 0.3
         
         # Scale by overall distortion level
         distortion *= self.level
         
-        return angle + distortion
+        return angles + distortion
     
     def apply_movement_distortion(self, dx, dy):
         """Apply drunk/trippy effects to player movement"""
@@ -91,7 +105,7 @@ class TrippyEffects:
             return dx, dy
         
         # Add wobble to movement
-        wobble_x = math.sin(self.time * 2.0) * self.movement_wobble
+        wobble_x = self.uniforms.sin(2.0) * self.movement_wobble
         wobble_y = math.cos(self.time * 1.7) * self.movement_wobble
         
         return dx + wobble_x, dy + wobble_y
@@ -101,111 +115,151 @@ class TrippyEffects:
         if not self.enabled:
             return color
         
-        # Unpack color
-        r, g, b = color
+        r, g, b = self.apply_color_distortion_array(np.array([color]), distance, angle)[0]
+        return (int(r), int(g), int(b))
+    
+    def color_matrices(self):
+        """
+        Per-frame 3x3 color matrices: the pulse tint without and with full
+        channel bleeding.  A pixel with bleed factor t is transformed by
+        (1 - t) * base + t * bled.
+        """
+        # Pulse tints red and green in opposite phase
+        pulse = (self.uniforms.pulse_sin + 1) / 2 * self.pulse_strength
+        base = np.diag([1 + pulse * 0.2, 1 + (1 - pulse) * 0.2, 1.0])
+        
+        # Bleeding pulls each channel towards the next one (r <- g <- b <- r)
+        bled = base @ np.eye(3)[[1, 2, 0]]
+        return base, bled
+    
+    def apply_color_distortion_array(self, colors, distances, angles):
+        """Apply trippy color effects to an (N, 3) array of colors"""
+        colors = np.asarray(colors)
+        if not self.enabled:
+            return colors
         
-        # Apply color shifting based on time
-        color_shift = (math.sin(self.time * self.color_shift_speed) + 1) / 2
+        pixels = colors.reshape(-1, 3).astype(np.float64)
+        angles = np.asarray(angles, dtype=np.float64).reshape(-1, 1)
+        base, bled = self.color_matrices()
         
-        # Apply color bleeding between channels
+        # Color bleeding varies with the ray angle, so blend the two matrices
+        out = pixels @ base.T
         if self.color_bleeding > 0:
-            bleed = self.color_bleeding * (math.sin(self.time * 0.1 + angle) + 1) / 2
-            r2 = r * (1 - bleed) + g * bleed
-            g2 = g * (1 - bleed) + b * bleed
-            b2 = b * (1 - bleed) + r * bleed
-            r, g, b = r2, g2, b2
-        
-        # Apply pulsing effect to colors
-        pulse = (math.sin(self.pulse_time) + 1) / 2 * self.pulse_strength
-        r = r * (1 + pulse * 0.2)
-        g = g * (1 + (1 - pulse) * 0.2)
-        
-        # Apply reality breakdown effect - more color distortion
+            bleed = self.color_bleeding * (np.sin(self.time * 0.1 + angles) + 1) / 2
+            out += bleed * (pixels @ (bled - base).T)
+        
+        # Apply reality breakdown effect - more color distortion on red and blue
         if self.reality_breakdown > 0:
-            breakdown = self.reality_breakdown * (math.sin(self.time * 0.3 + angle * 2) + 1) / 2
-            r = r * (1 + breakdown * 0.3)
-            b = b * (1 + breakdown * 0.3)
+            breakdown = self.reality_breakdown * (np.sin(self.time * 0.3 + angles * 2) + 1) / 2
+            out *= 1 + breakdown * 0.3 * np.array([1.0, 0.0, 1.0])
         
         # Clamp values
-        r = max(0, min(255, int(r)))
-        g = max(0, min(255, int(g)))
-        b = max(0, min(255, int(b)))
-        
-        return (r, g, b)
+        return np.clip(out, 0, 255).astype(np.uint8).reshape(colors.shape)
+    
+    def apply_color_distortion_columns(self, slices, every=4):
+        """
+        Apply trippy color effects to the wall slices of every `every`th
+        screen column in a single batch.  Slices are (x, top, distance,
+        angle, colors) tuples with an (N, 3) colors column; returns the list
+        with those columns replaced.
+        """
+        distorted = [i for i, s in enumerate(slices) if s[0] % every == 0]
+        if not self.enabled or not distorted:
+            return slices
+        
+        lengths = [len(slices[i][4]) for i in distorted]
+        colors = self.apply_color_distortion_array(
+            np.concatenate([slices[i][4] for i in distorted]),
+            np.repeat([slices[i][2] for i in distorted], lengths),
+            np.repeat([slices[i][3] for i in distorted], lengths)
+        )
+        slices = list(slices)
+        for i, column in zip(distorted, np.split(colors, np.cumsum(lengths)[:-1])):
+            slices[i] = slices[i][:4] + (column,)
+        return slices
     
     def apply_visual_noise(self, surface):
         """Apply visual noise/static to the screen"""
         if not self.enabled or self.visual_noise <= 0:
             return
         
-        # Create a noise overlay using a separate surface instead of direct pixel manipulation
         width, height = surface.get_size()
         noise_level = self.visual_noise * (1 + self.reality_breakdown)
         
         # Skip if noise level is too low
         if noise_level < 0.01:
             return
-            
-        # Create a noise surface
-        noise_surface = pygame.Surface((width, height), pygame.SRCALPHA)
-        noise_surface.fill((0, 0, 0, 0))  # Transparent background
         
-        # Use pre-generated noise texture and just move/scale it
+        # Pick the lit blocks for this frame with a single RNG call
+        block = self.noise_block
+        block_ys = np.arange(0, height, block)
+        block_xs = np.arange(0, width, block)
+        lit = self.rng.random((len(block_ys), len(block_xs))) < noise_level * 0.1
+        if not lit.any():
+            return
+        
+        # Use pre-generated noise texture and just move it
         noise_offset_x = int(self.time * 50) % 256
         noise_offset_y = int(self.time * 30) % 256
-        
-        # Apply noise by drawing small semi-transparent rectangles
-        for y in range(0, height, 8):  # Larger steps for better performance
-            for x in range(0, width, 8):
-                if random.random() < noise_level * 0.1:
-                    noise_x = (x + noise_offset_x) % 256
-                    noise_y = (y + noise_offset_y) % 256
-                    noise_value = int(self.noise_texture[noise_y][noise_x])
-                    
-                    # Create a small rectangle with noise value as alpha
-                    alpha = min(200, noise_value * 4)  # Scale up noise for visibility but cap at 200
-                    color = (255, 255, 255, alpha)  # White with variable transparency
-                    
-                    # Draw a small rectangle
-                    pygame.draw.rect(noise_surface, color, (x, y, 8, 8))
-        
-        # Blend the noise surface with the main surface
-        surface.blit(noise_surface, (0, 0), special_flags=pygame.BLEND_ADD)
+        noise_values = self.noise_texture[np.ix_((block_ys + noise_offset_y) % 256,
+                                                 (block_xs + noise_offset_x) % 256)]
+        
+        # Scale up noise for visibility but cap at 200
+        lit_ys, lit_xs = np.nonzero(lit)
+        intensity = np.minimum(200, noise_values[lit_ys, lit_xs].astype(np.uint16) * 4).astype(np.uint8)
+        
+        # Pixel coordinates of every lit block, clipped at the screen edges
+        offsets = np.arange(block)
+        xs = np.minimum(block_xs[lit_xs, None, None] + offsets[None, :, None], width - 1)
+        ys = np.minimum(block_ys[lit_ys, None, None] + offsets[None, None, :], height - 1)
+        
+        # Saturating additive blend straight into the surface pixels
+        pixels = pygame.surfarray.pixels3d(surface)
+        lit_pixels = pixels[xs, ys]
+        pixels[xs, ys] = lit_pixels + np.minimum(intensity[:, None, None, None], 255 - lit_pixels)
+        del pixels
+    
+    def afterimage_weight(self):
+        """Weight of the accumulated history in the afterimage blend"""
+        # Combined opacity of a stack of afterimage_frames past frames,
+        # each one afterimage_decay times fainter than the one before
+        visible = 1.0
+        for age in range(1, self.afterimage_frames + 1):
+            visible *= 1 - self.afterimage_strength * self.afterimage_decay ** (age + 1)
+        return 1 - visible
     
     def apply_afterimage(self, surface):
         """Apply afterimage/trailing effect"""
-        if not self.enabled or self.afterimage_strength <= 0 or not self.afterimages:
+        if not self.enabled or self.afterimage_strength <= 0:
+            self.afterimage_buffer = None
             return
         
-        # Blend previous frames with current frame
-        for i, (prev_surf, alpha) in enumerate(self.afterimages):
-            # Decrease alpha for older frames
-            alpha = alpha * 0.8
-            self.afterimages[i] = (prev_surf, alpha)
-            
-            # Skip if alpha is too low
-            if alpha < 0.05:
-                continue
-                
-            # Blend with current frame
-            prev_surf.set_alpha(int(255 * alpha * self.afterimage_strength))
-            surface.blit(prev_surf, (0, 0))
-        
-        # Add current frame to afterimages
-        current_copy = surface.copy()
-        self.afterimages.append((current_copy, 0.8))
-        
-        # Limit number of stored frames
-        if len(self.afterimages) > 5:
-            self.afterimages.pop(0)
+        # Work on the raw bytes of each row: a contiguous view of the packed
+        # 32-bit pixels is much faster to sweep than the strided pixels3d()
+        pixels = pygame.surfarray.pixels2d(surface).T.view(np.uint8)
+        
+        # Start a new history on the first frame or when the view size changes
+        if self.afterimage_buffer is None or self.afterimage_buffer.shape != pixels.shape:
+            self.afterimage_buffer = pixels.astype(np.float32)
+            self.afterimage_scratch = np.empty_like(self.afterimage_buffer)
+            return
+        
+        # Exponential moving average kept at full precision, so faint trails
+        # keep fading instead of sticking at 8-bit rounding steps:
+        # history += (frame - history) * (1 - weight)
+        history = self.afterimage_buffer
+        scratch = self.afterimage_scratch
+        np.subtract(pixels, history, out=scratch)
+        scratch *= 1 - self.afterimage_weight()
+        history += scratch
+        
+        # Only the displayed frame is rounded back to 8 bits
+        np.add(history, 0.5, out=scratch)
+        np.copyto(pixels, scratch, casting='unsafe')
     
     def generate_noise_texture(self, width, height):
         """Generate a noise texture for visual effects"""
-        noise = np.zeros((height, width), dtype=np.uint8)
-        for y in range(height):
-            for x in range(width):
-                noise[y][x] = random.randint(0, 50)
-        return noise
+        return self.rng.integers(0, 51, size=(height, width), dtype=np.uint8)
     
     def get_fov_distortion(self):
         """Get field of view distortion based on current effects"""
@@ -213,11 +267,11 @@ class TrippyEffects:
             return 0
             
         # Basic pulsing of FOV
-        fov_change = math.sin(self.time * 0.5) * self.vision_pulsing * 10
+        fov_change = self.uniforms.sin(0.5) * self.vision_pulsing * 10
         
         # Add reality breakdown effect
         if self.reality_breakdown > 0:
-            fov_change += math.sin(self.time * 0.3) * self.reality_breakdown * 15
+            fov_change += self.uniforms.sin(0.3) * self.reality_breakdown * 15
             
         return fov_change
     
@@ -2,7 +2,15 @@ import pygame
 import numpy as np
 import math
 import random
-import time
+from frame_uniforms import FrameUniforms
+from light_tables import build_light_table, light_level
+from portal_index import PortalIndex
+from cell_grid import CellGrid
+from room_adjacency import RoomAdjacency
+from nested_grid import trace_cell
+from mirror_rays import cast_reflecting_rays, MAX_BOUNCES
+from frame_governor import FrameGovernor
+from view_cache import ViewCache
 
 # Initialize Pygame
 pygame.init()
@@ -48,7 +56,7 @@ BLUE = (0, 0, 255)
 
 # Create a map with impossible spaces
 MAP_SIZE = 16
-MAP = np.zeros((MAP_SIZE, MAP_SIZE), dtype=np.int32)
+MAP = CellGrid(MAP_SIZE, MAP_SIZE)
 
 # Fill the border with walls
 MAP[0, :] = 1
@@ -62,19 +70,7 @@ for _ in range(15):
     y = random.randint(2, MAP_SIZE-3)
     MAP[y, x] = 1
 
-# Wall types:
-# 0 = empty space
-# 1 = normal wall
-# 2 = portal
-# 3 = non-Euclidean space entrance
-# 4 = reality distortion wall
-# 5 = perspective shift wall
-# 6 = 4D hypercube entrance
-# 7 = reality fracture
-# 8 = dimensional shift
-# 9 = recursive boundary
-# 10 = recursive portal
-# 11 = mirror wall
+# Cell codes are the cell_grid.WallType values
 
 # Define non-Euclidean spaces with emergent gameplay mechanics
 NON_EUCLIDEAN_SPACES = [
@@ -219,11 +215,6 @@ NON_EUCLIDEAN_SPACES = [
         ]
     }
 ]
-# 4 = reality distortion wall
-# 5 = perspective shift wall
-# 6 = 4D hypercube entrance
-# 7 = reality fracture
-# 8 = dimensional shift
 
 # Precompute sin/cos tables for faster lookups
 SIN_TABLE = [math.sin(i * 0.01) for i in range(629)]  # 2*PI*100
@@ -289,7 +280,7 @@ for _ in range(3):
             facing2 = 3  # Facing west
         
         # Check if the locations are valid (not already used)
-        if MAP[y1, x1] == 0 and MAP[y2, x2] == 0:
+        if MAP.get(x1, y1) == 0 and MAP.get(x2, y2) == 0:
             valid_placement = True
     
     if valid_placement:
@@ -306,7 +297,7 @@ for _ in range(3):
 NON_EUCLIDEAN_SPACES = []
 for _ in range(2):
     x, y = random.randint(2, MAP_SIZE-3), random.randint(2, MAP_SIZE-3)
-    if MAP[y, x] == 0:
+    if MAP.get(x, y) == 0:
         # Create a non-Euclidean space entrance
         MAP[y, x] = 3
         
@@ -339,7 +330,7 @@ for _ in range(2):
 HYPERCUBES = []
 for _ in range(2):
     x, y = random.randint(2, MAP_SIZE-3), random.randint(2, MAP_SIZE-3)
-    if MAP[y, x] == 0:
+    if MAP.get(x, y) == 0:
         MAP[y, x] = 6  # Mark as hypercube entrance
         
         # Create a fractal-like pattern in the outer map
@@ -444,13 +435,13 @@ for _ in range(2):
 # Add reality distortion walls
 for _ in range(5):
     x, y = random.randint(2, MAP_SIZE-3), random.randint(2, MAP_SIZE-3)
-    if MAP[y, x] == 0:
+    if MAP.get(x, y) == 0:
         MAP[y, x] = 4  # Reality distortion wall
 
 # Add perspective shift walls
 for _ in range(5):
     x, y = random.randint(2, MAP_SIZE-3), random.randint(2, MAP_SIZE-3)
-    if MAP[y, x] == 0:
+    if MAP.get(x, y) == 0:
         MAP[y, x] = 5  # Perspective shift wall
 
 # Create distortion fields
@@ -487,6 +478,14 @@ WALL_COLORS = {
     8: (50, 255, 255)    # Dimensional shift - bright cyan
 }
 
+# Pre-shaded wall colors for distance shading: WALL_LIGHT_TABLE[level][WALL_COLOR_INDEX[wall_type]]
+# Index 0 is the fallback color for wall types without an entry in WALL_COLORS
+WALL_COLOR_INDEX = {wall_type: i + 1 for i, wall_type in enumerate(WALL_COLORS)}
+WALL_LIGHT_TABLE = [
+    [tuple(color) for color in level]
+    for level in build_light_table([(200, 200, 200)] + list(WALL_COLORS.values())).tolist()
+]
+
 # Fast trigonometric functions using lookup tables for better performance
 TRIG_TABLE_SIZE = 1024
 sin_table = [math.sin(i * 2 * math.pi / TRIG_TABLE_SIZE) for i in range(TRIG_TABLE_SIZE)]
@@ -520,6 +519,19 @@ for portal_pair in PORTALS:
     for portal in portal_pair:
         MAP[portal['y'], portal['x']] = 2  # Portal type
 
+# Index portals by cell, with the offset and rotation to their linked portal
+PORTAL_INDEX = PortalIndex(MAP_SIZE, MAP_SIZE)
+for portal_pair in PORTALS:
+    for portal in portal_pair:
+        linked_portal = portal_pair[portal['linked_to']]
+        PORTAL_INDEX.add(
+            [(portal['x'], portal['y'])],
+            (portal['x'], portal['y']),
+            (linked_portal['x'], linked_portal['y']),
+            (linked_portal['facing'] - portal['facing']) * math.pi/2,
+            portal['facing']
+        )
+
 # Define non-Euclidean spaces with emergent gameplay mechanics
 NON_EUCLIDEAN_SPACES = [
     {
@@ -584,10 +596,12 @@ for space in NON_EUCLIDEAN_SPACES:
     inner_map[1, w//4] = 5
     inner_map[1, 3*w//4] = 5
     
-    # Add recursive rooms if specified
+    # Add recursive rooms if specified; room_cells maps each cell to the room it belongs to
+    space['room_cells'] = np.full((h, w), -1, dtype=np.int32)
     if 'recursive_rooms' in space:
-        for room in space['recursive_rooms']:
+        for room_index, room in enumerate(space['recursive_rooms']):
             rx, ry, size = room['x'], room['y'], room['size']
+            space['room_cells'][ry:ry+size, rx:rx+size] = room_index
             # Create a room within a room
             for i in range(size):
                 for j in range(size):
@@ -886,6 +900,14 @@ HYPERCUBES = [
     }
 ]
 
+# What each non-Euclidean entrance shows from outside: the inner map scaled
+# into the entrance cell, its outer ring drawn as the entrance itself
+SPACE_INTERIORS = {}
+for space in NON_EUCLIDEAN_SPACES:
+    interior = space['map'].astype(np.uint8)
+    interior[0, :] = interior[-1, :] = interior[:, 0] = interior[:, -1] = 3
+    SPACE_INTERIORS[space['entrance']] = interior
+
 # Carve out the hypercube rooms
 for cube in HYPERCUBES:
     # Add the entrance to the map
@@ -976,6 +998,19 @@ for cube in HYPERCUBES:
         if room is cube['rooms'][2]:  # Use 'is' for identity comparison instead of '=='
             room_map[2, 2] = 8  # Dimensional shift
 
+# Room adjacency for seeing through the 4D connections: every room of every
+# cube in one table, cube c's room r at index c * len(rooms) + r. The type 30
+# cells on the faces are see-through; a ray leaving a face comes out of the
+# connected room as set up by '4d_connections'.
+MAX_4D_TRANSITIONS = 3
+HYPERCUBE_ROOMS = RoomAdjacency([room['map'] for cube in HYPERCUBES for room in cube['rooms']], see_through=[30])
+for cube in HYPERCUBES:
+    rooms_per_cube = len(cube['rooms'])
+    for room_id, room in enumerate(cube['rooms']):
+        for face, connection in room['4d_connections'].items():
+            HYPERCUBE_ROOMS.link(cube['id'] * rooms_per_cube + room_id, face,
+                                 connection['cube'] * rooms_per_cube + connection['room'], connection['rotation'])
+
 # Optimized raycasting function with portal viewing
 # Pre-allocate arrays to avoid recreation each frame
 _wall_heights = [0] * WIDTH
@@ -983,7 +1018,83 @@ _wall_colors = [(0, 0, 0) for _ in range(WIDTH)]
 _wall_types = [0] * WIDTH
 _wall_effects = [None] * WIDTH
 
-def raycast(player_x, player_y, player_angle):
+# Special effect tags for the wall types that have one
+WALL_EFFECTS = {
+    3: 'non_euclidean_entrance',
+    4: 'reality_distortion',
+    5: 'perspective_shift',
+    6: 'hypercube_entrance',
+    7: 'reality_fracture',
+    8: 'dimensional_shift',
+}
+
+# Portal views: every column that looks through a portal costs one ray segment
+# per portal it passes. Once the frame's segment budget or the depth limit runs
+# out, remaining portals are drawn as flat portal surfaces instead.
+PORTAL_SEGMENT_BUDGET = WIDTH * 2
+MAX_PORTAL_DEPTH = 8
+
+def march_segment(ray_x, ray_y, ray_dir_x, ray_dir_y, distance, skip_x=-1, skip_y=-1):
+    """
+    March one ray segment through normal space until it hits a wall, leaves
+    the map, runs out of range or reaches a portal. The (skip_x, skip_y)
+    portal cell, the one the ray arrived through, is passed over.
+    Returns (distance, wall_type, portal, ray_x, ray_y); wall_type is 0 for
+    no hit and 2 with a portal id for a portal.
+    """
+    step_size = 0.05
+    while distance < 20:
+        # Move the ray
+        ray_x += ray_dir_x * step_size
+        ray_y += ray_dir_y * step_size
+        distance += step_size
+        
+        # Check if we hit a wall
+        map_x = int(ray_x)
+        map_y = int(ray_y)
+        if not (0 <= map_x < MAP_SIZE and 0 <= map_y < MAP_SIZE):
+            return distance, 1, -1, ray_x, ray_y  # Out of bounds: treat as a normal wall
+        
+        wall_type = MAP.get(map_x, map_y)
+        if wall_type == 3 and (map_x, map_y) in SPACE_INTERIORS:
+            # Look into the room through its entrance: the inner grid fills the cell
+            interior = SPACE_INTERIORS[(map_x, map_y)]
+            inner_distance, inner_x, inner_y, _ = trace_cell(
+                interior, interior.shape[1], interior.shape[0],
+                ray_x, ray_y, ray_dir_x, ray_dir_y, map_x, map_y, False)
+            ray_x += ray_dir_x * inner_distance
+            ray_y += ray_dir_y * inner_distance
+            distance += inner_distance
+            if inner_x < 0:
+                continue  # Out the other side
+            return distance, int(interior[inner_y, inner_x]), -1, ray_x, ray_y
+        
+        if wall_type == 2:  # Portal
+            if map_x == skip_x and map_y == skip_y:
+                continue
+            portal = PORTAL_INDEX.cells[map_y, map_x]
+            if portal >= 0:
+                return distance, 2, portal, ray_x, ray_y
+        elif wall_type > 0:
+            return distance, wall_type, -1, ray_x, ray_y
+    
+    return distance, 0, -1, ray_x, ray_y
+
+def portal_spans(columns):
+    """Split (x, portal, ...) column records, in screen order, into runs of adjacent columns through the same portal"""
+    spans = []
+    for column in columns:
+        if spans and spans[-1][-1][1] == column[1] and spans[-1][-1][0] + 1 == column[0]:
+            spans[-1].append(column)
+        else:
+            spans.append([column])
+    return spans
+
+def raycast(player_x, player_y, player_angle, uniforms=None, portal_budget=PORTAL_SEGMENT_BUDGET):
+    # Snapshot time and player state once for the whole frame
+    if uniforms is None:
+        uniforms = FrameUniforms.capture(player_state=player_state)
+    
     # Reuse pre-allocated arrays
     wall_heights = _wall_heights
     wall_colors = _wall_colors
@@ -998,181 +1109,177 @@ def raycast(player_x, player_y, player_angle):
         wall_effects[i] = None
     
     # Check if player is in a special space
-    if not player_state['in_normal_space']:
-        if player_state['current_space'] == 'non_euclidean':
-            return raycast_non_euclidean(player_state['space_position'][0], player_state['space_position'][1], player_angle)
-        elif player_state['current_space'] == 'hypercube':
-            return raycast_hypercube(player_state['hypercube_room'], player_state['space_position'][0], player_state['space_position'][1], player_angle)
+    if not uniforms.in_normal_space:
+        if uniforms.current_space == 'non_euclidean':
+            return raycast_non_euclidean(player_state['space_position'][0], player_state['space_position'][1], player_angle, uniforms)
+        elif uniforms.current_space == 'hypercube':
+            return raycast_hypercube(player_state['hypercube_room'], player_state['space_position'][0], player_state['space_position'][1], player_angle, uniforms)
+    
+    # Per-frame values, read once instead of per column
+    reality_distortion = uniforms.reality_distortion
+    time_factor = uniforms.time
+    gravity_direction = uniforms.gravity_direction
     
-    # Cast rays for each screen column
+    # First segment of every column, straight from the player
+    ray_angles = [0.0] * WIDTH
+    hits = [None] * WIDTH
+    through_portals = []
     for x in range(WIDTH):
-        # Precompute values outside the raycasting loop
-        reality_level = player_state['reality_level']
-        reality_distortion = 1.0 - reality_level
-        time_factor = time.time()
-        
         # Calculate ray angle with distortion
         ray_angle = (player_angle - math.radians(HALF_FOV)) + (x * (math.radians(FOV) / WIDTH))
         distortion = math.sin(time_factor * 3 + x * 0.05) * reality_distortion * 0.2
         ray_angle += distortion
+        ray_angles[x] = ray_angle
         
         # Ray direction
         ray_dir_x = fast_cos(ray_angle)
         ray_dir_y = fast_sin(ray_angle)
         
         # Apply gravity direction to ray
-        if player_state['gravity_direction'] == 1:  # Right
+        if gravity_direction == 1:  # Right
             ray_dir_x, ray_dir_y = ray_dir_y, -ray_dir_x
-        elif player_state['gravity_direction'] == 2:  # Up
+        elif gravity_direction == 2:  # Up
             ray_dir_x, ray_dir_y = -ray_dir_x, -ray_dir_y
-        elif player_state['gravity_direction'] == 3:  # Left
+        elif gravity_direction == 3:  # Left
             ray_dir_x, ray_dir_y = -ray_dir_y, ray_dir_x
         
-        # Current position
-        ray_x = player_x
-        ray_y = player_y
+        distance, wall_type, portal, ray_x, ray_y = march_segment(player_x, player_y, ray_dir_x, ray_dir_y, 0.0)
+        hits[x] = (distance, wall_type)
+        if portal >= 0:
+            through_portals.append((x, portal, ray_x, ray_y, ray_dir_x, ray_dir_y, distance))
+    
+    # Portal views, one depth at a time: each visible portal covers a span of
+    # columns, and only those columns are cast again from the linked portal.
+    # Nested portals seen through it get their own, narrower spans.
+    depth = 0
+    while through_portals and depth < MAX_PORTAL_DEPTH:
+        depth += 1
+        next_portals = []
+        for span in portal_spans(through_portals):
+            # Out of budget: leave the whole span showing the portal surface
+            if len(span) > portal_budget:
+                continue
+            portal_budget -= len(span)
+            
+            portal = span[0][1]
+            offset_x, offset_y = PORTAL_INDEX.offset[portal]
+            dest_x, dest_y = PORTAL_INDEX.destination[portal]
+            for x, _, ray_x, ray_y, ray_dir_x, ray_dir_y, distance in span:
+                # Apply the portal transformation, rotating the ray if the portals face different directions
+                ray_dir_x, ray_dir_y = PORTAL_INDEX.rotate(portal, ray_dir_x, ray_dir_y)
+                distance, wall_type, next_portal, ray_x, ray_y = march_segment(
+                    ray_x + offset_x, ray_y + offset_y, ray_dir_x, ray_dir_y, distance, int(dest_x), int(dest_y))
+                hits[x] = (distance, wall_type)
+                if next_portal >= 0:
+                    next_portals.append((x, next_portal, ray_x, ray_y, ray_dir_x, ray_dir_y, distance))
+        through_portals = next_portals
+    
+    # Calculate wall height and color
+    for x in range(WIDTH):
+        distance, wall_type = hits[x]
+        if wall_type == 0:
+            continue
+        special_effect = WALL_EFFECTS.get(wall_type)
         
-        # Distance traveled
-        distance = 0.0
-        hit_wall = False
-        wall_type = 0
-        special_effect = None
+        # Apply fish-eye correction
+        correct_distance = distance * math.cos(ray_angles[x] - player_angle)
         
-        # Portal tracking
-        max_portal_recursion = 2  # Limit portal recursion for performance
-        portal_recursion = 0
-        portals_traversed = set()  # Track which portals we've gone through
+        # Calculate wall height
+        wall_height = int(HEIGHT / correct_distance)
         
-        # Step size - larger for better performance
-        step_size = 0.05
+        # Apply special effects
+        if special_effect == 'perspective_shift':
+            shift = math.sin(time_factor * 2 + x * 0.1) * 0.3
+            wall_height = int(wall_height * (1.0 + shift))
         
-        # Cast the ray
-        while not hit_wall and distance < 20 and portal_recursion <= max_portal_recursion:
-            # Move the ray
-            ray_x += ray_dir_x * step_size
-            ray_y += ray_dir_y * step_size
-            distance += step_size
-            
-            # Check if we hit a wall
-            map_x = int(ray_x)
-            map_y = int(ray_y)
-            
-            # Check if we're in bounds
-            if 0 <= map_x < MAP_SIZE and 0 <= map_y < MAP_SIZE:
-                wall_type = MAP[map_y, map_x]
-                
-                # Handle portals - allow seeing through them
-                if wall_type == 2:  # Portal
-                    # Find which portal we hit
-                    portal_found = False
-                    for portal_pair in PORTALS:
-                        for i, portal in enumerate(portal_pair):
-                            portal_x, portal_y = portal['x'], portal['y']
-                            
-                            if map_x == portal_x and map_y == portal_y:
-                                # Skip if we've already gone through this portal
-                                portal_id = (portal_x, portal_y)
-                                if portal_id in portals_traversed:
-                                    continue
-                                
-                                # We hit a portal - get the linked portal
-                                linked_idx = portal['linked_to']
-                                linked_portal = portal_pair[linked_idx]
-                                
-                                # Calculate the offset to apply to the ray
-                                offset_x = linked_portal['x'] - portal_x
-                                offset_y = linked_portal['y'] - portal_y
-                                
-                                # Calculate rotation to apply (difference in facing directions)
-                                rotation = (linked_portal['facing'] - portal['facing']) * math.pi/2
-                                
-                                # Apply the portal transformation
-                                ray_x += offset_x
-                                ray_y += offset_y
-                                
-                                # Apply rotation to ray direction if portals face different directions
-                                if rotation != 0:
-                                    old_dir_x = ray_dir_x
-                                    old_dir_y = ray_dir_y
-                                    ray_dir_x = old_dir_x * math.cos(rotation) - old_dir_y * math.sin(rotation)
-                                    ray_dir_y = old_dir_x * math.sin(rotation) + old_dir_y * math.cos(rotation)
-                                
-                                # Mark this portal as traversed
-                                portals_traversed.add(portal_id)
-                                portal_recursion += 1
-                                portal_found = True
-                                break
-                        
-                        if portal_found:
-                            break
-                    
-                    # If we found a portal, continue ray casting
-                    if portal_found:
-                        continue
-                
-                # Handle non-portal walls
-                if wall_type > 0 and wall_type != 2:  # Not a portal
-                    hit_wall = True
-                    
-                    # Special effects for different wall types
-                    if wall_type == 3:  # Non-Euclidean space entrance
-                        special_effect = 'non_euclidean_entrance'
-                    elif wall_type == 4:  # Reality distortion wall
-                        special_effect = 'reality_distortion'
-                    elif wall_type == 5:  # Perspective shift wall
-                        special_effect = 'perspective_shift'
-                    elif wall_type == 6:  # 4D hypercube entrance
-                        special_effect = 'hypercube_entrance'
-                    elif wall_type == 7:  # Reality fracture
-                        special_effect = 'reality_fracture'
-                    elif wall_type == 8:  # Dimensional shift
-                        special_effect = 'dimensional_shift'
-            else:
-                # Out of bounds
-                hit_wall = True
-                wall_type = 1  # Treat as a normal wall
+        # Store results
+        wall_heights[x] = min(wall_height, HEIGHT)  # Clamp to screen height
+        wall_types[x] = wall_type
+        wall_effects[x] = special_effect
         
-        # Calculate wall height and color
-        if hit_wall:
-            # Apply fish-eye correction
-            correct_distance = distance * math.cos(ray_angle - player_angle)
-            
-            # Calculate wall height
-            wall_height = int(HEIGHT / correct_distance)
-            
-            # Apply special effects
-            if special_effect == 'perspective_shift':
-                shift = math.sin(time.time() * 2 + x * 0.1) * 0.3
-                wall_height = int(wall_height * (1.0 + shift))
-            
-            # Store results
-            wall_heights[x] = min(wall_height, HEIGHT)  # Clamp to screen height
-            wall_colors[x] = WALL_COLORS.get(wall_type, (200, 200, 200))
-            wall_types[x] = wall_type
-            wall_effects[x] = special_effect
-            
-            # Apply shading and effects in a single pass
-            shade = 1.0 - min(1.0, distance / 20.0)
-            r, g, b = wall_colors[x]
-            
-            # Apply distance shading
-            r = int(r * shade)
-            g = int(g * shade)
-            b = int(b * shade)
-            
-            # Apply trippy effects if needed
-            if reality_distortion > 0:
-                distortion = reality_distortion * 0.5
-                r = min(255, int(r * (1 + math.sin(time_factor * 2 + x * 0.1) * distortion)))
-                g = min(255, int(g * (1 + math.sin(time_factor * 2 + x * 0.05) * distortion)))
-                b = min(255, int(b * (1 + math.sin(time_factor * 2 + x * 0.02) * distortion)))
-            
-            wall_colors[x] = (r, g, b)
+        # Apply distance shading with a table lookup
+        r, g, b = WALL_LIGHT_TABLE[light_level(distance, 20.0)][WALL_COLOR_INDEX.get(wall_type, 0)]
+        
+        # Apply trippy effects if needed
+        if reality_distortion > 0:
+            distortion = reality_distortion * 0.5
+            r = min(255, int(r * (1 + math.sin(time_factor * 2 + x * 0.1) * distortion)))
+            g = min(255, int(g * (1 + math.sin(time_factor * 2 + x * 0.05) * distortion)))
+            b = min(255, int(b * (1 + math.sin(time_factor * 2 + x * 0.02) * distortion)))
+        
+        wall_colors[x] = (r, g, b)
     
     return wall_heights, wall_colors, wall_types, wall_effects
 
+# Effect tags for walls hit inside a non-Euclidean space
+INNER_WALL_EFFECTS = {
+    3: 'non_euclidean_exit',
+    4: 'reality_distortion',
+    5: 'perspective_shift',
+    9: 'recursive_boundary',
+    10: 'recursive_portal',
+    11: 'mirror',
+    30: '4d_transition',
+}
+
+# Mirror bounces: the governor scales the per-frame budget to keep the frame
+# time near 60 FPS, and each bounce keeps this fraction of the light
+MIRROR_GOVERNOR = FrameGovernor(1000 / 60, WIDTH * 2, maximum=WIDTH * MAX_BOUNCES)
+MIRROR_REFLECTANCE = 0.85
+
+# Recursive rooms: the view from inside each room is drawn into a small
+# offscreen surface, refreshed a few times a second or when the viewer moves,
+# and shown on the room's walls. _recursive_room_hits[x] is the room seen in
+# column x, or -1.
+RECURSIVE_VIEW_SIZE = (WIDTH // 4, HEIGHT // 4)
+_recursive_room_hits = [-1] * WIDTH
+
+def render_recursive_view(key, x, y, angle):
+    """
+    Draw the view inside a recursive room at RECURSIVE_VIEW_SIZE, scaled up
+    to the screen size. The room holds a copy of its whole space, so the
+    camera is the viewer's position relative to the room, mapped from the
+    room onto the space.
+    """
+    entrance, room_index = key
+    space = next(space for space in NON_EUCLIDEAN_SPACES if space['entrance'] == entrance)
+    room = space['recursive_rooms'][room_index]
+    inner_map = space['map']
+    w, h = space['width'], space['height']
+    camera_x = min(max((x - room['x']) / room['size'] * w, 1.01), w - 1.01)
+    camera_y = min(max((y - room['y']) / room['size'] * h, 1.01), h - 1.01)
+    
+    view_width, view_height = RECURSIVE_VIEW_SIZE
+    surface = pygame.Surface(RECURSIVE_VIEW_SIZE)
+    surface.fill((20, 0, 40), (0, 0, view_width, view_height // 2))
+    surface.fill((10, 10, 10), (0, view_height // 2, view_width, view_height - view_height // 2))
+    
+    # One ray per texture column, all cast at once
+    ray_angles = angle - math.radians(HALF_FOV) + np.arange(view_width) / view_width * math.radians(FOV)
+    max_distance = w + h
+    distance, hit_x, hit_y, side, _, _ = cast_reflecting_rays(
+        inner_map, camera_x, camera_y, np.cos(ray_angles), np.sin(ray_angles), max_distance, 0)
+    for column in range(view_width):
+        if hit_x[column] < 0:
+            continue
+        wall_type = int(inner_map[hit_y[column], hit_x[column]]) if 0 <= hit_x[column] < w and 0 <= hit_y[column] < h else 3
+        correct_distance = max(0.05, distance[column] * math.cos(ray_angles[column] - angle))
+        wall_height = min(view_height, int(view_height / correct_distance * room['scale'] * 2))
+        shade = (1.0 - min(1.0, distance[column] / max_distance)) * (0.8 if side[column] else 1.0)
+        color = tuple(int(c * shade) for c in WALL_COLORS.get(wall_type, (150, 50, 150)))
+        top = (view_height - wall_height) // 2
+        pygame.draw.line(surface, color, (column, top), (column, top + wall_height), 1)
+    
+    return pygame.transform.scale(surface, (WIDTH, HEIGHT))
+
+RECURSIVE_VIEWS = ViewCache(render_recursive_view, refresh_interval=0.25, move_threshold=0.5)
+
 # Optimized raycasting for non-Euclidean spaces with emergent gameplay mechanics
-def raycast_non_euclidean(pos_x, pos_y, angle):
+def raycast_non_euclidean(pos_x, pos_y, angle, uniforms=None, reflection_budget=None):
+    if uniforms is None:
+        uniforms = FrameUniforms.capture(player_state=player_state)
+    _recursive_room_hits[:] = [-1] * WIDTH
+    
     # Find which non-Euclidean space we're in
     current_space = None
     for space in NON_EUCLIDEAN_SPACES:
@@ -1182,7 +1289,7 @@ def raycast_non_euclidean(pos_x, pos_y, angle):
     
     if not current_space:
         # Fallback to normal raycasting
-        return raycast(pos_x, pos_y, angle)
+        return raycast(pos_x, pos_y, angle, uniforms)
     
     # Results
     wall_heights = [0] * WIDTH
@@ -1220,10 +1327,10 @@ def raycast_non_euclidean(pos_x, pos_y, angle):
     
     # Apply time dilation
     time_dilation = mechanics.get('time_dilation', 1.0)
-    current_time = time.time() * time_dilation
+    current_time = uniforms.time * time_dilation
     
     # Apply perspective inversion if enabled
-    perspective_inversion = mechanics.get('perspective_inversion', False) and player_state['reality_level'] < 0.8
+    perspective_inversion = mechanics.get('perspective_inversion', False) and uniforms.reality_level < 0.8
     if perspective_inversion:
         # Invert the angle periodically for a mind-bending effect
         if math.sin(current_time * 0.2) > 0.9:
@@ -1232,7 +1339,16 @@ def raycast_non_euclidean(pos_x, pos_y, angle):
     # Check if we're in a mirror dimension
     mirror_dimension = current_space.get('mirror_dimension', False)
     
-    # Cast rays in the inner space
+    # Time-only color terms for 4D connection walls, shared by every column
+    cosmic_r = uniforms.sin(2.0)
+    cosmic_g = math.sin(uniforms.time * 2 + 2*math.pi/3)
+    cosmic_b = math.sin(uniforms.time * 2 + 4*math.pi/3)
+    
+    max_distance = inner_width + inner_height
+    
+    # Ray directions for every column
+    ray_angles = [0.0] * WIDTH
+    ray_dirs = [(0.0, 0.0)] * WIDTH
     for x in range(WIDTH):
         # Calculate ray angle
         ray_angle = (angle - math.radians(HALF_FOV)) + (x / WIDTH) * math.radians(FOV)
@@ -1252,6 +1368,24 @@ def raycast_non_euclidean(pos_x, pos_y, angle):
         if mirror_dimension and x > WIDTH/2:
             ray_dir_x = -ray_dir_x  # Mirror the x-component for half the screen
         
+        ray_angles[x] = ray_angle
+        ray_dirs[x] = (ray_dir_x, ray_dir_y)
+    
+    # In a mirror dimension all columns are cast at once, bouncing off the
+    # mirror walls for as long as the frame's bounce budget lasts
+    reflections = None
+    if mirror_dimension:
+        if reflection_budget is None:
+            reflection_budget = MIRROR_GOVERNOR.budget
+        directions = np.array(ray_dirs)
+        reflections = cast_reflecting_rays(inner_map, pos_x, pos_y, directions[:, 0], directions[:, 1],
+                                           max_distance, reflection_budget)
+    
+    # Cast rays in the inner space
+    for x in range(WIDTH):
+        ray_angle = ray_angles[x]
+        ray_dir_x, ray_dir_y = ray_dirs[x]
+        
         # Current position
         ray_x = pos_x
         ray_y = pos_y
@@ -1261,14 +1395,29 @@ def raycast_non_euclidean(pos_x, pos_y, angle):
         hit_wall = False
         wall_type = 0
         special_effect = None
+        bounces = 0
+        map_x = map_y = -1
         
         # Track if we're in a recursive room
         in_recursive_room = False
         recursive_scale = 1.0
         recursive_level = 0
         
+        # Take the reflected hit; the march below is then skipped
+        if reflections is not None:
+            distance = float(reflections[0][x])
+            map_x = int(reflections[1][x])
+            map_y = int(reflections[2][x])
+            bounces = int(reflections[4][x])
+            if map_x >= 0:
+                hit_wall = True
+                if 0 <= map_x < inner_width and 0 <= map_y < inner_height:
+                    wall_type = int(inner_map[map_y, map_x])
+                else:
+                    wall_type = 3  # Non-Euclidean space exit
+                special_effect = INNER_WALL_EFFECTS.get(wall_type)
+        
         # Cast the ray
-        max_distance = inner_width + inner_height
         step_size = 0.05
         
         while not hit_wall and distance < max_distance:
@@ -1327,28 +1476,6 @@ def raycast_non_euclidean(pos_x, pos_y, angle):
                         special_effect = 'recursive_portal'
                     elif wall_type == 11:  # Mirror wall
                         special_effect = 'mirror'
-                        # Reflect the ray direction
-                        normal_x, normal_y = 0, 0
-                        
-                        # Determine the normal vector of the mirror surface
-                        if map_x == map_y:  # Diagonal mirror
-                            normal_x = normal_y = 0.7071  # 1/sqrt(2)
-                        else:  # Random mirror fragment
-                            # Randomize the normal but keep it consistent
-                            random.seed(map_x * 1000 + map_y)
-                            angle = random.random() * 2 * math.pi
-                            normal_x = math.cos(angle)
-                            normal_y = math.sin(angle)
-                        
-                        # Calculate reflection
-                        dot = 2 * (ray_dir_x * normal_x + ray_dir_y * normal_y)
-                        ray_dir_x = ray_dir_x - dot * normal_x
-                        ray_dir_y = ray_dir_y - dot * normal_y
-                        
-                        # Continue raycasting with reflected direction
-                        hit_wall = False
-                        ray_x += ray_dir_x * 0.1  # Move away from mirror slightly
-                        ray_y += ray_dir_y * 0.1
             else:
                 # Hit the boundary of the inner space, return to normal space
                 hit_wall = True
@@ -1389,6 +1516,10 @@ def raycast_non_euclidean(pos_x, pos_y, angle):
             wall_types[x] = wall_type
             wall_effects[x] = special_effect
             
+            # Recursive room walls show the room's cached inner view
+            if wall_type in (9, 10) and 0 <= map_x < inner_width and 0 <= map_y < inner_height:
+                _recursive_room_hits[x] = current_space['room_cells'][map_y, map_x]
+            
             # Determine wall color based on distance, type, and effects
             if wall_type == 1:  # Regular wall
                 base_color = (150, 50, 150)  # Purple for inner space walls
@@ -1400,10 +1531,9 @@ def raycast_non_euclidean(pos_x, pos_y, angle):
                 base_color = (100, 255, 100)  # Light green
             elif wall_type == 30:  # 4D hypercube connection
                 # Shifting cosmic colors for 4D connections
-                time_factor = time.time() * 2
-                r = int(128 + 127 * math.sin(time_factor))
-                g = int(128 + 127 * math.sin(time_factor + 2*math.pi/3))
-                b = int(200 + 55 * math.sin(time_factor + 4*math.pi/3))  # More blue to make it stand out
+                r = int(128 + 127 * cosmic_r)
+                g = int(128 + 127 * cosmic_g)
+                b = int(200 + 55 * cosmic_b)  # More blue to make it stand out
                 base_color = (r, g, b)
             elif wall_type == 9:  # Recursive boundary
                 # Color based on recursive level
@@ -1426,12 +1556,12 @@ def raycast_non_euclidean(pos_x, pos_y, angle):
             else:
                 base_color = (150, 150, 150)  # Gray
             
-            # Apply distance shading
-            shade = 1.0 - min(1.0, distance / max_distance)
+            # Apply distance shading; every mirror bounce on the way loses some light
+            shade = (1.0 - min(1.0, distance / max_distance)) * MIRROR_REFLECTANCE ** bounces
             wall_color = tuple(int(c * shade) for c in base_color)
             
             # Apply trippy color effect based on reality level
-            reality_factor = 1.0 - player_state['reality_level']
+            reality_factor = uniforms.reality_distortion
             time_factor = current_time * 2
             r = min(255, int(wall_color[0] * (1 + math.sin(time_factor + x * 0.1) * 0.2 * reality_factor)))
             g = min(255, int(wall_color[1] * (1 + math.sin(time_factor + x * 0.05) * 0.2 * reality_factor)))
@@ -1446,7 +1576,11 @@ def raycast_non_euclidean(pos_x, pos_y, angle):
     return wall_heights, wall_colors, wall_types, wall_effects
 
 # Optimized raycasting for hypercube spaces with seamless 4D connections
-def raycast_hypercube(room_id, pos_x, pos_y, angle):
+def raycast_hypercube(room_id, pos_x, pos_y, angle, uniforms=None):
+    if uniforms is None:
+        uniforms = FrameUniforms.capture(player_state=player_state)
+    now = uniforms.time
+    
     # Find the current hypercube
     current_cube = None
     for cube in HYPERCUBES:
@@ -1456,11 +1590,10 @@ def raycast_hypercube(room_id, pos_x, pos_y, angle):
     
     if not current_cube:
         # Fallback to normal raycasting
-        return raycast(pos_x, pos_y, angle)
+        return raycast(pos_x, pos_y, angle, uniforms)
     
     # Get the current room in the hypercube
     current_room = current_cube['rooms'][room_id]
-    room_map = current_room['map']
     room_size = current_room['size']
     
     # Results
@@ -1471,7 +1604,27 @@ def raycast_hypercube(room_id, pos_x, pos_y, angle):
     
     # Get the 4D coordinates for this room
     is_central = current_room.get('is_central', False)
-    room_x, room_y = current_room['position']
+    
+    # The 4D rotation only depends on the room and the frame time,
+    # so it is the same for every column
+    w_coord = room_id / 8.0  # Normalize to 0-1 range
+    w_effect = math.sin(w_coord * math.pi * 2 + now * 0.5) * 0.1
+    
+    # Apply a more extreme distortion in the central room
+    if is_central:
+        # In the central room, rays bend based on distance from center
+        center_x, center_y = room_size / 2, room_size / 2
+        dist_from_center = math.sqrt((pos_x - center_x)**2 + (pos_y - center_y)**2)
+        center_effect = 0.2 * math.sin(dist_from_center * 0.5 + now)
+        w_effect += center_effect
+    
+    w_cos = math.cos(w_effect)
+    w_sin = math.sin(w_effect)
+    
+    # Rays start in this room of the flattened room table
+    rooms_per_cube = len(current_cube['rooms'])
+    first_room = current_cube['id'] * rooms_per_cube + room_id
+    max_distance = room_size * (MAX_4D_TRANSITIONS + 1)
     
     # Cast rays in the hypercube room
     for x in range(WIDTH):
@@ -1482,230 +1635,48 @@ def raycast_hypercube(room_id, pos_x, pos_y, angle):
         ray_dir_x = fast_cos(ray_angle)
         ray_dir_y = fast_sin(ray_angle)
         
-        # Apply 4D rotation to ray direction
-        w_coord = room_id / 8.0  # Normalize to 0-1 range
-        w_effect = math.sin(w_coord * math.pi * 2 + time.time() * 0.5) * 0.1
-        
-        # Apply a more extreme distortion in the central room
-        if is_central:
-            # In the central room, rays bend based on distance from center
-            center_x, center_y = room_size / 2, room_size / 2
-            dist_from_center = math.sqrt((pos_x - center_x)**2 + (pos_y - center_y)**2)
-            center_effect = 0.2 * math.sin(dist_from_center * 0.5 + time.time())
-            w_effect += center_effect
-        
         # Apply the 4D rotation
         temp_x = ray_dir_x
-        ray_dir_x = ray_dir_x * math.cos(w_effect) - ray_dir_y * math.sin(w_effect)
-        ray_dir_y = temp_x * math.sin(w_effect) + ray_dir_y * math.cos(w_effect)
-        
-        # Current position
-        ray_x = pos_x
-        ray_y = pos_y
-        
-        # Distance traveled
-        distance = 0.0
-        hit_wall = False
+        ray_dir_x = ray_dir_x * w_cos - ray_dir_y * w_sin
+        ray_dir_y = temp_x * w_sin + ray_dir_y * w_cos
+        
+        # Walk the ray through this room and on through the 4D connections
+        distance, hit_room, map_x, map_y, side, crossings = HYPERCUBE_ROOMS.cast_ray(
+            first_room, pos_x, pos_y, ray_dir_x, ray_dir_y, max_distance, MAX_4D_TRANSITIONS)
+        current_cube_id, current_room_id = divmod(int(hit_room), rooms_per_cube)
+        hit_wall = True
         wall_type = 0
-        special_effect = None
-        
-        # 4D traversal tracking
-        current_cube_id = current_cube['id']
-        current_room_id = room_id
-        current_ray_x = ray_x
-        current_ray_y = ray_y
-        current_ray_dir_x = ray_dir_x
-        current_ray_dir_y = ray_dir_y
-        
-        # Track 4D transitions to avoid infinite loops
-        max_4d_transitions = 3
-        transitions_count = 0
-        traversed_spaces = set([(current_cube_id, current_room_id)])
-        
-        # Cast the ray
-        max_distance = room_size * 2
-        while not hit_wall and distance < max_distance and transitions_count <= max_4d_transitions:
-            # Move the ray
-            current_ray_x += current_ray_dir_x * 0.05
-            current_ray_y += current_ray_dir_y * 0.05
-            distance += 0.05
-            
-            # Check if we hit a wall in the room
-            map_x = int(current_ray_x)
-            map_y = int(current_ray_y)
+        special_effect = '4d_transition' if crossings else None
+        
+        if hit_room < 0:
+            # Out of range
+            hit_wall = False
+        elif not (0 <= map_x < HYPERCUBE_ROOMS.sizes[hit_room] and 0 <= map_y < HYPERCUBE_ROOMS.sizes[hit_room]):
+            # Stopped on a face it can't cross
+            if crossings >= MAX_4D_TRANSITIONS:
+                wall_type = 30
+                special_effect = '4d_loop'
+            else:
+                wall_type = 6  # Hypercube exit
+                special_effect = 'hypercube_exit'
+        else:
+            wall_type = int(HYPERCUBE_ROOMS.cells[hit_room, map_y, map_x])
             
-            # Get the current room map
+            # Check for different wall types
             current_room = HYPERCUBES[current_cube_id]['rooms'][current_room_id]
-            room_map = current_room['map']
-            room_size = current_room['size']
-            
-            if 0 <= map_x < room_size and 0 <= map_y < room_size:
-                wall_type = room_map[map_y, map_x]
-                if wall_type > 0:
-                    # Check for 4D connections first
-                    if '4d_connections' in current_room and map_x in (0, room_size-1) or map_y in (0, room_size-1):
-                        # Determine which face we're on
-                        face = -1
-                        if map_y == 0: face = 0  # North
-                        elif map_x == room_size-1: face = 1  # East
-                        elif map_y == room_size-1: face = 2  # South
-                        elif map_x == 0: face = 3  # West
-                        
-                        # Check if this face has a 4D connection
-                        if face in current_room['4d_connections']:
-                            # We hit a 4D connection - seamless transition to another hypercube
-                            connection = current_room['4d_connections'][face]
-                            target_cube_id = connection['cube']
-                            target_room_id = connection['room']
-                            target_face = connection['face']
-                            rotation = connection['rotation']
-                            
-                            # Skip if we've already traversed this space
-                            if (target_cube_id, target_room_id) in traversed_spaces:
-                                hit_wall = True
-                                special_effect = '4d_loop'
-                                continue
-                            
-                            # Calculate new position in the target room
-                            target_room = HYPERCUBES[target_cube_id]['rooms'][target_room_id]
-                            target_size = target_room['size']
-                            
-                            # Map coordinates from one face to the opposite face
-                            if face == 0:  # North to South
-                                new_x = map_x
-                                new_y = target_size - 1
-                            elif face == 1:  # East to West
-                                new_x = 0
-                                new_y = map_y
-                            elif face == 2:  # South to North
-                                new_x = map_x
-                                new_y = 0
-                            elif face == 3:  # West to East
-                                new_x = target_size - 1
-                                new_y = map_y
-                            
-                            # Apply rotation based on the connection
-                            for _ in range(rotation):
-                                new_x, new_y = target_size - 1 - new_y, new_x
-                            
-                            # Apply rotation to ray direction
-                            new_dir_x, new_dir_y = current_ray_dir_x, current_ray_dir_y
-                            for _ in range(rotation):
-                                new_dir_x, new_dir_y = new_dir_y, -new_dir_x
-                            
-                            # Update current state to the new hypercube/room
-                            current_cube_id = target_cube_id
-                            current_room_id = target_room_id
-                            current_ray_x = new_x + 0.1 * new_dir_x  # Offset slightly to avoid boundary issues
-                            current_ray_y = new_y + 0.1 * new_dir_y
-                            current_ray_dir_x = new_dir_x
-                            current_ray_dir_y = new_dir_y
-                            
-                            # Track this transition
-                            traversed_spaces.add((target_cube_id, target_room_id))
-                            transitions_count += 1
-                            special_effect = '4d_transition'
-                            continue
-                    
-                    # If not a 4D connection, handle regular wall types
-                    hit_wall = True
-                    
-                    # Check for different wall types
-                    if wall_type >= 20 and wall_type < 28:  # Connections to other rooms
-                        connection_id = wall_type - 20
-                        if connection_id in current_room['connections']:
-                            special_effect = f'hypercube_connection_{connection_id}'
-                    elif wall_type >= 10 and wall_type < 15:  # Recursive portals
-                        portal_id = wall_type - 10
-                        special_effect = f'recursive_portal_{portal_id}'
-                    elif wall_type == 6:  # Exit back to normal space
-                        special_effect = 'hypercube_exit'
-                    elif wall_type == 7:  # Reality fracture
-                        special_effect = 'reality_fracture'
-                    elif wall_type == 8:  # Dimensional shift
-                        special_effect = 'dimensional_shift'
-            else:
-                # We've hit the boundary of the current room section
-                # Check if we should do a 4D transition
-                face = -1
-                if map_y < 0: face = 0  # North
-                elif map_x >= room_size: face = 1  # East
-                elif map_y >= room_size: face = 2  # South
-                elif map_x < 0: face = 3  # West
-                
-                if face in current_room.get('4d_connections', {}):
-                    # 4D transition at boundary
-                    connection = current_room['4d_connections'][face]
-                    target_cube_id = connection['cube']
-                    target_room_id = connection['room']
-                    target_face = connection['face']
-                    rotation = connection['rotation']
-                    
-                    # Skip if we've already traversed this space
-                    if (target_cube_id, target_room_id) in traversed_spaces:
-                        hit_wall = True
-                        special_effect = '4d_loop'
-                        continue
-                    
-                    # Calculate new position in the target room
-                    target_room = HYPERCUBES[target_cube_id]['rooms'][target_room_id]
-                    target_size = target_room['size']
-                    
-                    # Map coordinates from one face to the opposite face
-                    if face == 0:  # North to South
-                        new_x = current_ray_x
-                        new_y = target_size - 0.1
-                    elif face == 1:  # East to West
-                        new_x = 0.1
-                        new_y = current_ray_y
-                    elif face == 2:  # South to North
-                        new_x = current_ray_x
-                        new_y = 0.1
-                    elif face == 3:  # West to East
-                        new_x = target_size - 0.1
-                        new_y = current_ray_y
-                    
-                    # Apply rotation based on the connection
-                    for _ in range(rotation):
-                        new_x, new_y = target_size - 1 - new_y, new_x
-                    
-                    # Apply rotation to ray direction
-                    new_dir_x, new_dir_y = current_ray_dir_x, current_ray_dir_y
-                    for _ in range(rotation):
-                        new_dir_x, new_dir_y = new_dir_y, -new_dir_x
-                    
-                    # Update current state to the new hypercube/room
-                    current_cube_id = target_cube_id
-                    current_room_id = target_room_id
-                    current_ray_x = new_x
-                    current_ray_y = new_y
-                    current_ray_dir_x = new_dir_x
-                    current_ray_dir_y = new_dir_y
-                    
-                    # Track this transition
-                    traversed_spaces.add((target_cube_id, target_room_id))
-                    transitions_count += 1
-                    special_effect = '4d_transition'
-                    continue
-                else:
-                    # Calculate position in the outer map
-                    room_x, room_y = current_room['position']
-                    outer_x = room_x + map_x
-                    outer_y = room_y + map_y
-                    
-                    # Check if this position is within the outer map
-                    outer_size = HYPERCUBES[current_cube_id]['outer_size']
-                    if 0 <= outer_x < outer_size and 0 <= outer_y < outer_size:
-                        # We can see into the outer map - truly impossible space
-                        wall_type = HYPERCUBES[current_cube_id]['outer_map'][outer_y, outer_x]
-                        if wall_type > 0:
-                            hit_wall = True
-                            special_effect = 'outer_map_view'
-                    else:
-                        # Hit the boundary of the entire space
-                        hit_wall = True
-                        wall_type = 6  # Hypercube exit
-                        special_effect = 'hypercube_exit'
+            if wall_type >= 20 and wall_type < 28:  # Connections to other rooms
+                connection_id = wall_type - 20
+                if connection_id in current_room['connections']:
+                    special_effect = f'hypercube_connection_{connection_id}'
+            elif wall_type >= 10 and wall_type < 15:  # Recursive portals
+                portal_id = wall_type - 10
+                special_effect = f'recursive_portal_{portal_id}'
+            elif wall_type == 6:  # Exit back to normal space
+                special_effect = 'hypercube_exit'
+            elif wall_type == 7:  # Reality fracture
+                special_effect = 'reality_fracture'
+            elif wall_type == 8:  # Dimensional shift
+                special_effect = 'dimensional_shift'
         
         # Calculate wall height
         if hit_wall:
@@ -1714,22 +1685,22 @@ def raycast_hypercube(room_id, pos_x, pos_y, angle):
             
             # Calculate wall height with 4D effect
             w_coord = current_room_id / 8.0  # Use current room for w-coordinate
-            w_height_effect = 1.0 + 0.2 * math.sin(w_coord * math.pi * 4 + time.time())
+            w_height_effect = 1.0 + 0.2 * math.sin(w_coord * math.pi * 4 + now)
             
             # Add additional effects for special walls
             if special_effect == 'reality_fracture':
-                fracture = math.sin(time.time() * 3 + x * 0.2) * 0.4
+                fracture = math.sin(now * 3 + x * 0.2) * 0.4
                 w_height_effect *= (1.0 + fracture)
             elif special_effect == 'dimensional_shift':
-                shift = math.sin(time.time() * 2 + distance * 0.5) * 0.5
+                shift = math.sin(now * 2 + distance * 0.5) * 0.5
                 w_height_effect *= (1.0 + shift)
             elif special_effect == '4d_transition':
                 # Special effect for 4D transitions
-                transition_effect = math.sin(time.time() * 4 + x * 0.1) * 0.3
+                transition_effect = math.sin(now * 4 + x * 0.1) * 0.3
                 w_height_effect *= (1.0 + transition_effect)
             elif special_effect == '4d_loop':
                 # Special effect for 4D loops
-                loop_effect = math.sin(time.time() * 6 + x * 0.2) * 0.5
+                loop_effect = math.sin(now * 6 + x * 0.2) * 0.5
                 w_height_effect *= (1.0 + loop_effect)
             
             wall_height = min(HEIGHT, int((1.0 / distance) * HEIGHT * 0.5 * w_height_effect))
@@ -1755,15 +1726,15 @@ def raycast_hypercube(room_id, pos_x, pos_y, angle):
                 base_color = (r, g, b)
             elif wall_type >= 10 and wall_type < 15:  # Recursive portal
                 # Portals have shifting rainbow colors
-                portal_hue = (wall_type - 10) / 5.0 + time.time() * 0.2
+                portal_hue = (wall_type - 10) / 5.0 + now * 0.2
                 r = int(128 + 127 * math.sin(portal_hue * math.pi * 2))
                 g = int(128 + 127 * math.sin(portal_hue * math.pi * 2 + 2*math.pi/3))
                 b = int(128 + 127 * math.sin(portal_hue * math.pi * 2 + 4*math.pi/3))
                 base_color = (r, g, b)
             elif special_effect == '4d_transition' or special_effect == '4d_loop':
                 # Special colors for 4D transitions
-                time_factor = time.time() * 3
-                r = int(128 + 127 * math.sin(time_factor))
+                time_factor = now * 3
+                r = int(128 + 127 * uniforms.sin(3.0))
                 g = int(128 + 127 * math.sin(time_factor + 2*math.pi/3))
                 b = int(128 + 127 * math.sin(time_factor + 4*math.pi/3))
                 base_color = (r, g, b)
@@ -1775,7 +1746,7 @@ def raycast_hypercube(room_id, pos_x, pos_y, angle):
             wall_color = tuple(int(c * shade) for c in base_color)
             
             # Apply 4D color shifting effect
-            time_factor = time.time() * 2
+            time_factor = now * 2
             w_factor = math.sin(w_coord * math.pi * 4 + time_factor) * 0.3
             r = min(255, int(wall_color[0] * (1 + math.sin(time_factor + x * 0.1 + w_factor) * 0.3)))
             g = min(255, int(wall_color[1] * (1 + math.sin(time_factor + x * 0.05 + w_factor) * 0.3)))
@@ -1835,47 +1806,52 @@ def _draw_gradient(surface, x, y_start, width, y_end, color_top, color_bottom,
     else:
         surface.blit(temp_surface, (x, y_start))
 
-def render_frame(player_x, player_y, player_angle, distortion_level=0.0):
+def render_frame(player_x, player_y, player_angle, distortion_level=0.0, uniforms=None):
     # Clear screen
     screen.fill((0, 0, 0))
     
-    # Get reality level once
-    reality_level = player_state['reality_level']
-    reality_distortion = 1.0 - reality_level
-    time_factor = time.time()
+    # Snapshot time and player state once for the whole frame
+    if uniforms is None:
+        uniforms = FrameUniforms.capture(player_state=player_state)
+    now = uniforms.time
+    reality_distortion = uniforms.reality_distortion
+    gravity_direction = uniforms.gravity_direction
+    time_factor = now
     
     # Apply gravity direction to the view angle if not in normal space
     adjusted_angle = player_angle
-    if player_state['current_space'] == 'non_euclidean' and player_state['gravity_direction'] != 0:
+    if uniforms.current_space == 'non_euclidean' and gravity_direction != 0:
         # Adjust the view angle based on gravity direction
-        gravity_rotation = player_state['gravity_direction'] * (math.pi/2)  # 90 degrees per direction
+        gravity_rotation = gravity_direction * (math.pi/2)  # 90 degrees per direction
         adjusted_angle = (player_angle + gravity_rotation) % (2 * math.pi)
     
     # Determine which raycasting function to use
-    if player_state['in_normal_space']:
+    if uniforms.in_normal_space:
         # Use normal raycasting
-        wall_heights, wall_colors, wall_types, wall_effects = raycast(player_x, player_y, adjusted_angle)
-    elif player_state['current_space'] == 'hypercube':
+        wall_heights, wall_colors, wall_types, wall_effects = raycast(player_x, player_y, adjusted_angle, uniforms)
+    elif uniforms.current_space == 'hypercube':
         # Use hypercube raycasting
         wall_heights, wall_colors, wall_types, wall_effects = raycast_hypercube(
             player_state['hypercube_id'], 
             player_state['space_position'][0], 
             player_state['space_position'][1], 
-            adjusted_angle
+            adjusted_angle,
+            uniforms
         )
-    elif player_state['current_space'] == 'non_euclidean':
+    elif uniforms.current_space == 'non_euclidean':
         # Use non-Euclidean raycasting
         wall_heights, wall_colors, wall_types, wall_effects = raycast_non_euclidean(
             player_state['space_position'][0], 
             player_state['space_position'][1], 
-            adjusted_angle
+            adjusted_angle,
+            uniforms
         )
     else:
         # Fallback to normal raycasting
-        wall_heights, wall_colors, wall_types, wall_effects = raycast(player_x, player_y, adjusted_angle)
+        wall_heights, wall_colors, wall_types, wall_effects = raycast(player_x, player_y, adjusted_angle, uniforms)
     
     # Calculate sky and floor regions based on gravity
-    if player_state['gravity_direction'] == 2:  # Upside down
+    if gravity_direction == 2:  # Upside down
         sky_start, sky_end = HEIGHT // 2, HEIGHT
         floor_start, floor_end = 0, HEIGHT // 2
     else:  # Normal orientation
@@ -1895,10 +1871,10 @@ def render_frame(player_x, player_y, player_angle, distortion_level=0.0):
     for x in range(WIDTH):
         if wall_heights[x] > 0:
             # Calculate wall position based on gravity direction
-            if player_state['gravity_direction'] == 0:  # Normal
+            if gravity_direction == 0:  # Normal
                 wall_top = (HEIGHT - wall_heights[x]) // 2
                 wall_bottom = wall_top + wall_heights[x]
-            elif player_state['gravity_direction'] == 2:  # Upside down
+            elif gravity_direction == 2:  # Upside down
                 wall_bottom = (HEIGHT + wall_heights[x]) // 2
                 wall_top = wall_bottom - wall_heights[x]
             else:  # Sideways (1 = right, 3 = left)
@@ -1908,7 +1884,7 @@ def render_frame(player_x, player_y, player_angle, distortion_level=0.0):
                 
                 # Apply a visual tilt based on gravity direction
                 tilt_factor = 0.2 * reality_distortion  # More noticeable with lower reality
-                if player_state['gravity_direction'] == 1:  # Right
+                if gravity_direction == 1:  # Right
                     wall_top += int(x * tilt_factor)
                     wall_bottom += int(x * tilt_factor)
                 else:  # Left
@@ -1917,7 +1893,7 @@ def render_frame(player_x, player_y, player_angle, distortion_level=0.0):
             
             # Apply reality distortion to wall positions
             if reality_distortion > 0.1:
-                distort_amount = int(math.sin(x * 0.1 + time.time() * 3) * 5 * reality_distortion)
+                distort_amount = int(math.sin(x * 0.1 + now * 3) * 5 * reality_distortion)
                 wall_top += distort_amount
                 wall_bottom += distort_amount
             
@@ -1931,31 +1907,37 @@ def render_frame(player_x, player_y, player_angle, distortion_level=0.0):
             # Apply special effects for certain wall types
             if wall_effects[x] == 'portal':
                 # Draw portal effect (pulsing glow)
-                glow_intensity = (math.sin(time.time() * 5) + 1) * 0.5  # 0 to 1
+                glow_intensity = (uniforms.sin(5.0) + 1) * 0.5  # 0 to 1
                 glow_color = (int(100 * glow_intensity), int(200 * glow_intensity), int(255 * glow_intensity))
                 pygame.draw.line(screen, glow_color, (x, wall_top), (x, wall_bottom), 1)
             elif wall_effects[x] == 'hypercube_exit':
                 # Draw hypercube exit effect (rainbow pulse)
-                hue = (time.time() * 0.5) % 1.0
+                hue = (now * 0.5) % 1.0
                 r = int(128 + 127 * math.sin(hue * 2 * math.pi))
                 g = int(128 + 127 * math.sin(hue * 2 * math.pi + 2*math.pi/3))
                 b = int(128 + 127 * math.sin(hue * 2 * math.pi + 4*math.pi/3))
                 pygame.draw.line(screen, (r, g, b), (x, wall_top), (x, wall_bottom), 1)
             elif wall_effects[x] == 'non_euclidean_exit':
                 # Draw non-Euclidean exit effect (pulsing magenta)
-                pulse = (math.sin(time.time() * 3) + 1) * 0.5  # 0 to 1
+                pulse = (uniforms.sin(3.0) + 1) * 0.5  # 0 to 1
                 exit_color = (int(200 * pulse), int(50 * pulse), int(200 * pulse))
                 pygame.draw.line(screen, exit_color, (x, wall_top), (x, wall_bottom), 1)
             elif wall_effects[x] == 'reality_distortion':
                 # Draw reality distortion effect (shifting colors)
-                time_factor = time.time() * 2
+                time_factor = now * 2
                 r = int(128 + 127 * math.sin(time_factor + x * 0.1))
                 g = int(128 + 127 * math.sin(time_factor + x * 0.05 + 2))
                 b = int(128 + 127 * math.sin(time_factor + x * 0.02 + 4))
                 pygame.draw.line(screen, (r, g, b), (x, wall_top), (x, wall_bottom), 1)
+            elif _recursive_room_hits[x] >= 0 and uniforms.current_space == 'non_euclidean':
+                # Recursive room wall: show the cached view from inside the room
+                view = RECURSIVE_VIEWS.get((player_state['non_euclidean_map_id'], _recursive_room_hits[x]),
+                                           player_state['space_position'][0], player_state['space_position'][1],
+                                           adjusted_angle, now)
+                screen.blit(view, (x, wall_top), (x, wall_top, 1, wall_bottom - wall_top + 1))
             elif wall_effects[x] == 'recursive_boundary':
                 # Draw recursive boundary effect (pulsing with depth illusion)
-                pulse = (math.sin(time.time() * 2.5) + 1) * 0.5  # 0 to 1
+                pulse = (uniforms.sin(2.5) + 1) * 0.5  # 0 to 1
                 depth = int(10 * pulse * reality_distortion)
                 for d in range(depth):
                     d_factor = d / depth if depth > 0 else 0
@@ -1970,7 +1952,7 @@ def render_frame(player_x, player_y, player_angle, distortion_level=0.0):
             elif wall_effects[x] == 'recursive_portal':
                 # Draw recursive portal effect (spiral pattern)
                 for i in range(5):
-                    angle = time.time() * 3 + i * math.pi/3
+                    angle = now * 3 + i * math.pi/3
                     spiral_x = int(math.cos(angle) * i * 2)
                     spiral_y = int(math.sin(angle) * i * 2)
                     portal_color = (
@@ -1983,7 +1965,7 @@ def render_frame(player_x, player_y, player_angle, distortion_level=0.0):
                         pygame.draw.circle(screen, portal_color, (x + spiral_x, y_pos), 1)
             elif wall_effects[x] == 'mirror':
                 # Draw mirror effect (reflective shimmer)
-                shimmer_intensity = (math.sin(time.time() * 7 + x * 0.1) + 1) * 0.5  # 0 to 1
+                shimmer_intensity = (math.sin(now * 7 + x * 0.1) + 1) * 0.5  # 0 to 1
                 for y in range(wall_top, wall_bottom, 4):
                     shimmer_color = (
                         int(200 * shimmer_intensity),
@@ -2005,7 +1987,7 @@ def render_frame(player_x, player_y, player_angle, distortion_level=0.0):
                     pygame.draw.line(screen, shift_color, (x - 2, shift_y), (x + 2, shift_y), 1)
             elif wall_effects[x] == '4d_transition':
                 # Draw 4D transition effect (cosmic ripple pattern)
-                time_factor = time.time() * 3
+                time_factor = now * 3
                 for i in range(0, wall_bottom - wall_top, 2):
                     y_pos = wall_top + i
                     ripple = math.sin(time_factor + i * 0.1) * 5
@@ -2029,8 +2011,8 @@ def render_frame(player_x, player_y, player_angle, distortion_level=0.0):
         # Draw map cells
         for y in range(MAP_SIZE):
             for x in range(MAP_SIZE):
-                if MAP[y, x] > 0:
-                    color = WALL_COLORS.get(MAP[y, x], (200, 200, 200))
+                if MAP.get(x, y) > 0:
+                    color = WALL_COLORS.get(MAP.get(x, y), (200, 200, 200))
                     pygame.draw.rect(screen, color, 
                                     (10 + x * cell_size, 10 + y * cell_size, 
                                      cell_size, cell_size))
@@ -2089,6 +2071,9 @@ def main():
         dt = clock.tick(60) / 1000.0  # Delta time in seconds
         fps = clock.get_fps()
         
+        # Let the mirror bounce budget follow the time the last frame took
+        MIRROR_GOVERNOR.update(clock.get_rawtime())
+        
         # Adjust movement speed based on framerate for consistent movement
         frame_move_speed = move_speed * (60 / max(fps, 1)) if fps > 0 else move_speed
         
@@ -2192,34 +2177,21 @@ def main():
         if player_state['in_normal_space']:
             # Normal space collision detection
             if 0 <= map_x < MAP_SIZE and 0 <= map_y < MAP_SIZE:
-                wall_type = MAP[map_y, map_x]
+                wall_type = MAP.get(map_x, map_y)
                 
                 if wall_type == 0:  # Empty space
                     player_x, player_y = new_x, new_y
                 elif wall_type == 2:  # Portal
                     # Find which portal we hit
-                    for portal_pair in PORTALS:
-                        for i, portal in enumerate(portal_pair):
-                            if map_x == portal['x'] and map_y == portal['y']:
-                                # We hit a portal - teleport to the linked portal
-                                linked_idx = portal['linked_to']
-                                linked_portal = portal_pair[linked_idx]
-                                
-                                # Calculate the offset to apply
-                                offset_x = linked_portal['x'] - portal['x']
-                                offset_y = linked_portal['y'] - portal['y']
-                                
-                                # Calculate rotation to apply
-                                rotation = (linked_portal['facing'] - portal['facing']) * math.pi/2
-                                
-                                # Apply the portal transformation
-                                player_x = new_x + offset_x
-                                player_y = new_y + offset_y
-                                
-                                # Apply rotation to player angle if portals face different directions
-                                if rotation != 0:
-                                    player_angle += rotation
-                                break
+                    portal = PORTAL_INDEX.cells[map_y, map_x]
+                    if portal >= 0:
+                        # We hit a portal - teleport to the linked portal
+                        offset_x, offset_y = PORTAL_INDEX.offset[portal]
+                        player_x = new_x + offset_x
+                        player_y = new_y + offset_y
+                        
+                        # Apply rotation to player angle if portals face different directions
+                        player_angle += PORTAL_INDEX.angle[portal]
                 elif wall_type == 3:  # Non-Euclidean space entrance
                     # Find the non-Euclidean space we're entering
                     for space in NON_EUCLIDEAN_SPACES:
@@ -2639,7 +2611,8 @@ def main():
         if player_state['reality_level'] < 1.0:
             distortion_level = (1.0 - player_state['reality_level']) * 0.5
         
-        render_frame(current_x, current_y, player_angle, distortion_level)
+        uniforms = FrameUniforms.capture(player_state=player_state)
+        render_frame(current_x, current_y, player_angle, distortion_level, uniforms)
     
     # Quit pygame
     pygame.quit()
@@ -5,6 +5,14 @@ import random
 import time
 import os
 from numba import njit, prange  # For just-in-time compilation and parallelization
+from frame_uniforms import FrameUniforms
+from texture_atlas import (create_texture_atlas, create_palette_framebuffer, TEXTURE_SIZE, NUM_TEXTURES,
+                           SKY_STEPS, FLOOR_STEPS, PALETTE_LIGHT_LEVELS)
+from light_tables import build_light_table, light_level, light_levels
+from occupancy_pyramid import OccupancyPyramid
+from cell_grid import CellGrid
+from column_hits import (column_hits, wall_heights, see_through_codes, MAX_COLUMN_HITS, HIT_FIELDS,
+                         HIT_DISTANCE, HIT_CODE, HIT_WALL_X, HIT_TOP, HIT_CLIP_TOP, HIT_CLIP_BOTTOM)
 
 # Initialize Pygame
 pygame.init()
@@ -30,60 +38,15 @@ screen = pygame.display.set_mode((WIDTH, HEIGHT), flags)
 pygame.display.set_caption("Ultra Fast Trippy Renderer")
 clock = pygame.time.Clock()
 
-# Create a texture atlas - a single texture containing all wall textures
-TEXTURE_SIZE = 64
-NUM_TEXTURES = 4
-ATLAS_WIDTH = TEXTURE_SIZE * NUM_TEXTURES
-ATLAS_HEIGHT = TEXTURE_SIZE
-
-# Create texture atlas
-def create_texture_atlas():
-    atlas = np.zeros((ATLAS_HEIGHT, ATLAS_WIDTH, 3), dtype=np.uint8)
-    
-    # Texture 1: Brick
-    for y in range(TEXTURE_SIZE):
-        for x in range(TEXTURE_SIZE):
-            # Brick pattern
-            brick_x = x % 16
-            brick_y = y % 16
-            if brick_x == 0 or brick_y == 0:
-                atlas[y, x] = [120, 60, 30]  # Mortar
-            else:
-                atlas[y, x] = [200, 70, 60]  # Brick
-    
-    # Texture 2: Psychedelic
-    for y in range(TEXTURE_SIZE):
-        for x in range(TEXTURE_SIZE):
-            # Psychedelic pattern
-            r = int(127 + 127 * math.sin(x * 0.1 + y * 0.1))
-            g = int(127 + 127 * math.sin(x * 0.1 + y * 0.2 + 2))
-            b = int(127 + 127 * math.sin(x * 0.1 + y * 0.3 + 4))
-            atlas[y, x + TEXTURE_SIZE] = [r, g, b]
-    
-    # Texture 3: Checkerboard
-    for y in range(TEXTURE_SIZE):
-        for x in range(TEXTURE_SIZE):
-            # Checkerboard pattern
-            if (x // 8 + y // 8) % 2 == 0:
-                atlas[y, x + TEXTURE_SIZE * 2] = [240, 240, 240]  # White
-            else:
-                atlas[y, x + TEXTURE_SIZE * 2] = [20, 20, 20]  # Black
-    
-    # Texture 4: Gradient
-    for y in range(TEXTURE_SIZE):
-        for x in range(TEXTURE_SIZE):
-            # Gradient pattern
-            t = y / TEXTURE_SIZE
-            r = int(255 * t)
-            g = int(100 + 100 * math.sin(t * 10))
-            b = int(255 * (1 - t))
-            atlas[y, x + TEXTURE_SIZE * 3] = [r, g, b]
-    
-    return atlas
-
 # Create the texture atlas
 texture_atlas = create_texture_atlas()
 
+# Pre-shaded texels: ATLAS_LIGHT_TABLES[texture, light level, y * TEXTURE_SIZE + x]
+ATLAS_LIGHT_TABLES = np.stack([
+    build_light_table(texture_atlas[:, texture_id * TEXTURE_SIZE:(texture_id + 1) * TEXTURE_SIZE])
+    for texture_id in range(NUM_TEXTURES)
+])
+
 # Pre-render distortion effects
 def create_distortion_map(width, height, time_offset=0):
     """Create a distortion map for warping effects"""
@@ -102,9 +65,11 @@ def create_distortion_map(width, height, time_offset=0):
 NUM_DISTORTION_MAPS = 16
 distortion_maps = [create_distortion_map(WIDTH, HEIGHT, i * 0.2) for i in range(NUM_DISTORTION_MAPS)]
 
+palette_framebuffer, PALETTE_BACKGROUND, PALETTE_TEXTURE_INDICES = create_palette_framebuffer(texture_atlas, WIDTH, HEIGHT)
+
 # Create a simple map (1 = wall, 0 = empty space)
 MAP_SIZE = 16
-MAP = np.zeros((MAP_SIZE, MAP_SIZE), dtype=np.int32)
+MAP = CellGrid(MAP_SIZE, MAP_SIZE)
 
 # Fill the border with walls
 MAP[0, :] = 1
@@ -123,12 +88,33 @@ PORTALS = []
 for _ in range(3):
     x1, y1 = random.randint(1, MAP_SIZE-2), random.randint(1, MAP_SIZE-2)
     x2, y2 = random.randint(1, MAP_SIZE-2), random.randint(1, MAP_SIZE-2)
-    if MAP[y1, x1] == 0 and MAP[y2, x2] == 0:
+    if MAP.get(x1, y1) == 0 and MAP.get(x2, y2) == 0:
         PORTALS.append((x1, y1, x2, y2))
         # Mark portals with special values
         MAP[y1, x1] = 2
         MAP[y2, x2] = 2
 
+# Occupancy pyramid of the map; column_hits() skips empty blocks of it at
+# once and records every non-zero cell it reaches, walls and portals alike
+MAP_LEVELS = OccupancyPyramid(MAP.cells).max_levels
+
+# Wall heights in cells: some of the inner walls are low enough to see over
+# and some stand taller than the rest
+MAP_HEIGHTS = wall_heights(MAP.cells)
+inner_walls = [(x, y) for y, x in np.argwhere(MAP.cells == 1)
+               if 0 < x < MAP_SIZE-1 and 0 < y < MAP_SIZE-1]
+for x, y in random.sample(inner_walls, min(8, len(inner_walls))):
+    MAP_HEIGHTS[y, x] = random.choice((0.35, 1.6))
+MAX_WALL_HEIGHT = float(MAP_HEIGHTS.max())
+
+# Portals are drawn as translucent panes that rays carry on through
+SEE_THROUGH = see_through_codes([2])
+PORTAL_ALPHA = 0.5
+
+# Every visible wall along each column, front to back, refilled every frame
+COLUMN_HITS = np.zeros((WIDTH, MAX_COLUMN_HITS, HIT_FIELDS), dtype=np.float32)
+COLUMN_HIT_COUNTS = np.zeros(WIDTH, dtype=np.int32)
+
 # Create distortion fields
 DISTORTION_FIELDS = []
 for _ in range(4):
@@ -148,19 +134,16 @@ player_height = 0.5
 SIN_TABLE = np.array([math.sin(math.radians(i)) for i in range(360)], dtype=np.float32)
 COS_TABLE = np.array([math.cos(math.radians(i)) for i in range(360)], dtype=np.float32)
 
+column_hits_jit = njit(column_hits)
+
 # Optimized ray casting using Numba for JIT compilation
 @njit(fastmath=True)
-def fast_raycast(player_x, player_y, player_angle, map_data, width, height, fov):
-    """Optimized ray casting function using Numba"""
-    # Pre-allocate arrays for results
-    wall_heights = np.zeros(width, dtype=np.float32)
-    wall_textures = np.zeros(width, dtype=np.int32)
-    wall_texture_x = np.zeros(width, dtype=np.float32)
-    wall_distances = np.zeros(width, dtype=np.float32)
-    
-    # Constants
-    map_size = len(map_data)
+def fast_raycast(player_x, player_y, player_angle, map_levels, map_heights, see_through,
+                 max_wall_height, eye_height, hits, hit_counts, height, fov):
+    """Record every visible wall along each column's ray, front to back, into hits and hit_counts"""
+    width = hits.shape[0]
     half_fov = fov / 2
+    max_distance = 20.0
     
     # For each column on the screen
     for x in range(width):
@@ -170,89 +153,89 @@ def fast_raycast(player_x, player_y, player_angle, map_data, width, height, fov)
         # Normalize angle
         ray_angle = ray_angle % (2 * math.pi)
         
-        # Ray direction
-        ray_dir_x = math.cos(ray_angle)
-        ray_dir_y = math.sin(ray_angle)
-        
-        # Current map position
-        map_x = int(player_x)
-        map_y = int(player_y)
+        # Hierarchical DDA that carries on past see-through and low walls
+        # until the column is covered
+        hit_counts[x] = column_hits_jit(
+            map_levels, map_heights, see_through, player_x, player_y,
+            math.cos(ray_angle), math.sin(ray_angle), max_distance,
+            height, eye_height, max_wall_height, hits[x])
+
+light_level_jit = njit(light_level)
+
+@njit(fastmath=True)
+def draw_wall_span(pixels, x, hit, shaded, offset, alpha, distortion_level, now):
+    """Draw the visible rows of one recorded hit into column x, blended over what is there by alpha"""
+    height = pixels.shape[1]
+    wall_top = hit[HIT_TOP]
+    scale = height / hit[HIT_DISTANCE]
+    texture_x = min(int(hit[HIT_WALL_X] * TEXTURE_SIZE), TEXTURE_SIZE - 1)
+    
+    for row in range(int(hit[HIT_CLIP_TOP]), int(hit[HIT_CLIP_BOTTOM])):
+        y = row + offset
+        if y < 0 or y >= height:
+            continue
         
-        # Length of ray from current position to next x or y-side
-        delta_dist_x = abs(1 / ray_dir_x) if ray_dir_x != 0 else float('inf')
-        delta_dist_y = abs(1 / ray_dir_y) if ray_dir_y != 0 else float('inf')
+        # Texture repeats once per cell of wall height
+        texture_y = int((row - wall_top) / scale * TEXTURE_SIZE) % TEXTURE_SIZE
+        texel = texture_y * TEXTURE_SIZE + texture_x
+        r = shaded[texel, 0]
+        g = shaded[texel, 1]
+        b = shaded[texel, 2]
         
-        # Direction to step in
-        step_x = 1 if ray_dir_x >= 0 else -1
-        step_y = 1 if ray_dir_y >= 0 else -1
+        # Apply trippy color shifting based on time and position
+        if distortion_level > 0:
+            shift = math.sin(now * 2 + x * 0.01 + y * 0.01) * distortion_level * 0.3
+            r = min(255, int(r * (1 + shift)))
+            g = min(255, int(g * (1 - shift)))
         
-        # Length of ray from one side to next
-        if ray_dir_x < 0:
-            side_dist_x = (player_x - map_x) * delta_dist_x
-        else:
-            side_dist_x = (map_x + 1.0 - player_x) * delta_dist_x
-            
-        if ray_dir_y < 0:
-            side_dist_y = (player_y - map_y) * delta_dist_y
-        else:
-            side_dist_y = (map_y + 1.0 - player_y) * delta_dist_y
+        if alpha < 1.0:
+            r = int(pixels[x, y, 0] * (1 - alpha) + r * alpha)
+            g = int(pixels[x, y, 1] * (1 - alpha) + g * alpha)
+            b = int(pixels[x, y, 2] * (1 - alpha) + b * alpha)
+        pixels[x, y, 0] = r
+        pixels[x, y, 1] = g
+        pixels[x, y, 2] = b
+
+@njit(fastmath=True)
+def draw_wall_columns(pixels, hits, hit_counts, see_through, light_tables, distortion_map, distortion_level, now):
+    """Draw textured, distance-shaded wall hits into an (x, y, rgb) pixel array"""
+    width = pixels.shape[0]
+    height = pixels.shape[1]
+    levels = light_tables.shape[1]
+    
+    for x in range(width):
+        count = hit_counts[x]
+        if count == 0:
+            continue
         
-        # Perform DDA (Digital Differential Analysis)
-        hit = 0
-        side = 0
-        max_distance = 20.0
-        distance = 0.0
+        # Apply distortion to the whole column if enabled
+        offset = 0
+        if distortion_level > 0:
+            offset = int(distortion_map[int(max(hits[x, 0, HIT_TOP], 0.0)) % height, x] * distortion_level)
         
-        while hit == 0 and distance < max_distance:
-            # Jump to next map square
-            if side_dist_x < side_dist_y:
-                side_dist_x += delta_dist_x
-                map_x += step_x
-                side = 0
-                distance += delta_dist_x
-            else:
-                side_dist_y += delta_dist_y
-                map_y += step_y
-                side = 1
-                distance += delta_dist_y
-            
-            # Check if ray has hit a wall
-            if 0 <= map_x < map_size and 0 <= map_y < map_size:
-                if map_data[map_y, map_x] > 0:
-                    hit = 1
+        # Opaque walls first: the coverage buffer already gave them disjoint
+        # rows, so every pixel is written at most once
+        for k in range(count):
+            code = int(hits[x, k, HIT_CODE])
+            if see_through[code]:
+                continue
+            # Distance shading is a lookup into the pre-shaded texels
+            shaded = light_tables[(code - 1) % NUM_TEXTURES, light_level_jit(hits[x, k, HIT_DISTANCE], 20.0, levels)]
+            draw_wall_span(pixels, x, hits[x, k], shaded, offset, 1.0, distortion_level, now)
         
-        # Calculate distance projected on camera direction
-        if hit == 1:
-            if side == 0:
-                perp_wall_dist = side_dist_x - delta_dist_x
-                wall_x = player_y + perp_wall_dist * ray_dir_y
-            else:
-                perp_wall_dist = side_dist_y - delta_dist_y
-                wall_x = player_x + perp_wall_dist * ray_dir_x
-            
-            wall_x -= math.floor(wall_x)
-            
-            # Calculate texture coordinate
-            tex_x = int(wall_x * TEXTURE_SIZE)
-            if (side == 0 and ray_dir_x > 0) or (side == 1 and ray_dir_y < 0):
-                tex_x = TEXTURE_SIZE - tex_x - 1
-            
-            # Store results
-            wall_heights[x] = min(height, height / perp_wall_dist)
-            wall_textures[x] = (map_data[map_y, map_x] - 1) % NUM_TEXTURES
-            wall_texture_x[x] = tex_x
-            wall_distances[x] = perp_wall_dist
-        else:
-            # No wall hit
-            wall_heights[x] = 0
-            wall_textures[x] = 0
-            wall_texture_x[x] = 0
-            wall_distances[x] = max_distance
-    
-    return wall_heights, wall_textures, wall_texture_x, wall_distances
+        # Then see-through walls, back to front over whatever lies behind them
+        for k in range(count - 1, -1, -1):
+            code = int(hits[x, k, HIT_CODE])
+            if not see_through[code]:
+                continue
+            shaded = light_tables[(code - 1) % NUM_TEXTURES, light_level_jit(hits[x, k, HIT_DISTANCE], 20.0, levels)]
+            draw_wall_span(pixels, x, hits[x, k], shaded, offset, PORTAL_ALPHA, distortion_level, now)
 
 # Optimized rendering using pre-rendered columns
-def render_frame(player_x, player_y, player_angle, distortion_level=0.0, distortion_map_index=0):
+def render_frame(player_x, player_y, player_angle, distortion_level=0.0, distortion_map_index=0, uniforms=None):
+    if uniforms is None:
+        uniforms = FrameUniforms.capture()
+    
     # Create a surface for the frame
     frame = pygame.Surface((WIDTH, HEIGHT))
     
@@ -280,61 +263,22 @@ def render_frame(player_x, player_y, player_angle, distortion_level=0.0, distort
     distortion_map = distortion_maps[distortion_map_index]
     
     # Perform raycasting
-    wall_heights, wall_textures, wall_texture_x, wall_distances = fast_raycast(
-        player_x, player_y, player_angle, MAP, WIDTH, HEIGHT, FOV
-    )
+    fast_raycast(player_x, player_y, player_angle, MAP_LEVELS, MAP_HEIGHTS, SEE_THROUGH,
+                 MAX_WALL_HEIGHT, player_height, COLUMN_HITS, COLUMN_HIT_COUNTS, HEIGHT, FOV)
     
-    # Draw walls
-    for x in range(WIDTH):
-        if wall_heights[x] > 0:
-            # Calculate wall height
-            wall_height = wall_heights[x]
-            wall_top = max(0, HALF_HEIGHT - wall_height // 2)
-            wall_bottom = min(HEIGHT, HALF_HEIGHT + wall_height // 2)
-            
-            # Apply distortion to wall height if enabled
-            if distortion_level > 0:
-                distortion = distortion_map[int(wall_top) % HEIGHT, x] * distortion_level
-                wall_top = max(0, wall_top + distortion)
-                wall_bottom = min(HEIGHT, wall_bottom + distortion)
-            
-            # Get texture for this wall
-            texture_id = int(wall_textures[x])
-            texture_x = int(wall_texture_x[x])
-            
-            # Draw the wall slice
-            wall_slice = pygame.Surface((1, int(wall_bottom - wall_top)))
-            
-            # Extract the texture column from the atlas
-            atlas_x = texture_x + texture_id * TEXTURE_SIZE
-            
-            # Draw the textured wall slice
-            for y in range(int(wall_bottom - wall_top)):
-                # Calculate texture y-coordinate
-                texture_y = int((y / (wall_bottom - wall_top)) * TEXTURE_SIZE)
-                
-                # Get color from texture atlas
-                color = texture_atlas[texture_y, atlas_x]
-                
-                # Apply distance shading
-                shade = 1.0 - min(1.0, wall_distances[x] / 20.0)
-                color = tuple(int(c * shade) for c in color)
-                
-                # Apply trippy color shifting based on time and position
-                if distortion_level > 0:
-                    shift = math.sin(time.time() * 2 + x * 0.01 + y * 0.01) * distortion_level * 0.3
-                    r = min(255, int(color[0] * (1 + shift)))
-                    g = min(255, int(color[1] * (1 - shift)))
-                    b = color[2]
-                    color = (r, g, b)
-                
-                # Draw pixel
-                wall_slice.set_at((0, y), color)
-            
-            # Blit the wall slice to the frame
-            frame.blit(wall_slice, (x, int(wall_top)))
+    # Draw walls straight into the frame pixels
+    pixels = pygame.surfarray.pixels3d(frame)
+    draw_wall_columns(pixels, COLUMN_HITS, COLUMN_HIT_COUNTS, SEE_THROUGH,
+                      ATLAS_LIGHT_TABLES, distortion_map, distortion_level, uniforms.time)
+    del pixels
     
     # Draw minimap
+    draw_minimap(frame, player_x, player_y, player_angle)
+    
+    return frame
+
+def draw_minimap(frame, player_x, player_y, player_angle):
+    """Draw the minimap in the top-left corner of the frame"""
     minimap_size = 150
     minimap_scale = minimap_size / MAP_SIZE
     minimap = pygame.Surface((minimap_size, minimap_size), pygame.SRCALPHA)
@@ -343,12 +287,12 @@ def render_frame(player_x, player_y, player_angle, distortion_level=0.0, distort
     # Draw walls on minimap
     for y in range(MAP_SIZE):
         for x in range(MAP_SIZE):
-            if MAP[y, x] == 1:  # Regular wall
+            if MAP.get(x, y) == 1:  # Regular wall
                 pygame.draw.rect(
                     minimap, WHITE,
                     (x * minimap_scale, y * minimap_scale, minimap_scale, minimap_scale)
                 )
-            elif MAP[y, x] == 2:  # Portal
+            elif MAP.get(x, y) == 2:  # Portal
                 pygame.draw.rect(
                     minimap, (0, 255, 255),
                     (x * minimap_scale, y * minimap_scale, minimap_scale, minimap_scale)
@@ -382,6 +326,65 @@ def render_frame(player_x, player_y, player_angle, distortion_level=0.0, distort
     
     # Draw minimap to frame
     frame.blit(minimap, (10, 10))
+
+# Render a frame through the 8-bit palette-indexed framebuffer
+def render_frame_indexed(player_x, player_y, player_angle, distortion_level=0.0, distortion_map_index=0, uniforms=None):
+    if uniforms is None:
+        uniforms = FrameUniforms.capture()
+    
+    # Get distortion map for current frame
+    distortion_map = distortion_maps[distortion_map_index]
+    
+    # Perform raycasting
+    fast_raycast(player_x, player_y, player_angle, MAP_LEVELS, MAP_HEIGHTS, SEE_THROUGH,
+                 MAX_WALL_HEIGHT, player_height, COLUMN_HITS, COLUMN_HIT_COUNTS, HEIGHT, FOV)
+    
+    columns = np.arange(WIDTH)
+    rows = np.arange(HEIGHT)[np.newaxis, :]
+    offset = np.zeros(WIDTH, dtype=np.intp)
+    if distortion_level > 0:
+        first_top = np.maximum(COLUMN_HITS[:, 0, HIT_TOP], 0).astype(np.intp)
+        offset = (distortion_map[first_top % HEIGHT, columns] * distortion_level).astype(np.intp)
+    
+    # Hit layers back to front: opaque spans never overlap, and see-through
+    # ones are stippled over whatever is behind them, every other pixel
+    framebuffer = palette_framebuffer.pixels
+    framebuffer[:] = PALETTE_BACKGROUND[np.newaxis, :]
+    stipple = (columns[:, np.newaxis] + rows) % 2 == 0
+    for layer in range(COLUMN_HIT_COUNTS.max() - 1, -1, -1):
+        hits = COLUMN_HITS[:, layer]
+        codes = hits[:, HIT_CODE].astype(np.intp)
+        clip_top = hits[:, HIT_CLIP_TOP].astype(np.intp) + offset
+        clip_bottom = hits[:, HIT_CLIP_BOTTOM].astype(np.intp) + offset
+        inside = ((COLUMN_HIT_COUNTS > layer)[:, np.newaxis] &
+                  (rows >= clip_top[:, np.newaxis]) & (rows < clip_bottom[:, np.newaxis]))
+        inside &= ~SEE_THROUGH[codes][:, np.newaxis] | stipple
+        
+        # Texture row, repeating once per cell of wall height
+        scale = HEIGHT / np.maximum(hits[:, HIT_DISTANCE], 1e-6)
+        texture_y = ((rows - offset[:, np.newaxis] - hits[:, HIT_TOP, np.newaxis]) /
+                     scale[:, np.newaxis] * TEXTURE_SIZE).astype(np.intp) % TEXTURE_SIZE
+        texture_x = np.minimum((hits[:, HIT_WALL_X] * TEXTURE_SIZE).astype(np.intp), TEXTURE_SIZE - 1)
+        
+        # Distance shading picks one of the pre-shaded palette blocks
+        level = light_levels(hits[:, HIT_DISTANCE], 20.0, PALETTE_LIGHT_LEVELS)
+        
+        wall_indices = PALETTE_TEXTURE_INDICES[
+            ((codes - 1) % NUM_TEXTURES)[:, np.newaxis], level[:, np.newaxis], texture_y, texture_x[:, np.newaxis]
+        ]
+        np.copyto(framebuffer, wall_indices, where=inside)
+    
+    # Trippy color shifting on the walls is a single palette remap per frame
+    tint = None
+    if distortion_level > 0:
+        shift = uniforms.sin(2.0) * distortion_level * 0.3
+        tint = (1 + shift, 1 - shift, 1)
+    palette_framebuffer.update(uniforms.time, tint, SKY_STEPS + FLOOR_STEPS)
+    
+    frame = palette_framebuffer.to_surface().convert()
+    
+    # Draw minimap
+    draw_minimap(frame, player_x, player_y, player_angle)
     
     return frame
 
@@ -449,6 +452,7 @@ def main():
     distortion_level = 0.5
     distortion_map_index = 0
     distortion_time = 0
+    palette_mode = False
     
     # FPS tracking
     fps_counter = 0
@@ -493,6 +497,8 @@ def main():
                     moving_right = True
                 elif event.key == pygame.K_SPACE:
                     distortion_enabled = not distortion_enabled
+                elif event.key == pygame.K_p:
+                    palette_mode = not palette_mode
                 elif event.key == pygame.K_EQUALS or event.key == pygame.K_PLUS:
                     distortion_level = min(1.0, distortion_level + 0.1)
                 elif event.key == pygame.K_MINUS:
@@ -554,9 +560,9 @@ def main():
         
         # Check for collisions
         if 0 <= int(new_x) < MAP_SIZE and 0 <= int(new_y) < MAP_SIZE:
-            if MAP[int(new_y), int(player_x)] != 1:  # Not a wall
+            if MAP.get(int(player_x), int(new_y)) != 1:  # Not a wall
                 player_y = new_y
-            if MAP[int(player_y), int(new_x)] != 1:  # Not a wall
+            if MAP.get(int(new_x), int(player_y)) != 1:  # Not a wall
                 player_x = new_x
         
         # Apply distortion fields
@@ -573,7 +579,10 @@ def main():
         
         # Render the frame
         current_distortion = distortion_level if distortion_enabled else 0.0
-        frame = render_frame(player_x, player_y, player_angle, current_distortion, distortion_map_index)
+        if palette_mode:
+            frame = render_frame_indexed(player_x, player_y, player_angle, current_distortion, distortion_map_index)
+        else:
+            frame = render_frame(player_x, player_y, player_angle, current_distortion, distortion_map_index)
         
         # Display the frame
         screen.blit(frame, (0, 0))
@@ -591,7 +600,7 @@ def main():
         screen.blit(text_surface, (WIDTH - 100, 10))
         
         # Display distortion status
-        status_text = f"Distortion: {'ON' if distortion_enabled else 'OFF'} (SPACE) | Level: {distortion_level:.1f} (+/-)"
+        status_text = f"Distortion: {'ON' if distortion_enabled else 'OFF'} (SPACE) | Level: {distortion_level:.1f} (+/-) | Palette: {'ON' if palette_mode else 'OFF'} (P)"
         text_surface = font.render(status_text, True, WHITE)
         screen.blit(text_surface, (10, HEIGHT - 30))
         
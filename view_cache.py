@@ -0,0 +1,44 @@
+import math
+from collections import namedtuple
+
+# One cached view and the camera it was drawn from
+CachedView = namedtuple('CachedView', ['view', 'x', 'y', 'angle', 'time'])
+
+
+class ViewCache:
+    """
+    Render-to-texture cache for secondary views, such as the inside of a
+    recursive room drawn onto its walls. Each view is drawn by
+    render(key, x, y, angle) and then reused until it is older than
+    refresh_interval seconds or the camera has moved or turned past a
+    threshold, so a view costs a fixed amount of work however many
+    columns show it.
+    """
+
+    def __init__(self, render, refresh_interval=0.25, move_threshold=0.5, turn_threshold=math.radians(5)):
+        self.render = render
+        self.refresh_interval = refresh_interval
+        self.move_threshold = move_threshold
+        self.turn_threshold = turn_threshold
+        self.views = {}
+
+    def __len__(self):
+        return len(self.views)
+
+    def is_stale(self, cached, x, y, angle, now):
+        """Whether a cached view is too old or was drawn from too far away"""
+        turn = abs((angle - cached.angle + math.pi) % (2 * math.pi) - math.pi)
+        return (now - cached.time > self.refresh_interval or
+                math.hypot(x - cached.x, y - cached.y) > self.move_threshold or
+                turn > self.turn_threshold)
+
+    def get(self, key, x, y, angle, now):
+        """The view for key from camera (x, y, angle), redrawn only if the cached one is stale"""
+        cached = self.views.get(key)
+        if cached is None or self.is_stale(cached, x, y, angle, now):
+            cached = CachedView(self.render(key, x, y, angle), x, y, angle, now)
+            self.views[key] = cached
+        return cached.view
+
+    def clear(self):
+        self.views.clear()